@@ -1144,6 +1144,15 @@ class Column(NotifierMixin):
                 # useful for converting input arrays to the correct data type
                 dtype = np.dtype(numpy_format).base
 
+                # Physical values of scaled integer columns are not integers
+                # in general, so they are kept as floats until they are scaled
+                # back to their storage values
+                if (dtype.kind in 'iu' and
+                        not self._pseudo_unsigned_ints and
+                        (self.bscale not in (1, None, '') or
+                         self.bzero not in (0, None, ''))):
+                    dtype = np.dtype(np.float64)
+
                 return _convert_array(array, dtype)
 
 
@@ -1797,6 +1806,45 @@ class _VLF(np.ndarray):
                                   dtype=np.object)
         self.max = 0
         self.element_dtype = dtype
+        self.values = self.offsets = None
+        return self
+
+    @classmethod
+    def from_ragged(cls, values, offsets, dtype='a'):
+        """
+        Create a variable length field from a ragged array representation:
+        the ``values`` of all the rows, one after the other in a single array,
+        and the ``offsets`` into it of the start of each row, followed by the
+        end of the last row.
+
+        Each row of the field is a view of ``values``.  The ``values`` and
+        ``offsets`` are kept as attributes of the field (until any of its rows
+        are replaced), so that code that can handle all rows at once may use
+        them directly.
+        """
+
+        nrows = len(offsets) - 1
+        self = np.ndarray.__new__(cls, shape=(nrows,), dtype=np.object)
+        raw = self.view(np.ndarray)
+
+        counts = np.diff(offsets)
+        if nrows and np.all(counts == counts[0]):
+            # All rows have the same length, so the rows of a 2-D view of the
+            # values can be used
+            rows = list(values[:nrows * counts[0]].reshape(
+                (nrows, counts[0]) + values.shape[1:]))
+        else:
+            bounds = offsets.tolist()
+            rows = [values[start:stop]
+                    for start, stop in zip(bounds[:-1], bounds[1:])]
+
+        for idx, row in enumerate(rows):
+            raw[idx] = row
+
+        self.max = int(counts.max()) if nrows else 0
+        self.element_dtype = dtype
+        self.values = values
+        self.offsets = offsets
         return self
 
     def __array_finalize__(self, obj):
@@ -1804,6 +1852,8 @@ class _VLF(np.ndarray):
             return
         self.max = obj.max
         self.element_dtype = obj.element_dtype
+        # A slice or copy of the field does not hold all of the values
+        self.values = self.offsets = None
 
     def __setitem__(self, key, value):
         """
@@ -1821,6 +1871,7 @@ class _VLF(np.ndarray):
             value = np.array(value, dtype=self.element_dtype)
         np.ndarray.__setitem__(self, key, value)
         self.max = max(self.max, len(value))
+        self.values = self.offsets = None
 
 
 def _get_index(names, key):
@@ -1885,13 +1936,10 @@ def _unwrapx(input, output, repeat):
         number of bits
     """
 
-    pow2 = np.array([128, 64, 32, 16, 8, 4, 2, 1], dtype='uint8')
-    nbytes = ((repeat - 1) // 8) + 1
-    for i in range(nbytes):
-        _min = i * 8
-        _max = min((i + 1) * 8, repeat)
-        for j in range(_min, _max):
-            output[..., j] = np.bitwise_and(input[..., i], pow2[j - i * 8])
+    # The first bit of each row is the most significant bit of its first
+    # byte, which is the order unpackbits expands them in
+    bits = np.unpackbits(np.asarray(input, dtype=np.uint8), axis=-1)
+    output[...] = bits[..., :repeat]
 
 
 def _wrapx(input, output, repeat):
@@ -1910,19 +1958,10 @@ def _wrapx(input, output, repeat):
         number of bits
     """
 
-    output[...] = 0  # reset the output
-    nbytes = ((repeat - 1) // 8) + 1
-    unused = nbytes * 8 - repeat
-    for i in range(nbytes):
-        _min = i * 8
-        _max = min((i + 1) * 8, repeat)
-        for j in range(_min, _max):
-            if j != _min:
-                np.left_shift(output[..., i], 1, output[..., i])
-            np.add(output[..., i], input[..., j], output[..., i])
-
-    # shift the unused bits
-    np.left_shift(output[..., i], unused, output[..., i])
+    # packbits pads the last byte of each row with zeros, leaving the unused
+    # bits at the end as the standard requires
+    output[...] = np.packbits(np.asarray(input[..., :repeat], dtype=np.bool_),
+                              axis=-1)
 
 
 def _makep(array, descr_output, format, nrows=None):
@@ -1954,36 +1993,63 @@ def _makep(array, descr_output, format, nrows=None):
     # TODO: A great deal of this is redundant with FITS_rec._convert_p; see if
     # we can merge the two somehow.
 
-    _offset = 0
-
     if not nrows:
         nrows = len(array)
     n = min(len(array), nrows)
 
-    data_output = _VLF([None] * nrows, dtype=format.dtype)
-
     if format.dtype == 'a':
-        _nbytes = 1
+        return _makep_strings(array, descr_output, format, nrows)
+
+    dtype = np.array([], dtype=format.dtype).dtype
+
+    # Build the arrays of all rows as one array of values, and compute all the
+    # descriptors from the lengths of the rows at once
+    if (isinstance(array, np.ndarray) and array.dtype != np.object and
+            array.ndim == 2):
+        counts = np.empty(n, dtype=np.int64)
+        counts[:] = array.shape[1]
+        rows = [np.ascontiguousarray(array[:n], dtype=dtype).ravel()]
     else:
-        _nbytes = np.array([], dtype=format.dtype).itemsize
+        rows = [np.array(array[idx], dtype=dtype).ravel()
+                for idx in range(n)]
+        counts = np.array([len(row) for row in rows], dtype=np.int64)
+
+    _max = int(counts.max()) if n else 0
+    if nrows > n:
+        # Pad the column with rows of zeros as long as the longest row
+        counts = np.append(counts, np.repeat(np.int64(_max), nrows - n))
+        rows.append(np.zeros(_max * (nrows - n), dtype=dtype))
+
+    values = np.concatenate(rows) if rows else np.zeros(0, dtype=dtype)
+    offsets = np.zeros(nrows + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    descr_output[:nrows, 0] = counts
+    descr_output[:nrows, 1] = offsets[:-1] * dtype.itemsize
+
+    return _VLF.from_ragged(values, offsets, dtype=format.dtype)
+
+
+def _makep_strings(array, descr_output, format, nrows):
+    """
+    Construct a P (or Q) format column of character arrays; see `_makep`.
+    """
+
+    _offset = 0
+
+    data_output = _VLF([None] * nrows, dtype=format.dtype)
 
     for idx in range(nrows):
         if idx < len(array):
             rowval = array[idx]
         else:
-            if format.dtype == 'a':
-                rowval = ' ' * data_output.max
-            else:
-                rowval = [0] * data_output.max
-        if format.dtype == 'a':
-            data_output[idx] = chararray.array(encode_ascii(rowval),
-                                               itemsize=1)
-        else:
-            data_output[idx] = np.array(rowval, dtype=format.dtype)
+            rowval = ' ' * data_output.max
+        data_output[idx] = chararray.array(encode_ascii(rowval),
+                                           itemsize=1)
 
         descr_output[idx, 0] = len(data_output[idx])
         descr_output[idx, 1] = _offset
-        _offset += len(data_output[idx]) * _nbytes
+        _offset += len(data_output[idx])
 
     return data_output
 
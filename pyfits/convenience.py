@@ -61,7 +61,9 @@ from .extern.six import string_types
 from .file import FILE_MODES, _File
 from .hdu.base import _BaseHDU, _ValidHDU
 from .hdu.hdulist import fitsopen
-from .hdu.image import PrimaryHDU, ImageHDU
+from .hdu.compressed import CompImageHDU
+from .hdu.groups import GroupsHDU
+from .hdu.image import PrimaryHDU, ImageHDU, _ImageBaseHDU
 from .hdu.table import BinTableHDU
 from .header import Header
 from .util import fileobj_closed, fileobj_name, fileobj_mode, _is_int
@@ -159,6 +161,18 @@ def getdata(filename, *args, **kwargs):
 
            data.view(view)
 
+    columns : sequence of str or int, optional
+        For binary tables, the names or indices of the columns to read.  Only
+        those columns are read from the table (see `BinTableHDU.read`).
+
+    out : `numpy.ndarray`, optional
+        For images, an array with the shape of the image to read and scale the
+        image into, instead of a new array (see `ImageHDU.read`).
+
+    dtype : dtype, optional
+        For images, the dtype to scale the image to, instead of the dtype
+        chosen from the image's ``BITPIX`` and ``BSCALE``/``BZERO``.
+
     kwargs
         Any additional keyword arguments to be passed to `pyfits.open`.
 
@@ -176,16 +190,35 @@ def getdata(filename, *args, **kwargs):
     lower = kwargs.pop('lower', None)
     upper = kwargs.pop('upper', None)
     view = kwargs.pop('view', None)
+    columns = kwargs.pop('columns', None)
+    out = kwargs.pop('out', None)
+    dtype = kwargs.pop('dtype', None)
 
     hdulist, extidx = _getext(filename, mode, *args, **kwargs)
     hdu = hdulist[extidx]
-    data = hdu.data
-    if data is None and extidx == 0:
+    # Check for an empty primary image without loading its data, which may
+    # be read into out instead
+    if extidx == 0 and (not hdu.shape if _is_image_hdu(hdu)
+                        else hdu.data is None):
         try:
             hdu = hdulist[1]
-            data = hdu.data
         except IndexError:
             raise IndexError('No data in this HDU.')
+    if out is not None or dtype is not None:
+        if columns is not None or not _is_image_hdu(hdu):
+            hdulist.close(closed=closed)
+            raise TypeError('out and dtype may only be given for image HDUs.')
+        data = None
+        if hdu.shape:
+            data = hdu.section.read(Ellipsis, out=out, dtype=dtype)
+    elif columns is None:
+        data = hdu.data
+    elif isinstance(hdu, BinTableHDU):
+        # Read only the requested columns of the table
+        data = hdu.read(columns=columns)
+    else:
+        hdulist.close(closed=closed)
+        raise TypeError('columns may only be given for binary table HDUs.')
     if data is None:
         raise IndexError('No data in this HDU.')
     if header:
@@ -730,11 +763,28 @@ def _getext(filename, mode, *args, **kwargs):
     elif extver and extname is None:
         raise TypeError('extver alone cannot specify an extension.')
 
+    # Only the extension with the requested index is needed, so by default
+    # there is no need to read the HDUs following it in the file; extensions
+    # requested by name are still looked up among all the HDUs, so that
+    # duplicate names are reported
+    if _is_int(ext):
+        kwargs.setdefault('lazy_load_hdus', True)
+
     hdulist = fitsopen(filename, mode=mode, **kwargs)
 
     return hdulist, ext
 
 
+def _is_image_hdu(hdu):
+    """
+    Returns `True` if ``hdu`` is an image HDU, whose data can be read with
+    its ``section``.
+    """
+
+    return (isinstance(hdu, (_ImageBaseHDU, CompImageHDU)) and
+            not isinstance(hdu, GroupsHDU))
+
+
 def _makehdu(data, header):
     if header is None:
         header = Header()
@@ -70,7 +70,8 @@ GLOBALS = [
     ('EXTENSION_NAME_CASE_SENSITIVE',      False),
     ('STRIP_HEADER_WHITESPACE',            True),
     ('USE_MEMMAP',                         True),
-    ('ENABLE_UINT',                        True)
+    ('ENABLE_UINT',                        True),
+    ('LAZY_LOAD_HDUS',                     False)
 ]
 
 for varname, default in GLOBALS:
@@ -76,6 +76,11 @@ class _File(object):
         self.strict_memmap = bool(memmap)
         memmap = True if memmap is None else memmap
 
+        # When not None, an object with an update() method that is passed
+        # everything written to the file; used for computing the checksum of
+        # data as it is written
+        self._datasum = None
+
         if fileobj is None:
             self._file = None
             self.closed = False
@@ -281,6 +286,8 @@ class _File(object):
     def write(self, string):
         if hasattr(self._file, 'write'):
             _write_string(self._file, string)
+            if self._datasum is not None:
+                self._datasum.update(string)
 
     def writearray(self, array):
         """
@@ -292,6 +299,31 @@ class _File(object):
 
         if hasattr(self._file, 'write'):
             _array_to_file(array, self._file)
+            if self._datasum is not None:
+                self._datasum.update(array)
+
+    def rewritable(self):
+        """
+        Returns `True` if data already written to the file can be overwritten
+        by seeking back to it and writing again.
+
+        This is not the case for compressed files, files opened in append
+        mode (where all writes go to the end of the file), or streams that do
+        not support seeking.
+        """
+
+        if (self.simulateonly or self.compression or
+                self.mode not in ('ostream', 'update') or
+                not hasattr(self._file, 'seek')):
+            return False
+
+        if hasattr(self._file, 'seekable'):
+            try:
+                return self._file.seekable()
+            except (AttributeError, IOError, ValueError):
+                return False
+
+        return True
 
     def flush(self):
         if hasattr(self._file, 'flush'):
@@ -14,11 +14,17 @@ from .column import (ASCIITNULL, FITS2NUMPY, ASCII2NUMPY, ASCII2STR, ColDefs,
                      _AsciiColDefs, _FormatX, _FormatP, _VLF, _get_index,
                      _wrapx, _unwrapx, _makep, Delayed)
 from .py3compat import ignored
-from .util import encode_ascii, decode_ascii, lazyproperty
+from .util import encode_ascii, decode_ascii, lazyproperty, _output_array
 from ._compat.weakref import WeakSet
 from functools import reduce
 
 
+# Columns are gathered by columns_to_arrays in blocks of rows of about this
+# many bytes, so that each block stays in the CPU cache while all the columns
+# are copied out of it
+GATHER_BLOCK_SIZE = 2 ** 18
+
+
 class FITS_record(object):
     """
     FITS record class.
@@ -223,6 +229,7 @@ class FITS_rec(np.recarray):
 
         if isinstance(obj, FITS_rec) and obj.dtype == self.dtype:
             self._converted = obj._converted
+            self._heap_fields = obj._heap_fields
             self._heapoffset = obj._heapoffset
             self._heapsize = obj._heapsize
             self._col_weakrefs = obj._col_weakrefs
@@ -235,6 +242,7 @@ class FITS_rec(np.recarray):
             # just other FITS_rec objects
             self._nfields = len(self.dtype.fields)
             self._converted = {}
+            self._heap_fields = {}
 
             self._heapoffset = getattr(obj, '_heapoffset', 0)
             self._heapsize = getattr(obj, '_heapsize', 0)
@@ -259,6 +267,7 @@ class FITS_rec(np.recarray):
 
         self._nfields = 0
         self._converted = {}
+        self._heap_fields = {}
         self._heapoffset = 0
         self._heapsize = 0
         self._col_weakrefs = WeakSet()
@@ -419,6 +428,21 @@ class FITS_rec(np.recarray):
                     field[n:] = -bzero
 
                 inarr = inarr - bzero
+            elif (columns[idx]._physical_values and
+                    not isinstance(columns, _AsciiColDefs) and
+                    field.dtype.kind in 'iu' and
+                    inarr.shape == outarr.shape and
+                    (column.bscale not in ('', None, 1) or
+                     column.bzero not in ('', None, 0))):
+                # The physical values of scaled integer columns are kept as
+                # floats until they are scaled back to their storage values,
+                # rather than truncated by copying them into the raw field;
+                # rows below the input data have a storage value of zero
+                converted = np.empty(field.shape, dtype=np.float64)
+                converted[:n] = inarr
+                converted[n:] = column.bzero or 0
+                data._cache_field(name, converted)
+                continue
             elif isinstance(columns, _AsciiColDefs):
                 # Regardless whether the format is character or numeric, if the
                 # input array contains characters then it's already in the raw
@@ -493,12 +517,19 @@ class FITS_rec(np.recarray):
             out._coldefs = ColDefs(self._coldefs)
             arrays = []
             out._converted = {}
+            out._heap_fields = {}
             for idx, name in enumerate(self._coldefs.names):
                 #
                 # Store the new arrays for the _coldefs object
                 #
                 arrays.append(self._coldefs._arrays[idx][key])
 
+                # The heap is not carried over to the new array, so variable
+                # length arrays must be read from it first
+                if (name not in self._converted and
+                        isinstance(self._coldefs._recformats[idx], _FormatP)):
+                    self.field(idx)
+
                 # Ensure that the sliced FITS_rec will view the same scaled
                 # columns as the original; this is one of the few cases where
                 # it is not necessary to use _cache_field()
@@ -675,9 +706,25 @@ class FITS_rec(np.recarray):
             # Just return the normal itemsize
             return self.itemsize
 
-    def field(self, key):
+    def field(self, key, packed=False):
         """
         A view of a `Column`'s data as an array.
+
+        Parameters
+        ----------
+        key : str or int
+            The name or index of the column
+
+        packed : bool, optional
+            If `True`, the bits of a bit array (X format) column are returned
+            as they are stored, in a ``uint8`` array of shape ``(nrows,
+            nbytes)`` with the first bit of each row in the most significant
+            bit of its first byte, rather than expanded into a boolean array
+            of shape ``(nrows, nbits)``; this takes an eighth of the memory.
+            The array is a view of the table data, so changes to it are
+            written with the table; a boolean array previously returned for
+            the column is no longer used once the packed bits are accessed.
+            This option is ignored for columns of other formats.
         """
 
         # NOTE: The *column* index may not be the same as the field index in
@@ -692,17 +739,15 @@ class FITS_rec(np.recarray):
                 'indicating an empty field.' % key)
             return np.array([], dtype=format.dtype)
 
-        # If field's base is a FITS_rec, we can run into trouble because it
-        # contains a reference to the ._coldefs object of the original data;
-        # this can lead to a circular reference; see ticket #49
-        base = self
-        while (isinstance(base, FITS_rec) and
-                isinstance(base.base, np.recarray)):
-            base = base.base
-        # base could still be a FITS_rec in some cases, so take care to
-        # use rec.recarray.field to avoid a potential infinite
-        # recursion
-        field = _get_recarray_field(base, name)
+        field = self._raw_field(name)
+
+        if packed and isinstance(format.recformat, _FormatX):
+            if name in self._converted:
+                # Store any changes made to the expanded bits, which are not
+                # scaled back from now on
+                _wrapx(self._converted.pop(name), field,
+                       format.recformat.repeat)
+            return field
 
         if name not in self._converted:
             recformat = format.recformat
@@ -725,6 +770,147 @@ class FITS_rec(np.recarray):
 
         return self._converted[name]
 
+    def columns_to_arrays(self, names=None, out=None):
+        """
+        Copy several columns of the table into separate arrays at once.
+
+        This gives the same values as `field` for each column, but the raw
+        rows of the table are walked only once, in blocks of rows small
+        enough to stay in the CPU cache: each block is copied into all of the
+        requested columns, converting them to native byte order and applying
+        any ``TSCALn`` and ``TZEROn`` as it goes.  This is much faster than
+        calling `field` for each of many columns of a large table, which
+        makes a separate pass over all of the table's data for each.
+
+        Parameters
+        ----------
+        names : sequence of str or int, optional
+            The names or indices of the columns to copy; by default all
+            columns are copied.
+
+        out : sequence of arrays, optional
+            Arrays to copy the columns into instead of new arrays, one for
+            each column; each must have the shape and dtype of the array that
+            would otherwise be returned for its column.
+
+        Returns
+        -------
+        arrays : list
+            An array for each column, in the order given; these are copies
+            that do not share memory with the table.
+        """
+
+        if names is None:
+            names = list(range(len(self.columns)))
+        elif isinstance(names, string_types):
+            names = [names]
+
+        if out is not None and len(out) != len(names):
+            raise ValueError('out must have an array for each column.')
+
+        arrays = []
+        gathered = []
+        for idx, key in enumerate(names):
+            column = self.columns[key]
+            plan = self._gather_plan(column,
+                                     None if out is None else out[idx])
+            if plan is None:
+                # Columns that are not simply scaled numbers, or that have
+                # already been converted, are copied as they are
+                if out is None:
+                    arrays.append(np.array(self.field(key)))
+                else:
+                    out[idx][...] = self.field(key)
+                    arrays.append(out[idx])
+            else:
+                arrays.append(plan[1])
+                gathered.append(plan)
+
+        if gathered:
+            rowsize = max(self.itemsize, 1)
+            block_rows = max(GATHER_BLOCK_SIZE // rowsize, 1)
+            nrows = len(self)
+            for start in range(0, nrows, block_rows):
+                stop = min(start + block_rows, nrows)
+                for field, out, bool_, bscale, bzero in gathered:
+                    block = out[start:stop]
+                    if bool_:
+                        np.equal(field[start:stop], ord('T'), block)
+                        continue
+
+                    block[...] = field[start:stop]
+                    if bscale is not None:
+                        block *= bscale
+                    if bzero is not None:
+                        block += bzero
+
+        return arrays
+
+    def _gather_plan(self, column, out=None):
+        """
+        Returns a tuple of ``(field, out, bool, bscale, bzero)`` describing how
+        `columns_to_arrays` copies a column from its raw ``field`` into the
+        array ``out`` (a new array unless one is given), or `None` if the
+        column is not a fixed-width numeric or logical column of a binary
+        table, which are copied with `field`.
+        """
+
+        name = column.name
+        format = column.format
+        recformat = format.recformat
+        if (name in self._converted or format.dtype.itemsize == 0 or
+                isinstance(self._coldefs, _AsciiColDefs) or
+                isinstance(recformat, (_FormatX, _FormatP))):
+            return None
+
+        (_str, _bool, _number, _scale, _zero, bscale, bzero, dim) = \
+            self._get_scale_factors(column)
+
+        field = self._raw_field(name)
+        if _str or (dim and field.shape[1:] != dim):
+            return None
+
+        if _bool:
+            if field.dtype == bool:
+                return None
+            out = _output_array(out, field.shape, bool)
+            return field, out, True, None, None
+
+        if (_scale or _zero) and not column._physical_values:
+            if self._uint and bzero == 2**15 and format.format == 'I':
+                dtype = np.uint16
+            elif self._uint and bzero == 2**31 and format.format == 'J':
+                dtype = np.uint32
+            elif self._uint and format.format == 'K':
+                # Needs the overflow handling in _convert_other
+                return None
+            else:
+                dtype = np.float64
+
+            out = _output_array(out, field.shape, dtype)
+            return (field, out, False, bscale if _scale else None,
+                    bzero if _zero else None)
+
+        out = _output_array(out, field.shape, field.dtype.newbyteorder('='))
+        return field, out, False, None, None
+
+    def _raw_field(self, name):
+        """
+        Returns the raw (unconverted) array of a field of the table.
+        """
+
+        # If field's base is a FITS_rec, we can run into trouble because it
+        # contains a reference to the ._coldefs object of the original data;
+        # this can lead to a circular reference; see ticket #49
+        base = self
+        while (isinstance(base, FITS_rec) and
+                isinstance(base.base, np.recarray)):
+            base = base.base
+        # base could still be a FITS_rec in some cases, so take care to
+        # use rec.recarray.field to avoid a potential infinite
+        # recursion
+        return _get_recarray_field(base, name)
+
     def _cache_field(self, name, field):
         """
         Do not store fields in _converted if one of its bases is self,
@@ -790,7 +976,6 @@ class FITS_rec(np.recarray):
         to a VLA column with the array data returned from the heap.
         """
 
-        dummy = _VLF([None] * len(self), dtype=recformat.dtype)
         raw_data = self._get_raw_data()
 
         if raw_data is None:
@@ -798,9 +983,52 @@ class FITS_rec(np.recarray):
                 "Could not find heap data for the %r variable-length "
                 "array column." % column.name)
 
+        if recformat.dtype == 'a':
+            itemsize = 1
+        else:
+            itemsize = np.dtype(recformat.dtype).itemsize
+
+        # Check all the descriptors at once before reading any arrays
+        counts = field[:, 0].astype(np.int64)
+        offsets = field[:, 1].astype(np.int64) + self._heapoffset
+        nbytes = counts * itemsize
+        invalid = (counts < 0) | ((nbytes > 0) & (
+            (offsets < 0) | (offsets + nbytes > len(raw_data))))
+        if invalid.any():
+            raise ValueError(
+                "The descriptor in row %d of the %r variable-length array "
+                "column points outside of the heap." %
+                (np.flatnonzero(invalid)[0], column.name))
+
+        if recformat.dtype == 'a' or column.dim:
+            # Character arrays, and arrays with dimensions, are converted
+            # row by row
+            return self._convert_p_rows(column, raw_data, counts, offsets,
+                                        recformat)
+
+        # Gather the arrays of all rows into one contiguous buffer (which is
+        # just a view of the heap when the arrays are stored in order, as
+        # they are when written by PyFITS), so that the scaling is applied
+        # once to all of the values, and each row is a view of the result
+        dt = np.dtype(recformat.dtype).newbyteorder('>')
+        values = _gather_heap(raw_data, offsets, nbytes).view(dt)
+        values = self._convert_other(column, values, recformat)
+        starts = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+
+        return _VLF.from_ragged(values, starts, dtype=recformat.dtype)
+
+    def _convert_p_rows(self, column, raw_data, counts, offsets, recformat):
+        """
+        Read the array of each row of a VLA column from the heap and convert
+        it separately.
+        """
+
+        dummy = _VLF([None] * len(self), dtype=recformat.dtype)
+
         for idx in range(len(self)):
-            offset = field[idx, 1] + self._heapoffset
-            count = field[idx, 0]
+            offset = offsets[idx]
+            count = counts[idx]
 
             if recformat.dtype == 'a':
                 dt = np.dtype(recformat.dtype + str(1))
@@ -815,13 +1043,6 @@ class FITS_rec(np.recarray):
                 dummy[idx].dtype = dummy[idx].dtype.newbyteorder('>')
                 # Each array in the field may now require additional
                 # scaling depending on the other scaling parameters
-                # TODO: The same scaling parameters apply to every
-                # array in the column so this is currently very slow; we
-                # really only need to check once whether any scaling will
-                # be necessary and skip this step if not
-                # TODO: Test that this works for X format; I don't think
-                # that it does--the recformat variable only applies to the P
-                # format not the X format
                 dummy[idx] = self._convert_other(column, dummy[idx],
                                                  recformat)
 
@@ -1061,6 +1282,7 @@ class FITS_rec(np.recarray):
 
         # Running total for the new heap size
         heapsize = 0
+        self._heap_fields = {}
 
         for indx, name in enumerate(self.dtype.names):
             column = self._coldefs[indx]
@@ -1080,17 +1302,37 @@ class FITS_rec(np.recarray):
                     # The VLA has potentially been updated, so we need to
                     # update the array descriptors
                     raw_field[:] = 0  # reset
-                    npts = [len(arr) for arr in self._converted[name]]
+                    vla = self._converted[name]
+                    if getattr(vla, 'offsets', None) is not None:
+                        npts = np.diff(vla.offsets)
+                    else:
+                        npts = [len(arr) for arr in vla]
 
                     raw_field[:len(npts), 0] = npts
                     raw_field[1:, 1] = (np.add.accumulate(raw_field[:-1, 0]) *
                                         dtype.itemsize)
                     raw_field[:, 1][:] += heapsize
 
-                heapsize += raw_field[:, 0].sum() * dtype.itemsize
-                # Even if this VLA has not been read or updated, we need to
-                # include the size of its constituent arrays in the heap size
-                # total
+                if update_heap_pointers:
+                    heapsize += raw_field[:, 0].sum() * dtype.itemsize
+                    # Even if this VLA has not been read or updated, we need
+                    # to include the size of its constituent arrays in the
+                    # heap size total
+                else:
+                    # The heap is managed elsewhere and may have unused space
+                    # between its arrays, so it extends to the end of the
+                    # last array
+                    heapsize = max(heapsize,
+                                   _heap_extent(raw_field, dtype.itemsize))
+
+                if name in self._converted:
+                    # Scaled arrays are converted back to their storage values
+                    # to be written to the heap
+                    self._scale_back_vla(indx, self._converted[name],
+                                         recformat)
+
+                # The field itself only holds the array descriptors
+                continue
 
             if isinstance(recformat, _FormatX) and name in self._converted:
                 _wrapx(self._converted[name], raw_field, recformat.repeat)
@@ -1104,11 +1346,14 @@ class FITS_rec(np.recarray):
             # conversion for both ASCII and binary tables
             if _number or _str:
                 if _number and (_scale or _zero) and column._physical_values:
+                    # The values are scaled out of place, into floats unless
+                    # they remain integers, so that they are only rounded once
+                    # they are stored
                     dummy = field.copy()
                     if _zero:
-                        dummy -= bzero
+                        dummy = dummy - bzero
                     if _scale:
-                        dummy /= bscale
+                        dummy = dummy / bscale
                     # This will set the raw values in the recarray back to
                     # their non-physical storage values, so the column should
                     # be mark is not scaled
@@ -1149,6 +1394,64 @@ class FITS_rec(np.recarray):
         # Store the updated heapsize
         self._heapsize = heapsize
 
+    def _scale_back_vla(self, col_idx, vla, recformat):
+        """
+        If the variable length array column ``col_idx`` is scaled with
+        ``TSCALn``/``TZEROn``, converts the (physical) arrays ``vla`` of the
+        column back to their storage values, as written to the heap, and keeps
+        them in ``_heap_fields`` to be returned by `_get_heap_field`.
+        """
+
+        column = self._coldefs[col_idx]
+        _str, _bool, _number, _scale, _zero, bscale, bzero, _ = \
+            self._get_scale_factors(column)
+
+        if not (_number and (_scale or _zero)) or recformat.dtype == 'a':
+            return
+
+        offsets = getattr(vla, 'offsets', None)
+        if offsets is not None:
+            values = vla.values[offsets[0]:offsets[-1]].ravel()
+            offsets = offsets - offsets[0]
+        else:
+            offsets = np.zeros(len(vla) + 1, dtype=np.int64)
+            np.cumsum([np.size(arr) for arr in vla], out=offsets[1:])
+            if offsets[-1]:
+                values = np.concatenate([np.ravel(arr) for arr in vla])
+            else:
+                values = np.array([], dtype=np.float64)
+
+        dtype = np.dtype(recformat.dtype).newbyteorder('>')
+        if values.dtype.kind == 'u' and not _scale:
+            # Pseudo-unsigned integers; subtracting BZERO = 2**(bits - 1)
+            # (modulo 2**bits) gives the signed storage values
+            values = values - values.dtype.type(bzero)
+            values = values.view(values.dtype.str.replace('u', 'i'))
+        else:
+            values = np.array(values, dtype=np.float64)
+            if _zero:
+                values -= bzero
+            if _scale:
+                values /= bscale
+            if dtype.kind in 'iu':
+                values = np.around(values)
+
+        self._heap_fields[self.dtype.names[col_idx]] = _VLF.from_ragged(
+            values.astype(dtype), offsets, dtype=recformat.dtype)
+
+    def _get_heap_field(self, indx):
+        """
+        Returns the arrays of the variable length array column ``indx`` as
+        they are written to the heap; for scaled columns these are the storage
+        values computed by the last call to `_scale_back`, and otherwise the
+        arrays of the field itself.
+        """
+
+        name = self.dtype.names[indx]
+        if name in self._heap_fields:
+            return self._heap_fields[name]
+        return self.field(indx)
+
     def _scale_back_strings(self, col_idx, input_field, output_field):
         # There are a few possibilities this has to be able to handle properly
         # The input_field, which comes from the _converted column is of dtype
@@ -1268,6 +1571,48 @@ class FITS_rec(np.recarray):
             output_field.replace(encode_ascii('E'), encode_ascii('D'))
 
 
+def _heap_extent(descriptors, itemsize):
+    """
+    Returns the offset of the end of the last array in the heap pointed to by
+    the given variable length array descriptors, with arrays of ``itemsize``
+    bytes per element.
+    """
+
+    counts = descriptors[:, 0].astype(np.int64)
+    ends = descriptors[:, 1].astype(np.int64) + counts * itemsize
+    ends = ends[counts > 0]
+    return int(ends.max()) if len(ends) else 0
+
+
+def _gather_heap(raw_data, offsets, nbytes):
+    """
+    Returns the bytes of the arrays at the given byte offsets in a table's raw
+    data, and of the given sizes, concatenated into one contiguous uint8
+    array.
+
+    If the arrays are stored one after the other in the heap the result is a
+    view of the raw data; otherwise the bytes are copied.
+    """
+
+    nonempty = nbytes > 0
+    offsets = offsets[nonempty]
+    nbytes = nbytes[nonempty]
+
+    if not len(nbytes):
+        return np.zeros(0, dtype=np.ubyte)
+
+    total = int(nbytes.sum())
+    if np.all(offsets[1:] == offsets[:-1] + nbytes[:-1]):
+        return raw_data[offsets[0]:offsets[0] + total]
+
+    # The index into the raw data of each byte of the output: the start of
+    # the array it belongs to, plus its position in that array
+    starts = np.cumsum(nbytes) - nbytes
+    index = np.repeat(offsets - starts, nbytes)
+    index += np.arange(total, dtype=np.int64)
+    return raw_data[index]
+
+
 def _get_recarray_field(array, key):
     """
     Compatibility function for using the recarray base class's field method.
@@ -1,14 +1,16 @@
 from .base import (register_hdu, unregister_hdu, DELAYED, BITPIX2DTYPE,
                    DTYPE2BITPIX)
 from .compressed import CompImageHDU
+from .comptable import CompBinTableHDU
 from .groups import GroupsHDU, GroupData, Group
 from .hdulist import HDUList
 from .image import PrimaryHDU, ImageHDU
 from .nonstandard import FitsHDU
-from .streaming import StreamingHDU
+from .streaming import StreamingHDU, CompImageStreamingHDU
 from .table import TableHDU, BinTableHDU
 
 __all__ = ['HDUList', 'PrimaryHDU', 'ImageHDU', 'TableHDU', 'BinTableHDU',
-           'GroupsHDU', 'GroupData', 'Group', 'CompImageHDU', 'FitsHDU',
-           'StreamingHDU', 'register_hdu', 'unregister_hdu', 'DELAYED',
-           'BITPIX2DTYPE', 'DTYPE2BITPIX']
+           'GroupsHDU', 'GroupData', 'Group', 'CompImageHDU',
+           'CompBinTableHDU', 'FitsHDU', 'StreamingHDU',
+           'CompImageStreamingHDU', 'register_hdu', 'unregister_hdu',
+           'DELAYED', 'BITPIX2DTYPE', 'DTYPE2BITPIX']
@@ -17,7 +17,8 @@ from ..header import Header
 from ..py3compat import ignored, getargspec
 from ..util import (first, lazyproperty, _is_int, _is_pseudo_unsigned,
                     _unsigned_zero, _pad_length, itersubclasses,
-                    decode_ascii, deprecated, _get_array_mmap)
+                    decode_ascii, encode_ascii, deprecated, _get_array_mmap,
+                    BLOCK_SIZE)
 from ..verify import _Verify, _ErrList
 
 
@@ -40,6 +41,165 @@ will be used in this case.
 """
 
 
+# Number of 32-bit words summed at a time when computing checksums; each
+# chunk's sum must fit in a uint64
+_CHECKSUM_CHUNK_WORDS = 2 ** 24
+
+# The number of bytes read at a time when verifying checksums in the
+# background (see _ValidHDU._verify_checksum_datasum)
+_CHECKSUM_READ_SIZE = 2 ** 24
+
+
+def _sum_words(data):
+    """
+    Returns the sum, as a Python integer and without folding in any carries,
+    of a uint8 array taken as big-endian 32-bit words.  The length of the
+    array must be a multiple of 4.
+    """
+
+    words = data.view('>u4')
+    total = 0
+
+    # Sum the 32-bit words in chunks small enough that the uint64 accumulator
+    # can't overflow
+    for idx in range(0, len(words), _CHECKSUM_CHUNK_WORDS):
+        total += int(np.add.reduce(words[idx:idx + _CHECKSUM_CHUNK_WORDS],
+                                   dtype=np.uint64))
+
+    return total
+
+
+def _fold_sum(total):
+    """
+    Folds the end-around carries into a sum of 32-bit words, giving the 32-bit
+    ones-complement sum.  The result is only zero if all the summed words were
+    zero.
+    """
+
+    if total:
+        total = (total - 1) % 0xFFFFFFFF + 1
+
+    return np.uint32(total)
+
+
+def _as_bytes(data):
+    """Returns a flat uint8 view of an array, string, or buffer."""
+
+    if isinstance(data, string_types):
+        data = encode_ascii(data)
+
+    if isinstance(data, bytes):
+        return np.frombuffer(data, dtype=np.uint8)
+
+    return np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+
+
+class _StreamingDatasum(object):
+    """
+    Accumulates the ones-complement sum of an HDU's data as it is written to a
+    file in successive pieces of any length (see ``_File.write``), so that
+    the ``DATASUM`` can be computed without a separate pass over the data.
+    """
+
+    def __init__(self):
+        self._total = 0
+        # Up to 3 bytes left over from the previous update that don't form a
+        # whole 32-bit word yet
+        self._leftover = np.zeros(0, dtype=np.uint8)
+
+    def update(self, data):
+        data = _as_bytes(data)
+        if not len(data):
+            return
+
+        if len(self._leftover):
+            nfill = min(4 - len(self._leftover), len(data))
+            self._leftover = np.append(self._leftover, data[:nfill])
+            data = data[nfill:]
+            if len(self._leftover) < 4:
+                return
+            self._total += _sum_words(self._leftover)
+            self._leftover = np.zeros(0, dtype=np.uint8)
+
+        nbytes = len(data) // 4 * 4
+        self._total += _sum_words(data[:nbytes])
+        self._leftover = data[nbytes:].copy()
+
+    @property
+    def datasum(self):
+        """The ones-complement sum of all the data passed in so far."""
+
+        total = self._total
+        if len(self._leftover):
+            # Any trailing bytes are taken as a final zero padded word
+            tail = np.zeros(4, dtype=np.uint8)
+            tail[:len(self._leftover)] = self._leftover
+            total += _sum_words(tail)
+
+        return _fold_sum(total)
+
+
+def _block_sums(data, blocks):
+    """
+    Returns the sums of the big-endian 32-bit words, without folding in any
+    carries, in each of the given 2880 byte blocks of a uint8 array.  A
+    trailing partial block is taken as padded with zeros, as it is in a FITS
+    file.
+    """
+
+    blocks = np.asarray(blocks, dtype=np.int64)
+    sums = np.zeros(len(blocks), dtype=np.uint64)
+    nfull = len(data) // BLOCK_SIZE
+    full = blocks < nfull
+
+    if full.any():
+        words = data[:nfull * BLOCK_SIZE].view('>u4')
+        words = words.reshape((nfull, BLOCK_SIZE // 4))
+        sums[full] = words[blocks[full]].sum(axis=1, dtype=np.uint64)
+
+    for idx in np.nonzero(~full)[0]:
+        tail = np.zeros(BLOCK_SIZE, dtype=np.uint8)
+        partial = data[blocks[idx] * BLOCK_SIZE:]
+        tail[:len(partial)] = partial
+        sums[idx] = _sum_words(tail)
+
+    return sums
+
+
+def _element_blocks(shape, itemsize, key):
+    """
+    Returns the sorted indices of the 2880 byte blocks spanned by the elements
+    selected by ``key`` (any valid Numpy index) from a C-contiguous array with
+    the given shape and itemsize.
+    """
+
+    shape = tuple(shape)
+    strides = [itemsize * int(np.prod(shape[axis + 1:], dtype=np.int64))
+               for axis in range(len(shape))]
+
+    # The byte offset of each selected element is the sum of its offsets
+    # along each axis; these are indexed out of zero-strided views so that
+    # only as many offsets are computed as there are selected elements
+    offsets = 0
+    for axis, (dim, stride) in enumerate(zip(shape, strides)):
+        axis_offsets = np.arange(dim, dtype=np.int64) * stride
+        axis_strides = [0] * len(shape)
+        axis_strides[axis] = axis_offsets.itemsize
+        axis_offsets = np.lib.stride_tricks.as_strided(
+            axis_offsets, shape=shape, strides=axis_strides)
+        offsets = offsets + axis_offsets[key]
+
+    offsets = np.asarray(offsets, dtype=np.int64).ravel()
+    first = offsets // BLOCK_SIZE
+    counts = (offsets + itemsize - 1) // BLOCK_SIZE - first + 1
+
+    # Expand each element's range of blocks (usually just one) into the
+    # individual block indices
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    blocks = np.repeat(first, counts) + np.arange(counts.sum()) - starts
+    return np.unique(blocks)
+
+
 class InvalidHDUException(Exception):
     """
     A custom exception class used mainly to signal to _BaseHDU.__new__ that
@@ -161,6 +321,20 @@ class _BaseHDU(object):
         self._data_needs_rescale = False
         self._new = True
         self._output_checksum = False
+        # Set by _update_checksum when the checksum is to be computed while
+        # the HDU is being written
+        self._deferred_checksum = None
+        # Used by update_data to track changes to the data so that its
+        # DATASUM can be updated incrementally: the known DATASUM of the
+        # unmodified data, and the indices and original sums of the blocks
+        # modified since then
+        self._datasum_base = None
+        self._modified_blocks = np.zeros(0, dtype=np.int64)
+        self._modified_block_sums = np.zeros(0, dtype=np.uint64)
+        # Set by _verify_checksum_datasum when verifying the checksums in the
+        # background
+        self.checksum_future = None
+        self._wait_for_checksum = False
 
         if 'DATASUM' in self._header and 'CHECKSUM' not in self._header:
             self._output_checksum = 'datasum'
@@ -508,6 +682,10 @@ class _BaseHDU(object):
         if isinstance(shape, int):
             shape = (shape,)
 
+        if self._wait_for_checksum:
+            # Wait for the data to be verified before it's read
+            self._wait_for_checksum_verification()
+
         if self._buffer:
             return np.ndarray(shape, dtype=code, buffer=self._buffer,
                               offset=offset)
@@ -523,8 +701,9 @@ class _BaseHDU(object):
     def _prewriteto(self, checksum=False, inplace=False):
         self._update_uint_scale_keywords()
 
-        # Handle checksum
-        self._update_checksum(checksum)
+        # Handle checksum; unless updating a file in place, the checksum is
+        # computed from the data as it is written out (see _writeto)
+        self._update_checksum(checksum, defer=not inplace)
 
 
     def _update_uint_scale_keywords(self):
@@ -543,13 +722,23 @@ class _BaseHDU(object):
                              after='BSCALE')
 
     def _update_checksum(self, checksum, checksum_keyword='CHECKSUM',
-                         datasum_keyword='DATASUM'):
+                         datasum_keyword='DATASUM', defer=False):
         """Update the 'CHECKSUM' and 'DATASUM' keywords in the header (or
         keywords with equivalent semantics given by the ``checksum_keyword``
         and ``datasum_keyword`` arguments--see for example ``CompImageHDU``
         for an example of why this might need to be overridden).
+
+        If ``defer=True`` the keywords are added with placeholder values, and
+        their actual values are filled in by `_writeto` once the data has
+        been written, so that the data does not have to be read twice.
         """
 
+        if defer:
+            self._deferred_checksum = None
+            datasum = None
+        else:
+            datasum = self._incremental_datasum()
+
         # If the data is loaded it isn't necessarily 'modified', but we have no
         # way of knowing for sure
         modified = self._header._modified or self._data_loaded
@@ -563,7 +752,19 @@ class _BaseHDU(object):
         elif (modified or self._new or
                 (checksum and ('CHECKSUM' not in self._header or
                                'DATASUM' not in self._header))):
-            if checksum == 'datasum':
+            if defer and checksum:
+                self._add_checksum_placeholders(checksum, checksum_keyword,
+                                                datasum_keyword)
+            elif datasum is not None and checksum:
+                # Only the blocks modified through update_data needed to be
+                # summed
+                self._add_checksum_placeholders(checksum, checksum_keyword,
+                                                datasum_keyword)
+                self._update_deferred_checksum(datasum)
+                self._deferred_checksum = None
+                self._reset_modified_blocks(datasum)
+                return
+            elif checksum == 'datasum':
                 self.add_datasum(datasum_keyword=datasum_keyword)
             elif checksum == 'nonstandard_datasum':
                 self.add_datasum(blocking='nonstandard',
@@ -583,7 +784,107 @@ class _BaseHDU(object):
                                   checksum_keyword=checksum_keyword,
                                   datasum_keyword=datasum_keyword)
 
+            if not defer:
+                self._reset_modified_blocks()
+
+    def _data_bytes(self):
+        """
+        Returns the data as a flat uint8 array of the bytes that are, or will
+        be, written to the file, if the data can be viewed that way without a
+        conversion; otherwise returns `None`.  This is used to track changes
+        to the data for updating its DATASUM incrementally; subclasses that
+        support this override it.
+        """
+
+        return None
+
+    def _incremental_datasum(self):
+        """
+        Returns the datasum of the current data, computed from the last known
+        datasum by adding the differences of only the blocks modified through
+        `update_data`, or `None` if it can't be computed that way.
+        """
+
+        if (self._datasum_base is None or not len(self._modified_blocks) or
+                self._data_replaced or not self._data_loaded):
+            return None
+
+        data = self._data_bytes()
+        if data is None:
+            return None
+
+        new_sums = _block_sums(data, self._modified_blocks)
+        total = (self._datasum_base -
+                 int(self._modified_block_sums.sum(dtype=np.uint64)) +
+                 int(new_sums.sum(dtype=np.uint64))) % 0xFFFFFFFF
+
+        # A total of zero modulo 2**32 - 1 is ambiguous: it is either the sum
+        # of all zero data, or 0xFFFFFFFF
+        if not total:
+            return None
+
+        return np.uint32(total)
+
+    def _reset_modified_blocks(self, datasum=None):
+        """
+        Clears the blocks tracked by `update_data`, after the checksums have
+        been updated.  ``datasum`` gives the datasum of the data if it is
+        known.
+        """
+
+        self._datasum_base = datasum if datasum is None else int(datasum)
+        self._modified_blocks = np.zeros(0, dtype=np.int64)
+        self._modified_block_sums = np.zeros(0, dtype=np.uint64)
+
+    def _add_checksum_placeholders(self, checksum, checksum_keyword,
+                                   datasum_keyword):
+        """
+        Adds the checksum and/or datasum keywords requested by the
+        ``checksum`` option to the header, with placeholder values of the
+        same size as the actual values, to be filled in by
+        `_update_deferred_checksum`.
+        """
+
+        if checksum == 'test':
+            datasum_comment = self._datasum_comment
+            checksum_comment = self._checksum_comment
+        else:
+            datasum_comment = ('data unit checksum updated %s' %
+                               self._get_timestamp())
+            checksum_comment = 'HDU checksum updated %s' % self._get_timestamp()
+
+        self._header[datasum_keyword] = ('0', datasum_comment)
+
+        if checksum not in ('datasum', 'nonstandard_datasum'):
+            self._header.set(checksum_keyword, '0' * 16, checksum_comment,
+                             before=datasum_keyword)
+
+        if checksum in ('nonstandard', 'nonstandard_datasum'):
+            blocking = 'nonstandard'
+        else:
+            blocking = 'standard'
+
+        self._deferred_checksum = (checksum, blocking, checksum_keyword,
+                                   datasum_keyword)
+
+    def _update_deferred_checksum(self, datasum):
+        """
+        Fills in the values of the checksum keywords added by
+        `_add_checksum_placeholders`, given the datasum of the data.
+        """
+
+        checksum, blocking, checksum_keyword, datasum_keyword = \
+            self._deferred_checksum
+
+        self._header[datasum_keyword] = str(datasum)
+
+        if checksum not in ('datasum', 'nonstandard_datasum'):
+            self._header[checksum_keyword] = self._calculate_checksum(
+                datasum, blocking, checksum_keyword=checksum_keyword)
+
     def _postwriteto(self):
+        self._deferred_checksum = None
+
         # If data is unsigned integer 16, 32 or 64, remove the
         # BSCALE/BZERO cards
         if (self._has_data and self._standard and
@@ -686,8 +987,12 @@ class _BaseHDU(object):
     def _writeto(self, fileobj, inplace=False, copy=False):
         # For now fileobj is assumed to be a _File object
         if not inplace or self._new:
-            header_offset, _ = self._writeheader(fileobj)
-            data_offset, data_size = self._writedata(fileobj)
+            if self._deferred_checksum is not None:
+                header_offset, data_offset, data_size = \
+                    self._writeto_with_checksum(fileobj)
+            else:
+                header_offset, _ = self._writeheader(fileobj)
+                data_offset, data_size = self._writedata(fileobj)
 
             # Set the various data location attributes on newly-written HDUs
             if self._new:
@@ -748,6 +1053,56 @@ class _BaseHDU(object):
         self._data_size = datsize
         self._data_replaced = False
 
+    def _writeto_with_checksum(self, fileobj):
+        """
+        Writes the header and data of an HDU whose checksum keywords were
+        deferred by `_update_checksum`.
+
+        The datasum is accumulated while the data is written, after which the
+        header is rewritten in place with the final checksum values.  If the
+        file does not support rewriting the header (for example when writing
+        to a compressed or unseekable stream) the checksum is computed from
+        the data before anything is written, instead.
+
+        Returns the header offset, and the data offset and size.
+        """
+
+        if not fileobj.rewritable():
+            blocking = self._deferred_checksum[1]
+            self._update_deferred_checksum(self._calculate_datasum(blocking))
+            header_offset, _ = self._writeheader(fileobj)
+            data_offset, data_size = self._writedata(fileobj)
+            return header_offset, data_offset, data_size
+
+        header_offset, header_size = self._writeheader(fileobj)
+
+        fileobj._datasum = _StreamingDatasum()
+        try:
+            data_offset, data_size = self._writedata(fileobj)
+            datasum = fileobj._datasum.datasum
+        finally:
+            fileobj._datasum = None
+
+        self._update_deferred_checksum(datasum)
+
+        # The header keeps the same size, since only the values of existing
+        # cards were changed
+        fileobj.seek(header_offset)
+        self._writeheader(fileobj)
+        fileobj.seek(data_offset + data_size)
+
+        return header_offset, data_offset, data_size
+
+    def _wait_for_checksum_verification(self):
+        """
+        Waits for the verification of the HDU's checksums in the background,
+        if any, to finish.
+        """
+
+        future = self.checksum_future
+        if future is not None and not future.cancelled():
+            future.result()
+
     def _close(self, closed=True):
         # If the data was mmap'd, close the underlying mmap (this will
         # prevent any future access to the .data attribute if there are
@@ -1276,6 +1631,68 @@ class _ValidHDU(_BaseHDU, _Verify):
 
         return errs
 
+    def update_data(self, key, value):
+        """
+        Assign ``value`` to ``self.data[key]``, keeping track of which 2880
+        byte blocks of the data are modified.
+
+        If the HDU has ``CHECKSUM`` and/or ``DATASUM`` keywords this allows
+        them to be updated when the file is flushed in ``update`` mode by
+        summing just the modified blocks, rather than all of the data, which
+        is much faster when patching a few pixels or rows of a large HDU.
+        This requires the ``DATASUM`` of the unmodified data: it is known if
+        it was verified when the file was opened with ``checksum=True``, and
+        is otherwise computed from the data on the first call to this method.
+
+        Parameters
+        ----------
+        key
+            Any index into the data, such as a tuple of slices or a boolean
+            mask for an image, or row indices or a column name for a table.
+
+        value
+            The value or array of values to assign to ``self.data[key]``.
+
+        Notes
+        -----
+        Changes made to the data directly, rather than with this method, are
+        not tracked, so they should not be combined with calls to this method
+        before the file is flushed.  The checksums are only updated
+        incrementally for data that is stored in the file as is, such as
+        unscaled images, and tables without scaled columns; otherwise they are
+        computed from all of the data as usual.
+        """
+
+        data = self.data
+        raw = None
+        if self._output_checksum and not self._data_replaced:
+            raw = self._data_bytes()
+
+        if raw is None:
+            data[key] = value
+            return
+
+        # The verification of the DATASUM may still be running
+        self._wait_for_checksum_verification()
+
+        if self._datasum_base is None:
+            self._datasum_base = int(self._calculate_datasum('standard'))
+
+        if isinstance(key, string_types):
+            # A table column; all the rows are treated as modified
+            blocks = _element_blocks(data.shape, data.itemsize, Ellipsis)
+        else:
+            blocks = _element_blocks(data.shape, data.itemsize, key)
+
+        # Record the original sums of any blocks that weren't already modified
+        blocks = blocks[~np.in1d(blocks, self._modified_blocks)]
+        self._modified_blocks = np.concatenate((self._modified_blocks,
+                                                blocks))
+        self._modified_block_sums = np.concatenate(
+            (self._modified_block_sums, _block_sums(raw, blocks)))
+
+        data[key] = value
+
     def add_datasum(self, when=None, blocking='standard',
                     datasum_keyword='DATASUM'):
         """
@@ -1442,10 +1859,17 @@ class _ValidHDU(_BaseHDU, _Verify):
         else:
             return 2
 
-    def _verify_checksum_datasum(self, blocking):
+    def _verify_checksum_datasum(self, blocking, executor=None, wait=False):
         """
         Verify the checksum/datasum values if the cards exist in the header.
         Simply displays warnings if either the checksum or datasum don't match.
+
+        If an ``executor`` (a `concurrent.futures.Executor`) is given, the
+        verification is instead submitted to it, and the ``checksum_future``
+        attribute is set to its future.  The data is then read from a
+        separate handle to the file, so that the HDU can be used while it is
+        being verified.  If ``wait=True`` reading the HDU's data waits for
+        the verification to finish.
         """
 
         # NOTE:  private data members _checksum and _datasum are
@@ -1455,9 +1879,6 @@ class _ValidHDU(_BaseHDU, _Verify):
         if 'CHECKSUM' in self._header:
             self._checksum = self._header['CHECKSUM']
             self._checksum_comment = self._header.comments['CHECKSUM']
-            if not self.verify_checksum(blocking):
-                warnings.warn('Checksum verification failed for HDU %s.\n' %
-                              ((self.name, self.ver),))
         else:
             self._checksum = None
             self._checksum_comment = None
@@ -1465,16 +1886,112 @@ class _ValidHDU(_BaseHDU, _Verify):
         if 'DATASUM' in self._header:
             self._datasum = self._header['DATASUM']
             self._datasum_comment = self._header.comments['DATASUM']
-
-            if not self.verify_datasum(blocking):
-                warnings.warn('Datasum verification failed for HDU %s.\n' %
-                              ((self.name, self.ver),))
         else:
             self._checksum = None
             self._checksum_comment = None
             self._datasum = None
             self._datasum_comment = None
 
+        if executor is None:
+            if 'CHECKSUM' in self._header:
+                checksum_valid = self.verify_checksum(blocking)
+            else:
+                checksum_valid = 2
+
+            if 'DATASUM' in self._header:
+                datasum_valid = self.verify_datasum(blocking)
+            else:
+                datasum_valid = 2
+
+            self._report_checksum_verification(checksum_valid, datasum_valid)
+            return
+
+        # The header values are read here, rather than in the background
+        # thread, in case the header is modified in the meantime
+        if 'CHECKSUM' in self._header:
+            checksum = (self._header['CHECKSUM'],
+                        self._header_str_for_checksum())
+        else:
+            checksum = None
+
+        datasum = self._header.get('DATASUM')
+        data_size = self._data_size if self.size > 0 else 0
+
+        self._wait_for_checksum = wait
+        self.checksum_future = executor.submit(
+            self._verify_checksum_datasum_from_file, self._file.name,
+            self._data_offset, data_size, checksum, datasum, blocking)
+
+    def _verify_checksum_datasum_from_file(self, filename, data_offset,
+                                           data_size, checksum, datasum,
+                                           blocking):
+        """
+        Verifies the checksums of the HDU by reading its data from a new
+        handle to the file it was read from; this is run in a background
+        thread by `_verify_checksum_datasum`.
+
+        ``checksum`` is a tuple of the value of the ``CHECKSUM`` keyword and
+        the header string it is computed from, and ``datasum`` the value of
+        the ``DATASUM`` keyword (either may be `None` if the keyword is not
+        present).
+
+        Returns the results of the verification of the checksum and datasum,
+        with the same values as `verify_checksum` and `verify_datasum`.
+        """
+
+        if datasum is not None and data_size > 0:
+            stream = _StreamingDatasum()
+            fileobj = _File(filename, mode='readonly', memmap=False)
+            try:
+                fileobj.seek(data_offset)
+                remaining = data_size
+                while remaining > 0:
+                    chunk = fileobj.read(min(remaining, _CHECKSUM_READ_SIZE))
+                    if not chunk:
+                        break
+                    stream.update(chunk)
+                    remaining -= len(chunk)
+            finally:
+                fileobj.close()
+            data_cs = stream.datasum
+        else:
+            data_cs = 0
+
+        if checksum is None:
+            checksum_valid = 2
+        else:
+            checksum, header_str = checksum
+            cs = self._compute_checksum(
+                np.frombuffer(encode_ascii(header_str), dtype=np.uint8),
+                data_cs, blocking=blocking)
+            checksum_valid = int(self._char_encode(~cs) == checksum)
+
+        if datasum is None:
+            datasum_valid = 2
+        else:
+            datasum_valid = int(data_cs == int(datasum))
+
+        self._report_checksum_verification(checksum_valid, datasum_valid)
+        return checksum_valid, datasum_valid
+
+    def _report_checksum_verification(self, checksum_valid, datasum_valid):
+        """
+        Warns about failed checksum verifications, given the results of
+        `verify_checksum` and `verify_datasum`.
+        """
+
+        if not checksum_valid:
+            warnings.warn('Checksum verification failed for HDU %s.\n' %
+                          ((self.name, self.ver),))
+
+        if not datasum_valid:
+            warnings.warn('Datasum verification failed for HDU %s.\n' %
+                          ((self.name, self.ver),))
+        elif datasum_valid == 1:
+            # The DATASUM is known to be correct, so it can be updated
+            # incrementally if the data is modified with update_data
+            self._datasum_base = int(self._datasum)
+
     def _get_timestamp(self):
         """
         Return the current timestamp in ISO 8601 format, with microseconds
@@ -1512,23 +2029,30 @@ class _ValidHDU(_BaseHDU, _Verify):
         Calculate the value of the ``CHECKSUM`` card in the HDU.
         """
 
-        old_checksum = self._header[checksum_keyword]
-        self._header[checksum_keyword] = '0' * 16
-
         # Convert the header to a string.
-        s = str(self._header)
+        s = self._header_str_for_checksum(checksum_keyword)
 
         # Calculate the checksum of the Header and data.
         cs = self._compute_checksum(np.fromstring(s, dtype='ubyte'), datasum,
                                     blocking=blocking)
 
         # Encode the checksum into a string.
-        s = self._char_encode(~cs)
+        return self._char_encode(~cs)
 
-        # Return the header card value.
-        self._header[checksum_keyword] = old_checksum
+    def _header_str_for_checksum(self, checksum_keyword='CHECKSUM'):
+        """
+        Returns the header as a string, with the checksum card value set to
+        all zeros as it is when the checksum is calculated.
+        """
+
+        old_checksum = self._header[checksum_keyword]
+        self._header[checksum_keyword] = '0' * 16
 
-        return s
+        try:
+            return str(self._header)
+        finally:
+            # Return the header card value.
+            self._header[checksum_keyword] = old_checksum
 
     def _compute_checksum(self, data, sum32=0, blocking="standard"):
         """
@@ -1553,62 +2077,26 @@ class _ValidHDU(_BaseHDU, _Verify):
         Returns
         -------
         ones complement checksum
-        """
-
-        blocklen = {'standard': 2880,
-                    'nonstandard': len(data),
-                    'either': 2880,  # do standard first
-                    True: 2880}[blocking]
-
-        sum32 = np.uint32(sum32)
-        for i in range(0, len(data), blocklen):
-            length = min(blocklen, len(data) - i)   # ????
-            sum32 = self._compute_hdu_checksum(data[i:i + length], sum32)
-        return sum32
-
-    def _compute_hdu_checksum(self, data, sum32=0):
-        """
-        Translated from FITS Checksum Proposal by Seaman, Pence, and Rots.
-        Use uint32 literals as a hedge against type promotion to int64.
-
-        This code should only be called with blocks of 2880 bytes
-        Longer blocks result in non-standard checksums with carry overflow
-        Historically,  this code *was* called with larger blocks and for that
-        reason still needs to be for backward compatibility.
-        """
 
-        u8 = np.uint32(8)
-        u16 = np.uint32(16)
-        uFFFF = np.uint32(0xFFFF)
-
-        if data.nbytes % 2:
-            last = data[-1]
-            data = data[:-1]
-        else:
-            last = np.uint32(0)
-
-        data = data.view('>u2')
-
-        hi = sum32 >> u16
-        lo = sum32 & uFFFF
-        hi += np.add.reduce(data[0::2], dtype=np.uint64)
-        lo += np.add.reduce(data[1::2], dtype=np.uint64)
-
-        if (data.nbytes // 2) % 2:
-            lo += last << u8
-        else:
-            hi += last << u8
-
-        hicarry = hi >> u16
-        locarry = lo >> u16
-
-        while hicarry or locarry:
-            hi = (hi & uFFFF) + locarry
-            lo = (lo & uFFFF) + hicarry
-            hicarry = hi >> u16
-            locarry = lo >> u16
-
-        return (hi << u16) + lo
+        Notes
+        -----
+        The algorithm is translated from the FITS Checksum Proposal by Seaman,
+        Pence, and Rots: the data is summed as big-endian 32-bit integers
+        (zero padded to a multiple of 4 bytes) with end-around carry.  Since
+        ones-complement addition is associative, folding the carries once
+        over the whole buffer gives the same result as folding them after
+        each 2880 byte block, so the result is the same for either blocking.
+        This allows the sum to be computed with a few large array reductions
+        rather than one per block.
+        """
+
+        if blocking not in ('standard', 'nonstandard', 'either', True):
+            raise ValueError('Invalid checksum blocking: %r' % (blocking,))
+
+        datasum = _StreamingDatasum()
+        datasum._total = int(sum32)
+        datasum.update(data)
+        return datasum.datasum
 
     # _MASK and _EXCLUDE used for encoding the checksum value into a character
     # string.
@@ -1,7 +1,9 @@
 import ctypes
 import gc
+import itertools
 import math
 import re
+import threading
 import time
 import warnings
 
@@ -11,16 +13,17 @@ from ..extern.six import string_types, iteritems
 from ..extern.six.moves import range
 
 from ..card import Card
-from ..column import Column, ColDefs, TDEF_RE
+from ..column import Column, ColDefs, TDEF_RE, _FormatP
 from ..column import KEYWORD_NAMES as TABLE_KEYWORD_NAMES
-from ..fitsrec import FITS_rec
+from ..fitsrec import FITS_rec, _heap_extent
 from ..header import Header
-from ..py3compat import ignored
+from ..py3compat import ignored, OrderedDict
 from ..util import (lazyproperty, _is_pseudo_unsigned, _unsigned_zero,
+                    _pad_length, _output_array,
                     deprecated, _is_int, _get_array_mmap,
                     PyfitsPendingDeprecationWarning)
 from .base import DELAYED, ExtensionHDU, BITPIX2DTYPE, DTYPE2BITPIX
-from .image import _ImageBaseHDU, ImageHDU
+from .image import _ImageBaseHDU, ImageHDU, Section
 from .table import BinTableHDU
 
 try:
@@ -53,6 +56,10 @@ DEFAULT_HCOMP_SMOOTH = 0
 DEFAULT_BLOCK_SIZE = 32
 DEFAULT_BYTE_PIX = 4
 
+# Default limit, in bytes, on the decompressed tiles kept by
+# CompImageHDU.section
+DEFAULT_TILE_CACHE_SIZE = 64 * 1024 * 1024
+
 CMTYPE_ALIASES = {}
 
 # CFITSIO version-specific features
@@ -391,7 +398,7 @@ class CompImageHDU(BinTableHDU):
                  quantize_method=DEFAULT_QUANTIZE_METHOD,
                  dither_seed=DEFAULT_DITHER_SEED,
                  do_not_scale_image_data=False,
-                 uint=False, scale_back=False, **kwargs):
+                 uint=False, scale_back=False, threads=1, **kwargs):
         """
         Parameters
         ----------
@@ -436,6 +443,13 @@ class CompImageHDU(BinTableHDU):
             range 1 to 1000 (inclusive), ``DITHER_SEED_CLOCK`` (0; default), or
             ``DITHER_SEED_CHECKSUM`` (-1); see note below
 
+        threads : int, optional
+            Number of threads to use to compress the image tiles when the HDU
+            is written, and to decompress them when the data is read (default
+            1).  The image is divided into that many sections of whole tiles,
+            which are processed concurrently; the compressed data is the same
+            regardless of the number of threads.
+
         Notes
         -----
         The pyfits module supports 2 methods of image compression.
@@ -462,9 +476,9 @@ class CompImageHDU(BinTableHDU):
                pyfits module recognizes that this binary table extension
                contains an image and treats it as if it were an image
                extension.  Under this tile-compression format, FITS header
-               keywords remain uncompressed.  At this time, pyfits does not
-               support the ability to extract and uncompress sections of the
-               image without having to uncompress the entire image.
+               keywords remain uncompressed.  Sections of the image can be
+               extracted with the `CompImageHDU.section` attribute, which
+               uncompresses only the tiles that overlap the section.
 
         The pyfits module supports 3 general-purpose compression algorithms
         plus one other special-purpose compression technique that is designed
@@ -641,6 +655,12 @@ class CompImageHDU(BinTableHDU):
         self._do_not_scale_image_data = do_not_scale_image_data
         self._uint = uint
         self._scale_back = scale_back
+        self._threads = threads
+
+        # The rows of the compressed table (that is, the tiles) modified with
+        # update_data, or None if changes to the data are not being tracked
+        self._modified_tiles = None
+        self._tile_updates = None
 
         self._axes = [self._header.get('ZNAXIS' + str(axis + 1), 0)
                       for axis in range(self._header.get('ZNAXIS', 0))]
@@ -1371,7 +1391,11 @@ class CompImageHDU(BinTableHDU):
     @lazyproperty
     def data(self):
         # The data attribute is the image data (not the table data).
-        data = compression.decompress_hdu(self)
+        data = None
+        if self._threads > 1 and compression.CFITSIO_IS_REENTRANT:
+            data = self._decompress_sections(self._threads)
+        if data is None:
+            data = compression.decompress_hdu(self)
 
         if data is None:
             return data
@@ -1415,6 +1439,9 @@ class CompImageHDU(BinTableHDU):
                             'dtype.fields = %s' %
                             (type(data), data.dtype.fields))
 
+        # Changes to new data can't be tracked tile by tile
+        self._modified_tiles = None
+
     @lazyproperty
     def compressed_data(self):
         # First we will get the table data (the compressed
@@ -1469,6 +1496,60 @@ class CompImageHDU(BinTableHDU):
         # Determine from the values read from the header
         return tuple(reversed(self._axes))
 
+    @lazyproperty
+    def section(self):
+        """
+        Access a section of the image array without decompressing the entire
+        image.  Slices of the :class:`CompImageSection` returned by this
+        attribute decompress only the tiles that overlap the slice, and return
+        the corresponding section of the (scaled) image data.
+
+        Decompressed tiles are kept in a bounded cache, so that reading
+        neighboring or overlapping sections does not decompress the same
+        tiles again.
+        """
+
+        return CompImageSection(self)
+
+    def update_data(self, key, value):
+        """
+        Assign ``value`` to ``self.data[key]``, keeping track of which
+        compression tiles of the image are modified.
+
+        When a file opened in ``update`` mode is flushed, only the modified
+        tiles are recompressed, instead of the whole image.  Each new tile is
+        written over the old one if it fits, or else into space in the heap
+        left unused by previously replaced tiles, or appended to the heap,
+        and the table is updated to point to it.  Only the table and the new
+        tiles are written to the file, unless the heap grows past the last
+        2880 byte block of the HDU, in which case the file must be resized.
+
+        Parameters
+        ----------
+        key
+            Any index into the image data, such as a tuple of slices or a
+            boolean mask.
+
+        value
+            The value or array of values to assign to ``self.data[key]``.
+
+        Notes
+        -----
+        Once this method has been used, changes made to the data directly,
+        rather than with this method, are not tracked, and are not written to
+        the file when it is updated; assigning new data to the HDU resets
+        this.  Tiles are only recompressed individually for unscaled images
+        (without ``BSCALE``/``BZERO``); otherwise the whole image is
+        recompressed as usual.
+        """
+
+        rows = self._tiles_for_key(key)
+        self.data[key] = value
+
+        if self._modified_tiles is None:
+            self._modified_tiles = set()
+        self._modified_tiles.update(rows.tolist())
+
     @lazyproperty
     def header(self):
         # The header attribute is the header for the image data.  It
@@ -1633,6 +1714,9 @@ class CompImageHDU(BinTableHDU):
         if image_bitpix != self._orig_bitpix or self.data.shape != self.shape:
             self._update_header_data(self.header)
 
+        # Assigning the data below resets the tracking of modified tiles
+        modified_tiles = self._modified_tiles
+
         # TODO: This is copied right out of _ImageBaseHDU._writedata_internal;
         # it would be cool if we could use an internal ImageHDU and use that to
         # write to a buffer for compression or something. See ticket #88
@@ -1669,22 +1753,339 @@ class CompImageHDU(BinTableHDU):
             # self.compressed_data, and writes directly to it
             # compress_hdu returns the size of the heap for the written
             # compressed image table
-            heapsize, self.compressed_data = compression.compress_hdu(self)
+            compressed = None
+            if self._threads > 1 and compression.CFITSIO_IS_REENTRANT:
+                compressed = self._compress_sections(self._threads)
+            if compressed is None:
+                compressed = compression.compress_hdu(self)
+            heapsize, buf = compressed
+
+            # Any tiles decompressed from the old compressed data are stale
+            if 'section' in self.__dict__:
+                self.section.clear_cache()
         finally:
             # if data was byteswapped return it to its original order
             if should_swap:
                 self.data.byteswap(True)
             self.data = old_data
 
+        self._set_compressed_data(buf, heapsize)
+
+        # The whole image is now compressed, so any modified tiles are too
+        if modified_tiles is not None:
+            self._modified_tiles = set()
+
+    def _set_compressed_data(self, buf, heapsize):
+        """
+        Sets the ``compressed_data`` to the compressed image table and heap
+        laid out in the byte array ``buf`` by CFITSIO.
+        """
+
         # CFITSIO will write the compressed data in big-endian order
         dtype = self.columns.dtype.newbyteorder('>')
-        buf = self.compressed_data
-        compressed_data = buf[:self._theap].view(dtype=dtype,
-                                                 type=np.rec.recarray)
+        tbsize = self._header['NAXIS1'] * self._header['NAXIS2']
+        compressed_data = buf[:tbsize].view(dtype=dtype,
+                                            type=np.rec.recarray)
         self.compressed_data = compressed_data.view(FITS_rec)
         self.compressed_data._coldefs = self.columns
         self.compressed_data._heapoffset = self._theap
         self.compressed_data._heapsize = heapsize
+        self.compressed_data._gap = self._theap - tbsize
+
+    def _tile_sections(self, nsections):
+        """
+        Divides the image along its last FITS axis into up to ``nsections``
+        sections made up of whole tiles, so that each section is a contiguous
+        slice of the data and a contiguous range of rows of the compressed
+        table.
+
+        Returns a list of ``(data_slice, first_pixel, last_pixel, rows)`` for
+        each section, where ``data_slice`` is the section's slice of the first
+        axis of the data, ``first_pixel`` and ``last_pixel`` are its bounds as
+        1-based FITS pixel coordinates, and ``rows`` is the slice of the
+        compressed table holding its tiles.
+        """
+
+        shape = self.shape
+        naxis = len(shape)
+        if not naxis:
+            return []
+
+        tile = self._header.get('ZTILE%d' % naxis, 1)
+        nlayers = -(-shape[0] // tile)
+        nsections = min(nsections, nlayers)
+
+        # The number of tiles (and so of table rows) in each layer of tiles
+        # along the last FITS axis
+        layer_rows = 1
+        for idx in range(1, naxis):
+            layer_rows *= -(-shape[idx] //
+                            self._header.get('ZTILE%d' % (naxis - idx), 1))
+
+        sections = []
+        for idx in range(nsections):
+            first_layer = nlayers * idx // nsections
+            last_layer = nlayers * (idx + 1) // nsections
+            start = first_layer * tile
+            stop = min(last_layer * tile, shape[0])
+            sections.append((slice(start, stop),
+                             [1] * (naxis - 1) + [start + 1],
+                             list(reversed(shape[1:])) + [stop],
+                             slice(first_layer * layer_rows,
+                                   last_layer * layer_rows)))
+        return sections
+
+    def _compress_sections(self, nsections):
+        """
+        Compresses the image as up to ``nsections`` sections of whole tiles,
+        each in its own thread, and combines the results into the same
+        compressed table and heap that `compression.compress_hdu` returns.
+
+        Returns `None` if the image has too few tiles to be divided up.
+        """
+
+        sections = self._tile_sections(nsections)
+        if len(sections) < 2:
+            return None
+
+        results = [None] * len(sections)
+
+        def compress_section(idx):
+            data_slice, first_pixel, last_pixel, _ = sections[idx]
+            results[idx] = compression.compress_hdu_section(
+                self, self.data[data_slice], first_pixel, last_pixel)
+
+        _run_in_threads(compress_section, len(sections))
+
+        # Each section's heap holds just its own tiles, in order, so the full
+        # heap is the concatenation of the sections' heaps, and the
+        # descriptors of each section's rows are offset by the size of the
+        # preceding heaps
+        tbsize = self._theap
+        heapsize = sum(section_heapsize for section_heapsize, _ in results)
+        buf = np.empty(tbsize + heapsize, dtype=np.uint8)
+        dtype = self.columns.dtype.newbyteorder('>')
+        table = buf[:tbsize].view(dtype)
+
+        heap_offset = 0
+        for section, (section_heapsize, section_buf) in zip(sections, results):
+            rows = section[3]
+            table[rows] = section_buf[:tbsize].view(dtype)[rows]
+            buf[tbsize + heap_offset:tbsize + heap_offset + section_heapsize] = \
+                section_buf[tbsize:]
+            _offset_descriptors(table, rows, self.columns, heap_offset)
+            heap_offset += section_heapsize
+
+        return heapsize, buf
+
+    def _decompress_sections(self, nsections):
+        """
+        Decompresses the image as up to ``nsections`` sections of whole tiles,
+        each in its own thread, directly into the corresponding slices of a
+        single output array.
+
+        Returns `None` if the image has too few tiles to be divided up.
+        """
+
+        sections = self._tile_sections(nsections)
+        if len(sections) < 2:
+            return None
+
+        # The compression module returns BITPIX=8 images as signed bytes
+        if self._orig_bitpix == 8:
+            dtype = np.dtype('int8')
+        else:
+            dtype = np.dtype(BITPIX2DTYPE[self._orig_bitpix])
+        data = np.empty(self.shape, dtype=dtype)
+
+        def decompress_section(idx):
+            data_slice, first_pixel, last_pixel, _ = sections[idx]
+            compression.decompress_hdu_section(self, first_pixel, last_pixel,
+                                               data[data_slice])
+
+        _run_in_threads(decompress_section, len(sections))
+
+        return data
+
+    def _tile_grid(self):
+        """
+        Returns the shape of the compression tiles, and the number of tiles
+        along each axis, in the order of the axes of the image data array.
+        """
+
+        naxis = len(self.shape)
+        tile_shape = tuple(self._header.get('ZTILE%d' % (naxis - idx), 1)
+                           for idx in range(naxis))
+        ntiles = tuple(-(-length // tile)
+                       for length, tile in zip(self.shape, tile_shape))
+        return tile_shape, ntiles
+
+    def _tiles_for_key(self, key):
+        """
+        Returns the rows of the compressed table (that is, the tiles) holding
+        the elements of the image data selected by ``key``.
+
+        Rows of tiles along each axis are selected as a whole when there is
+        an array index for more than one axis, so the result may include
+        tiles which are not actually selected.
+        """
+
+        tile_shape, ntiles = self._tile_grid()
+        naxis = len(tile_shape)
+
+        if (isinstance(key, np.ndarray) and key.dtype == np.bool_ and
+                key.shape == self.shape):
+            indices = np.nonzero(key)
+            rows = np.ravel_multi_index(
+                tuple(idx // tile for idx, tile in zip(indices, tile_shape)),
+                ntiles)
+            return np.unique(rows)
+
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        ellipsis = [k is Ellipsis for k in key]
+        if any(ellipsis):
+            idx = ellipsis.index(True)
+            key = (key[:idx] + (slice(None),) * (naxis - len(key) + 1) +
+                   key[idx + 1:])
+        key += (slice(None),) * (naxis - len(key))
+
+        if len(key) != naxis or any(k is None for k in key):
+            # Anything more complicated just marks all the tiles
+            return np.arange(np.prod(ntiles))
+
+        axis_tiles = []
+        for k, length, tile in zip(key, self.shape, tile_shape):
+            selected = np.zeros(length, dtype=bool)
+            selected[k] = True
+            axis_tiles.append(np.unique(np.nonzero(selected)[0] // tile))
+
+        grid = np.meshgrid(*axis_tiles, indexing='ij')
+        return np.ravel_multi_index(tuple(g.ravel() for g in grid), ntiles)
+
+    def _update_compressed_tiles(self):
+        """
+        Recompresses only the tiles modified with `update_data`, replacing
+        them in a copy of the compressed data read from the file.
+
+        Each new compressed tile is written to the first unused space in the
+        heap that is large enough, which includes the space used by the old
+        tile and by tiles that were previously replaced, or else appended to
+        the heap.  The table and the new tiles are saved in
+        ``_tile_updates`` so that `_writedata` can write just those parts of
+        the data when the file is updated in place.
+
+        Returns `False` if the tiles can't be updated individually, in which
+        case the whole image must be recompressed.
+        """
+
+        if (self._modified_tiles is None or self._new or
+                self._file is None or not self._file.rewritable() or
+                self._orig_bscale != 1 or self._orig_bzero != 0 or
+                self.data.shape != self.shape or
+                self.data.dtype.name != BITPIX2DTYPE[self._orig_bitpix]):
+            return False
+
+        raw = self.compressed_data._get_raw_data()
+        if raw is None:
+            return False
+        raw = raw.view(np.ubyte)
+
+        header = self._header
+        nrows = header['NAXIS2']
+        tbsize = header['NAXIS1'] * nrows
+        theap = self._theap
+        dtype = self.columns.dtype.newbyteorder('>')
+        table = raw[:tbsize].view(dtype).copy()
+
+        var_columns = [(col.name, np.dtype(format.dtype).itemsize)
+                       for col, format in zip(self.columns,
+                                              self.columns._recformats)
+                       if isinstance(format, _FormatP)]
+
+        # Tiles replaced by earlier updates may have left unused space in the
+        # heap, so it extends to the end of its last array
+        heapsize = 0
+        for name, itemsize in var_columns:
+            heapsize = max(heapsize, _heap_extent(table[name], itemsize))
+
+        rows = sorted(self._modified_tiles)
+        tile_shape, ntiles = self._tile_grid()
+        results = [None] * len(rows)
+
+        def compress_tiles(thread_idx, nthreads):
+            for idx in range(thread_idx, len(rows), nthreads):
+                tile = np.unravel_index(rows[idx], ntiles)
+                start = [t * size for t, size in zip(tile, tile_shape)]
+                stop = [min(first + size, length) for first, size, length
+                        in zip(start, tile_shape, self.shape)]
+                data = self.data[tuple(slice(first, last)
+                                       for first, last in zip(start, stop))]
+                data = np.ascontiguousarray(
+                    data, dtype=data.dtype.newbyteorder('='))
+                results[idx] = compression.compress_hdu_section(
+                    self, data, [first + 1 for first in reversed(start)],
+                    list(reversed(stop)))
+
+        # The tiles are compressed on their own, into an otherwise empty heap
+        pcount = header['PCOUNT']
+        header['PCOUNT'] = 0
+        try:
+            nthreads = min(self._threads, len(rows))
+            if nthreads > 1 and compression.CFITSIO_IS_REENTRANT:
+                _run_in_threads(lambda idx: compress_tiles(idx, nthreads),
+                                nthreads)
+            else:
+                compress_tiles(0, 1)
+        finally:
+            header['PCOUNT'] = pcount
+
+        # Find the unused space in the heap, not counting the old tiles
+        unchanged = np.ones(nrows, dtype=bool)
+        unchanged[rows] = False
+        starts = []
+        ends = []
+        for name, itemsize in var_columns:
+            descriptors = table[name][unchanged]
+            descriptors = descriptors[descriptors[:, 0] > 0]
+            starts.append(descriptors[:, 1].astype(np.int64))
+            ends.append(starts[-1] + descriptors[:, 0] * itemsize)
+        gaps = _heap_gaps(np.concatenate(starts), np.concatenate(ends))
+
+        writes = []
+        new_heapsize = heapsize
+        for row, (_, tile_buf) in zip(rows, results):
+            tile_table = tile_buf[:tbsize].view(dtype)
+            table[row] = tile_table[row]
+            for name, itemsize in var_columns:
+                count, offset = tile_table[name][row]
+                if count == 0:
+                    continue
+                nbytes = count * itemsize
+                position = _heap_allocate(gaps, nbytes)
+                table[name][row] = (count, position)
+                offset += theap
+                writes.append((theap + position,
+                               tile_buf[offset:offset + nbytes]))
+                new_heapsize = max(new_heapsize, position + nbytes)
+
+        buf = np.zeros(theap + new_heapsize, dtype=np.ubyte)
+        buf[:theap + heapsize] = raw[:theap + heapsize]
+        buf[:tbsize] = table.view(np.ubyte)
+        for offset, data in writes:
+            buf[offset:offset + len(data)] = data
+
+        del self.compressed_data
+        self._set_compressed_data(buf, new_heapsize)
+        self._tile_updates = [(0, buf[:tbsize])] + writes
+        self._modified_tiles = set()
+
+        # Any tiles decompressed from the old compressed data are stale
+        if 'section' in self.__dict__:
+            self.section.clear_cache()
+
+        return True
 
     @deprecated('3.2', alternative='(refactor your code)')
     def updateCompressedData(self):
@@ -1805,7 +2206,10 @@ class CompImageHDU(BinTableHDU):
             self.scale(BITPIX2DTYPE[self._orig_bitpix])
 
         if self._has_data:
-            self._update_compressed_data()
+            # When updating a file in place, try to recompress only the tiles
+            # modified with update_data
+            if not (inplace and self._update_compressed_tiles()):
+                self._update_compressed_data()
 
             # Use methods in the superclass to update the header with
             # scale/checksum keywords based on the data type of the image data
@@ -1851,7 +2255,22 @@ class CompImageHDU(BinTableHDU):
         attribute to the uncompressed image data in the case of an exception.
         """
 
+        updates = self._tile_updates
+        self._tile_updates = None
+
         try:
+            if updates is not None and fileobj is self._file:
+                size = self.compressed_data._heapoffset
+                size += self.compressed_data._heapsize
+                if size + _pad_length(size) == self._data_size:
+                    # Only the table and the replaced tiles need to be
+                    # written over the existing data
+                    for offset, data in updates:
+                        fileobj.seek(self._data_offset + offset)
+                        fileobj.writearray(data)
+                    fileobj.flush()
+                    return self._data_offset, self._data_size
+
             return super(CompImageHDU, self)._writedata(fileobj)
         finally:
             # Restore the .data attribute to its rightful value (if any)
@@ -1919,7 +2338,7 @@ class CompImageHDU(BinTableHDU):
             self._bscale = 1
             self._bitpix = self.header['BITPIX']
 
-    def _generate_dither_seed(self, seed):
+    def _generate_dither_seed(self, seed, data=None):
         if not _is_int(seed):
             raise TypeError("Seed must be an integer")
 
@@ -1938,18 +2357,21 @@ class CompImageHDU(BinTableHDU):
             tile_dims.reverse()
 
             # Get the first tile by using the tile dimensions as the end
-            # indices of slices (starting from 0)
-            first_tile = self.data[tuple(slice(d) for d in tile_dims)]
+            # indices of slices (starting from 0); the data may also be
+            # given explicitly if it is not (all) held in self.data
+            if data is None:
+                data = self.data
+            first_tile = data[tuple(slice(d) for d in tile_dims)]
 
             # The checksum algorithm used is literally just the sum of the bytes
             # of the tile data (not its actual floating point values).  Integer
             # overflow is irrelevant.
-            csum = first_tile.view(dtype='uint8').sum()
+            csum = np.ascontiguousarray(first_tile).view(dtype='uint8').sum()
 
             # Since CFITSIO uses an unsigned long (which may be different on
             # different platforms) go ahead and truncate the sum to its
             # unsigned long value and take the result modulo 10000
-            return (ctypes.c_ulong(csum).value % 10000) + 1
+            return int(ctypes.c_ulong(csum).value % 10000) + 1
         elif seed == DITHER_SEED_CLOCK:
             # This isn't exactly the same algorithm as CFITSIO, but that's okay
             # since the result is meant to be arbitrary. The primary difference
@@ -1961,3 +2383,272 @@ class CompImageHDU(BinTableHDU):
                     10000) + 1
         else:
             return seed
+
+
+class CompImageSection(Section):
+    """
+    Compressed image section.
+
+    Slices of this object decompress only the tiles of a compressed image that
+    overlap the slice, and return the corresponding section of the image data
+    with any BSCALE/BZERO factors applied.  If the image data has already been
+    loaded the slice is simply taken from `CompImageHDU.data`.
+
+    Decompressed tiles are kept in a least recently used cache, holding up to
+    ``cache_size`` bytes of tile data, so that reading a series of nearby
+    sections of an image decompresses each tile only once.
+
+    Like `Section`, compressed image sections cannot be assigned to.
+    """
+
+    def __init__(self, hdu, cache_size=DEFAULT_TILE_CACHE_SIZE):
+        super(CompImageSection, self).__init__(hdu)
+        self.cache_size = cache_size
+        self._tile_cache = OrderedDict()
+        self._tile_cache_nbytes = 0
+
+    def clear_cache(self):
+        """Discard all decompressed tiles kept by this section."""
+
+        self._tile_cache.clear()
+        self._tile_cache_nbytes = 0
+
+    def _getsection(self, keys, out=None, dtype=None):
+        hdu = self.hdu
+
+        if hdu._data_loaded:
+            data = self._index_array(hdu.data, keys)
+            if out is None and dtype is None:
+                return data
+            result = _output_array(out, data.shape, dtype)
+            result[...] = data
+            return result
+
+        shape = hdu.shape
+        naxis = len(shape)
+        # Tile dimensions, in the same (C) axis order as the image shape
+        tile_shape = tuple(hdu._header.get('ZTILE%d' % (naxis - idx),
+                                           shape[idx] if idx == naxis - 1
+                                           else 1)
+                           for idx in range(naxis))
+        ntiles = [-(-axis // tile) for axis, tile in zip(shape, tile_shape)]
+
+        indices = []
+        out_shape = []
+        for key, axis in zip(keys, shape):
+            if _is_int(key):
+                indices.append(np.array([np.arange(axis)[key]]))
+            else:
+                if isinstance(key, slice):
+                    idx = np.arange(*key.indices(axis))
+                else:
+                    idx = np.arange(axis)[key]
+                indices.append(idx)
+                out_shape.append(len(idx))
+
+        # For each axis, the tile index that each selected index falls in
+        tile_indices = [idx // tile for idx, tile in zip(indices, tile_shape)]
+
+        data = None
+        for tile in itertools.product(*[np.unique(t) for t in tile_indices]):
+            tile_data = self._get_tile(tile, tile_shape, ntiles)
+            if data is None:
+                # The tiles are copied straight into out, if given
+                if out is None and dtype is None:
+                    dtype = tile_data.dtype
+                data = _output_array(out, tuple(len(idx) for idx in indices),
+                                     dtype)
+
+            out_keys = []
+            tile_keys = []
+            for idx, tidx, tile_idx, size in zip(indices, tile_indices, tile,
+                                                 tile_shape):
+                positions = np.flatnonzero(tidx == tile_idx)
+                out_keys.append(_as_slice(positions))
+                tile_keys.append(_as_slice(idx[positions] - tile_idx * size))
+
+            data[_outer_key(out_keys)] = tile_data[_outer_key(tile_keys)]
+
+        if data is None:
+            # Nothing was selected; determine the dtype without decompressing
+            # anything
+            if out is None and dtype is None:
+                dtype = hdu._dtype_for_bitpix()
+                if dtype is None or (hdu._orig_bzero == 0 and
+                                     hdu._orig_bscale == 1):
+                    dtype = BITPIX2DTYPE[hdu._orig_bitpix]
+            return _output_array(out, tuple(out_shape), dtype)
+
+        return data.reshape(out_shape)
+
+    def _get_tile(self, tile, tile_shape, ntiles):
+        """
+        Returns the scaled image data in the tile with the given index along
+        each axis, either from the tile cache or by decompressing it.
+        """
+
+        # The tiles are stored in the compressed data table in FITS order
+        # (that is, with the first FITS axis varying fastest)
+        row = 0
+        for tile_idx, count in zip(tile, ntiles):
+            row = row * count + int(tile_idx)
+
+        cache = self._tile_cache
+        if row in cache:
+            data = cache.pop(row)
+            cache[row] = data
+            return data
+
+        hdu = self.hdu
+        shape = hdu.shape
+        first_pixel = []
+        last_pixel = []
+        for tile_idx, size, axis in zip(tile, tile_shape, shape):
+            first_pixel.insert(0, int(tile_idx) * size + 1)
+            last_pixel.insert(0, min((int(tile_idx) + 1) * size, axis))
+
+        data = compression.decompress_hdu_section(hdu, first_pixel,
+                                                  last_pixel)
+        data = self._scale_tile(data, row)
+
+        if data.nbytes <= self.cache_size:
+            cache[row] = data
+            self._tile_cache_nbytes += data.nbytes
+            while self._tile_cache_nbytes > self.cache_size:
+                _, old = cache.popitem(last=False)
+                self._tile_cache_nbytes -= old.nbytes
+
+        return data
+
+    def _scale_tile(self, data, row):
+        """
+        Applies BSCALE/BZERO and blank values to a decompressed tile, in the
+        same way as `CompImageHDU.data`.
+        """
+
+        hdu = self.hdu
+        if hdu._orig_bzero == 0 and hdu._orig_bscale == 1:
+            return data
+
+        data = np.array(data, dtype=hdu._dtype_for_bitpix())
+
+        zblank = None
+        if 'ZBLANK' in hdu.compressed_data.columns.names:
+            zblank = hdu.compressed_data['ZBLANK'][row]
+        elif 'ZBLANK' in hdu._header:
+            zblank = np.array(hdu._header['ZBLANK'], dtype='int32')
+        elif 'BLANK' in hdu._header:
+            zblank = np.array(hdu._header['BLANK'], dtype='int32')
+
+        if zblank is not None:
+            blanks = (data == zblank)
+
+        if hdu._orig_bscale != 1:
+            np.multiply(data, hdu._orig_bscale, data)
+        if hdu._orig_bzero != 0:
+            data += hdu._orig_bzero
+
+        if zblank is not None:
+            data = np.where(blanks, np.nan, data)
+
+        return data
+
+
+def _run_in_threads(func, nthreads):
+    """
+    Calls ``func(idx)`` for each ``idx`` in ``range(nthreads)``, each call in
+    its own thread, and waits for all of them to finish.  The first exception
+    raised by any of the calls, if any, is re-raised.
+    """
+
+    errors = []
+
+    def run(idx):
+        try:
+            func(idx)
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=run, args=(idx,))
+               for idx in range(nthreads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    if errors:
+        raise errors[0]
+
+
+def _heap_gaps(starts, ends):
+    """
+    Returns a list of the ``[start, end]`` ranges of unused space in a heap
+    holding arrays at the given start and end offsets, in order; the last
+    range is the space after the last array, and its end is `None`.
+    """
+
+    if not len(starts):
+        return [[0, None]]
+
+    order = np.argsort(starts, kind='mergesort')
+    starts = starts[order]
+    ends = np.maximum.accumulate(ends[order])
+
+    # The end of all the arrays before each one
+    previous_ends = np.concatenate(([0], ends[:-1]))
+    unused = starts > previous_ends
+    gaps = [[int(start), int(end)] for start, end in
+            zip(previous_ends[unused], starts[unused])]
+    gaps.append([int(ends[-1]), None])
+    return gaps
+
+
+def _heap_allocate(gaps, nbytes):
+    """
+    Allocates ``nbytes`` from the first large enough range of unused space
+    in the list returned by `_heap_gaps`, and returns its offset.
+    """
+
+    for gap in gaps:
+        start, end = gap
+        if end is None or end - start >= nbytes:
+            gap[0] = start + nbytes
+            return start
+
+
+def _offset_descriptors(table, rows, columns, offset):
+    """
+    Shifts the heap offsets in the variable length array descriptors of the
+    given rows of a compressed image table by ``offset`` bytes.
+    """
+
+    for col in columns:
+        if col.format.format not in ('P', 'Q'):
+            continue
+        # Empty arrays are left with a zero offset, as by CFITSIO
+        descriptors = table[col.name][rows]
+        descriptors[:, 1] += np.where(descriptors[:, 0] > 0, offset, 0)
+
+
+def _as_slice(indices):
+    """
+    Returns a slice equivalent to an array of indices if the indices are
+    consecutive, and otherwise returns the array unchanged.
+    """
+
+    if len(indices) and (np.diff(indices) == 1).all():
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    return indices
+
+
+def _outer_key(keys):
+    """
+    Combines the per-axis keys returned by `_as_slice` into an index that
+    selects along each axis independently.
+    """
+
+    if all(isinstance(key, slice) for key in keys):
+        return tuple(keys)
+    arrays = [np.arange(key.start, key.stop) if isinstance(key, slice)
+              else key for key in keys]
+    return np.ix_(*arrays)
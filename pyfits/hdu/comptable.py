@@ -0,0 +1,814 @@
+import warnings
+import weakref
+import zlib
+
+import numpy as np
+
+from ..extern.six import string_types
+from ..extern.six.moves import range
+
+from ..column import KEYWORD_NAMES, TDEF_RE, _FormatP, _parse_tformat
+from ..header import Header
+from ..util import lazyproperty
+from .base import DELAYED, ExtensionHDU
+from .compressed import _run_in_threads
+from .table import BinTableHDU, _binary_table_byte_swap
+
+try:
+    from pyfits import compression
+    COMPRESSION_SUPPORTED = True
+except ImportError:
+    COMPRESSION_SUPPORTED = False
+
+
+# Compression algorithms for the columns of compressed tables
+COMPRESSION_TYPES = ('RICE_1', 'GZIP_1', 'GZIP_2', 'NOCOMPRESS')
+
+# Column formats that may be compressed with RICE_1
+RICE_FORMATS = ('B', 'I', 'J')
+
+# The width in bytes of the elements of each column format, by which the
+# bytes of the column are shuffled for GZIP_2 and the integers are read for
+# RICE_1
+ELEMENT_WIDTHS = {'L': 1, 'X': 1, 'B': 1, 'A': 1, 'I': 2, 'J': 4, 'K': 8,
+                  'E': 4, 'D': 8, 'C': 4, 'M': 8}
+
+# By default tiles hold about this many bytes of uncompressed rows
+DEFAULT_TILE_NBYTES = 1024 * 1024
+
+# The block size used by the Rice algorithm for table columns
+RICE_BLOCK_SIZE = 32
+
+# Compression keywords of the compressed table header; ZFORMn and ZCTYPn are
+# also reserved for each column
+COMPRESSION_KEYWORDS = ('ZTABLE', 'ZTILELEN', 'ZNAXIS1', 'ZNAXIS2', 'ZPCOUNT',
+                        'ZTHEAP')
+
+
+class CompBinTableHDU(BinTableHDU):
+    """
+    Compressed binary table HDU class, implementing the FITS tiled table
+    compression convention.
+
+    The rows of the table are divided into tiles of ``ZTILELEN`` rows, and the
+    values of each column in each tile are compressed separately and stored in
+    a row of the compressed table, which has one variable length byte array
+    column for each column of the uncompressed table.  The ``header``,
+    ``columns``, and ``data`` attributes of this HDU are those of the
+    uncompressed table, so it can be used just like a `BinTableHDU`; the data
+    is decompressed when it is first accessed, and compressed again when the
+    HDU is written.  The `read` method decompresses only some of the rows and
+    columns of the table.
+    """
+
+    def __init__(self, data=None, header=None, name=None, uint=False,
+                 compression_type=None, tile_size=None, threads=1):
+        """
+        Parameters
+        ----------
+        data : array, optional
+            The uncompressed table data, such as a `FITS_rec`
+
+        header : Header instance, optional
+            Header of the uncompressed table; when reading the HDU from a file
+            (data=DELAYED), the header of the compressed table read from the
+            file
+
+        name : str, optional
+            The ``EXTNAME`` value
+
+        uint : bool, optional
+            Set to `True` if the table contains unsigned integer columns
+
+        compression_type : str or dict, optional
+            Compression algorithm to use for all columns, or a dictionary
+            mapping the names of some columns to their compression
+            algorithms: one of ``'RICE_1'``, ``'GZIP_1'``, ``'GZIP_2'``, or
+            ``'NOCOMPRESS'``.  ``'RICE_1'`` can only be used for integer
+            columns (with format B, I, or J); other columns are compressed
+            with their default algorithm.  By default integer columns are
+            compressed with ``'RICE_1'``, other numeric columns with
+            ``'GZIP_2'``, and logical, bit, and character columns with
+            ``'GZIP_1'``.
+
+        tile_size : int, optional
+            Number of rows of the table in each compression tile.  By default
+            each tile holds about 1 MB of uncompressed rows.
+
+        threads : int, optional
+            Number of threads to use to compress and decompress the tiles
+            (default 1)
+
+        Notes
+        -----
+        ``GZIP_1`` compresses the bytes of each column of a tile with gzip.
+        ``GZIP_2`` first shuffles the bytes of the column values, so that the
+        most significant bytes of all the values come first, then the next
+        most significant bytes, and so on, which usually compresses numeric
+        data much better.  ``RICE_1`` is the Rice algorithm, which is both
+        fast and efficient for integer values.  Tables with variable length
+        array columns cannot be compressed.
+        """
+
+        if data is DELAYED:
+            table_header = _table_header(header)
+            uncompressed = _DecompressedTableHDU(data=DELAYED,
+                                                 header=table_header,
+                                                 uint=uint)
+            uncompressed._comp_hdu = weakref.ref(self)
+            self._table = uncompressed
+            super(CompBinTableHDU, self).__init__(data=DELAYED, header=header,
+                                                  uint=uint)
+            if tile_size is None:
+                tile_size = header['ZTILELEN']
+        else:
+            if header is not None:
+                header = header.copy()
+                _strip_compression_keywords(header)
+            self._table = _DecompressedTableHDU(data=data, header=header,
+                                                name=name, uint=uint)
+            super(CompBinTableHDU, self).__init__(uint=uint)
+
+        self._compression_type = compression_type
+        self._tile_size = tile_size
+        self._threads = threads
+
+        # The compressed table and heap to write, once the data is compressed
+        self._compressed_buffer = None
+
+        if data is not DELAYED:
+            self._update_compressed_header(
+                ['1PB'] * self.header['TFIELDS'], 0, 0,
+                self._compression_types(), self._tile_len())
+
+    @classmethod
+    def match_header(cls, header):
+        card = header.cards[0]
+        if card.keyword != 'XTENSION':
+            return False
+
+        xtension = card.value
+        if isinstance(xtension, string_types):
+            xtension = xtension.rstrip()
+
+        if xtension not in ('BINTABLE', 'A3DTABLE'):
+            return False
+
+        if 'ZTABLE' not in header or header['ZTABLE'] != True:
+            return False
+
+        for idx in range(header.get('TFIELDS', 0)):
+            zform = header.get('ZFORM' + str(idx + 1), '')
+            if _parse_tformat(zform)[1].upper() in ('P', 'Q'):
+                warnings.warn('Failure matching header to a compressed '
+                              'table HDU: Compressed tables with variable '
+                              'length array columns are not supported.\n'
+                              'The HDU will be treated as a Binary Table '
+                              'HDU.')
+                return False
+
+        return True
+
+    @property
+    def header(self):
+        """The header of the uncompressed table."""
+
+        return self._table._header
+
+    @header.setter
+    def header(self, value):
+        self._table._header = value
+
+    @property
+    def name(self):
+        return self._table.name
+
+    @name.setter
+    def name(self, value):
+        self._table.name = value
+        BinTableHDU.name.fset(self, value)
+
+    @property
+    def ver(self):
+        return self._table.ver
+
+    @ver.setter
+    def ver(self, value):
+        self._table.ver = value
+        BinTableHDU.ver.fset(self, value)
+
+    @property
+    def columns(self):
+        """
+        The :class:`ColDefs` objects describing the columns in the
+        uncompressed table.
+        """
+
+        return self._table.columns
+
+    @lazyproperty
+    def data(self):
+        return self._table.data
+
+    @data.setter
+    def data(self, data):
+        self._table.data = data
+        self._data_replaced = True
+        self._modified = True
+        self.__dict__['data'] = self._table.data
+        return self.__dict__['data']
+
+    @data.deleter
+    def data(self):
+        del self._table.data
+
+    @property
+    def _data_loaded(self):
+        # The data may also have been loaded through the columns
+        return self._table._data_loaded
+
+    @property
+    def _nrows(self):
+        return self._table._nrows
+
+    def read(self, rows=None, columns=None):
+        """
+        Read some of the rows and columns of the table, decompressing only
+        the tiles and columns that hold them.
+
+        If the data has already been loaded the rows and columns are taken
+        from `data` instead.
+
+        Parameters
+        ----------
+        rows : int or slice, optional
+            The row or rows to read; by default all rows are read
+
+        columns : sequence of str or int, optional
+            The names or indices of the columns to read; by default all
+            columns are read
+
+        Returns
+        -------
+        data : `FITS_rec`
+            A new table holding the requested rows and columns
+        """
+
+        selected, indices = self._read_selection(rows, columns)
+        if len(selected):
+            first = selected.min()
+            last = selected.max() + 1
+            raw = self._raw_rows(first, last, indices)
+            if selected[0] != first or last - first != len(selected):
+                raw = raw[selected - first]
+        else:
+            raw = self._raw_rows(0, 0, indices)
+
+        return self._table_from_raw(raw, indices)
+
+    def update(self):
+        """
+        Update header keywords to reflect recent changes of columns.
+        """
+
+        self._table.update()
+
+    def copy(self):
+        """
+        Make a copy of the table HDU, both header and data are copied.
+        """
+
+        return self.__class__(data=self.data.copy(),
+                              header=self.header.copy(),
+                              compression_type=self._compression_type,
+                              tile_size=self._tile_size,
+                              threads=self._threads)
+
+    def _summary(self):
+        name, _, _, dims, format = self._table._summary()
+        return (self.name, self.__class__.__name__, len(self._header), dims,
+                format)
+
+    def _prewriteto(self, checksum=False, inplace=False):
+        if self._has_data:
+            self._compress()
+        else:
+            # Only the header may have changed; the compressed data are
+            # copied as they are
+            ncols = self._header['TFIELDS']
+            self._update_compressed_header(
+                [self._header['TFORM' + str(idx + 1)]
+                 for idx in range(ncols)],
+                self._header['NAXIS2'], self._header['PCOUNT'],
+                [self._header.get('ZCTYP' + str(idx + 1), 'GZIP_1')
+                 for idx in range(ncols)],
+                self._header['ZTILELEN'])
+
+        # Bypass _TableBaseHDU._prewriteto, since the table keywords are those
+        # of the uncompressed table, which it has already handled
+        return ExtensionHDU._prewriteto(self, checksum=checksum,
+                                        inplace=inplace)
+
+    def _postwriteto(self):
+        super(CompBinTableHDU, self)._postwriteto()
+        if self._has_data:
+            self._table._postwriteto()
+        self._compressed_buffer = None
+
+    def _writedata_internal(self, fileobj):
+        buf = self._compressed_buffer
+        if not fileobj.simulateonly:
+            fileobj.writearray(buf)
+        return len(buf)
+
+    def _calculate_datasum(self, blocking):
+        if self._has_data:
+            return self._compute_checksum(self._compressed_buffer,
+                                          blocking=blocking)
+        else:
+            return super(CompBinTableHDU, self)._calculate_datasum(blocking)
+
+    def _data_bytes(self):
+        # Changes to the data can't be tracked in the compressed bytes
+        return None
+
+    def _tile_len(self):
+        """
+        Returns the number of rows in each tile for writing the table.
+        """
+
+        if self._tile_size is not None:
+            return max(int(self._tile_size), 1)
+
+        rowsize = max(self.header['NAXIS1'], 1)
+        return max(DEFAULT_TILE_NBYTES // rowsize, 1)
+
+    def _column_layout(self):
+        """
+        Returns the byte offset in the rows of the uncompressed table, the
+        width in bytes, and the format code of each column.
+        """
+
+        dtype = self.columns.dtype
+        layout = []
+        for idx, column in enumerate(self.columns):
+            name = dtype.names[idx]
+            format = _parse_tformat(column.format)[1].upper()
+            layout.append((dtype.fields[name][1], dtype[idx].itemsize,
+                           format))
+        return layout
+
+    def _compression_types(self):
+        """
+        Returns the compression algorithm to write for each column.
+        """
+
+        types = []
+        compression_type = self._compression_type
+        for idx, (_, _, format) in enumerate(self._column_layout()):
+            if isinstance(compression_type, dict):
+                name = self.columns[idx].name
+                ctype = compression_type.get(name)
+            elif compression_type is None:
+                # Keep the compression of columns read from a file
+                ctype = None
+                tform = self.header.get('TFORM' + str(idx + 1))
+                zform = self._header.get('ZFORM' + str(idx + 1))
+                if zform is not None and zform == tform:
+                    ctype = self._header.get('ZCTYP' + str(idx + 1))
+            else:
+                ctype = compression_type
+
+            if ctype is not None and ctype not in COMPRESSION_TYPES:
+                raise ValueError(
+                    'Unrecognized compression type for table columns: %r; '
+                    'must be one of %s' % (ctype, ', '.join(COMPRESSION_TYPES)))
+
+            if (ctype is None or
+                    (ctype == 'RICE_1' and format not in RICE_FORMATS)):
+                ctype = _default_compression_type(format)
+            types.append(ctype)
+
+        return types
+
+    def _compress(self):
+        """
+        Compress the table data so that it may be written to a file.
+        """
+
+        table = self._table
+
+        # Let the uncompressed table scale back its converted columns and
+        # update its header, as it would if it were written itself
+        table._prewriteto(checksum=False)
+        data = table.data
+
+        for format in data.columns._recformats:
+            if isinstance(format, _FormatP):
+                raise ValueError('Tables with variable length array columns '
+                                 'cannot be compressed.')
+
+        nrows = len(data)
+        tile_len = min(self._tile_len(), max(nrows, 1))
+        ntiles = -(-nrows // tile_len)
+        layout = self._column_layout()
+        ctypes = self._compression_types()
+        ncols = len(layout)
+        tiles = [[None] * ncols for _ in range(ntiles)]
+
+        with _binary_table_byte_swap(data) as swapped:
+            raw = np.ascontiguousarray(swapped.view(type=np.ndarray))
+            rowsize = raw.dtype.itemsize
+            raw = raw.view(np.ubyte).reshape(nrows, rowsize)
+
+            def compress_tiles(thread_idx, nthreads):
+                for tile in range(thread_idx, ntiles, nthreads):
+                    rows = raw[tile * tile_len:(tile + 1) * tile_len]
+                    for idx, (offset, width, format) in enumerate(layout):
+                        tiles[tile][idx] = _compress_tile(
+                            rows[:, offset:offset + width], ctypes[idx],
+                            format)
+
+            _in_threads(compress_tiles, min(self._threads, ntiles))
+
+        # Lay out the heap tile by tile, with the columns of each tile in
+        # order, so that neighboring tiles can be read with a single read
+        sizes = np.array([[len(buf) for buf in row] for row in tiles],
+                         dtype=np.int64).reshape(ntiles, ncols)
+        offsets = (np.cumsum(sizes.ravel()) - sizes.ravel()).reshape(
+            ntiles, ncols)
+        heapsize = int(sizes.sum())
+
+        if heapsize < 2 ** 31:
+            descriptor, format = '>i4', 'P'
+        else:
+            descriptor, format = '>i8', 'Q'
+
+        descriptors = np.empty((ntiles, ncols, 2), dtype=descriptor)
+        descriptors[:, :, 0] = sizes
+        descriptors[:, :, 1] = offsets
+        tbsize = descriptors.nbytes
+
+        buf = np.empty(tbsize + heapsize, dtype=np.ubyte)
+        buf[:tbsize] = descriptors.view(np.ubyte).ravel()
+        position = tbsize
+        for row in tiles:
+            for tile in row:
+                buf[position:position + len(tile)] = tile
+                position += len(tile)
+
+        tforms = ['1%sB(%d)' % (format, sizes[:, idx].max() if ntiles else 0)
+                  for idx in range(ncols)]
+        self._compressed_buffer = buf
+        self._update_compressed_header(tforms, ntiles, heapsize, ctypes,
+                                       tile_len)
+
+    def _update_compressed_header(self, tforms, ntiles, heapsize, ctypes,
+                                  tile_len):
+        """
+        Update the compressed table header (`_header`) to hold the keywords
+        of the uncompressed table header, and to describe the compressed
+        table with the given ``TFORMn`` values, number of tiles (rows), heap
+        size, and compression algorithms.
+        """
+
+        table_header = self.header
+        header = table_header.copy()
+        _strip_compression_keywords(header)
+
+        for keyword in ('CHECKSUM', 'DATASUM', 'THEAP'):
+            if keyword in header:
+                del header[keyword]
+
+        header['NAXIS1'] = sum(8 if _parse_tformat(tform)[1] == 'P' else 16
+                               for tform in tforms)
+        header['NAXIS2'] = ntiles
+        header['PCOUNT'] = heapsize
+
+        for idx, tform in enumerate(tforms):
+            tform_keyword = 'TFORM' + str(idx + 1)
+            zform_keyword = 'ZFORM' + str(idx + 1)
+            header.set(zform_keyword, table_header[tform_keyword],
+                       'data format of field', after=tform_keyword)
+            header.set('ZCTYP' + str(idx + 1), ctypes[idx],
+                       'compression algorithm for column',
+                       after=zform_keyword)
+            header[tform_keyword] = tform
+
+        header.set('ZTABLE', True, 'extension contains compressed binary '
+                   'table')
+        header.set('ZTILELEN', tile_len, 'number of rows in each tile')
+        header.set('ZNAXIS1', table_header['NAXIS1'],
+                   'length of uncompressed row in bytes')
+        header.set('ZNAXIS2', table_header['NAXIS2'],
+                   'number of rows in uncompressed table')
+        header.set('ZPCOUNT', table_header.get('PCOUNT', 0),
+                   'size of heap in uncompressed table')
+
+        # Keep any checksums of the compressed HDU, which are updated
+        # separately
+        for keyword in ('CHECKSUM', 'DATASUM'):
+            if keyword in self._header:
+                header.set(keyword, self._header[keyword],
+                           self._header.comments[keyword])
+
+        if str(header) != str(self._header):
+            header._modified = True
+            self._header = header
+
+    def _tile_descriptors(self):
+        """
+        Returns the (size, offset) heap descriptors of the compressed tiles
+        of each column, as an array of shape (number of tiles, number of
+        columns, 2), and the offset of the heap in the data.
+        """
+
+        header = self._header
+        ntiles = header['NAXIS2']
+        ncols = header['TFIELDS']
+        tbsize = header['NAXIS1'] * ntiles
+
+        fields = []
+        for idx in range(ncols):
+            format = _parse_tformat(header['TFORM' + str(idx + 1)])[1]
+            fields.append(('f%d' % idx,
+                           '>i4' if format.upper() == 'P' else '>i8', (2,)))
+
+        table = self._get_raw_data(ntiles, np.dtype(fields),
+                                   self._data_offset)
+        descriptors = np.empty((ntiles, ncols, 2), dtype=np.int64)
+        for idx in range(ncols):
+            descriptors[:, idx] = table['f%d' % idx]
+
+        return descriptors, header.get('THEAP', tbsize)
+
+    def _raw_rows(self, start, stop, indices):
+        """
+        Returns the raw (big-endian) bytes of the columns with the given
+        indices in rows ``start`` to ``stop`` of the uncompressed table, as a
+        2-D array with one row per table row.  Only the tiles holding those
+        rows are decompressed, unless the data has already been loaded.
+        """
+
+        layout = self._column_layout()
+        rowsize = sum(layout[idx][1] for idx in indices)
+        out = np.empty((stop - start, rowsize), dtype=np.ubyte)
+        if stop <= start:
+            return out
+
+        if self._data_loaded:
+            data = self.data
+            data._scale_back()
+            raw = data.view(type=np.ndarray)[start:stop]
+            raw = raw.astype(raw.dtype.newbyteorder('>'))
+            rowsize = raw.dtype.itemsize
+            raw = raw.view(np.ubyte).reshape(len(raw), rowsize)
+            position = 0
+            for idx in indices:
+                offset, width, _ = layout[idx]
+                out[:, position:position + width] = \
+                    raw[:, offset:offset + width]
+                position += width
+            return out
+
+        header = self._header
+        tile_len = header['ZTILELEN']
+        nrows = header['ZNAXIS2']
+        ctypes = [header.get('ZCTYP' + str(idx + 1), 'GZIP_1')
+                  for idx in range(header['TFIELDS'])]
+
+        first_tile = start // tile_len
+        last_tile = (stop - 1) // tile_len
+        descriptors, theap = self._tile_descriptors()
+        descriptors = descriptors[first_tile:last_tile + 1][:, indices]
+
+        # Read the compressed bytes of all the tiles needed at once
+        heap_start = int(descriptors[:, :, 1].min())
+        heap_stop = int((descriptors[:, :, 0] + descriptors[:, :, 1]).max())
+        heap = self._get_raw_data(heap_stop - heap_start, np.ubyte,
+                                  self._data_offset + theap + heap_start)
+
+        positions = np.cumsum([0] + [layout[idx][1] for idx in indices])
+        ntiles = last_tile - first_tile + 1
+
+        def decompress_tiles(thread_idx, nthreads):
+            for tile_idx in range(thread_idx, ntiles, nthreads):
+                tile = first_tile + tile_idx
+                tile_start = tile * tile_len
+                tile_stop = min(tile_start + tile_len, nrows)
+                # The rows of the tile that were requested
+                first = max(tile_start, start)
+                last = min(tile_stop, stop)
+
+                for col, idx in enumerate(indices):
+                    _, width, format = layout[idx]
+                    if not width:
+                        continue
+                    size, offset = descriptors[tile_idx, col]
+                    offset -= heap_start
+                    values = _decompress_tile(
+                        heap[offset:offset + size], ctypes[idx], format,
+                        (tile_stop - tile_start) * width)
+                    values = values.reshape(tile_stop - tile_start, width)
+                    out[first - start:last - start,
+                        positions[col]:positions[col + 1]] = \
+                        values[first - tile_start:last - tile_start]
+
+        _in_threads(decompress_tiles, min(self._threads, ntiles))
+        return out
+
+    def _table_from_raw(self, raw, indices):
+        """
+        Returns a `FITS_rec` of the columns with the given indices, from
+        their raw bytes returned by `_raw_rows`.
+        """
+
+        table_header = self.header
+        header = Header([
+            ('XTENSION', 'BINTABLE'), ('BITPIX', 8), ('NAXIS', 2),
+            ('NAXIS1', raw.shape[1]), ('NAXIS2', raw.shape[0]),
+            ('PCOUNT', 0), ('GCOUNT', 1), ('TFIELDS', len(indices))])
+
+        # Copy the definitions of the columns, renumbered
+        renumber = dict((old + 1, new + 1) for new, old in enumerate(indices))
+        for card in table_header.cards:
+            match = TDEF_RE.match(card.keyword)
+            if (match and match.group('label') in KEYWORD_NAMES and
+                    int(match.group('num')) in renumber):
+                keyword = match.group('label') + str(
+                    renumber[int(match.group('num'))])
+                header[keyword] = (card.value, card.comment)
+
+        table = BinTableHDU(data=DELAYED, header=header, uint=self._uint)
+        table._buffer = bytearray(raw.tostring()) if raw.size else None
+        table._data_offset = 0
+        table._data_size = raw.size
+        return table.data
+
+    def _decompress(self):
+        """
+        Decompress the whole table, returning the raw bytes of the
+        uncompressed table.
+        """
+
+        nrows = self._header['ZNAXIS2']
+        raw = self._raw_rows(0, nrows, list(range(self._header['TFIELDS'])))
+        return bytearray(raw.tostring())
+
+
+class _DecompressedTableHDU(BinTableHDU):
+    """
+    The uncompressed table of a `CompBinTableHDU`, whose raw data is
+    decompressed from the compressed table when it is first needed.
+    """
+
+    _comp_hdu = None
+
+    @classmethod
+    def match_header(cls, header):
+        # This is never used for HDUs read from files
+        raise NotImplementedError
+
+    def _get_raw_data(self, shape, code, offset):
+        if self._buffer is None and self._comp_hdu is not None:
+            comp_hdu = self._comp_hdu()
+            if comp_hdu is not None:
+                self._buffer = comp_hdu._decompress()
+                self._data_offset = offset = 0
+                self._data_size = len(self._buffer)
+
+        return super(_DecompressedTableHDU, self)._get_raw_data(shape, code,
+                                                                offset)
+
+
+def _table_header(header):
+    """
+    Returns the header of the uncompressed table of a compressed table with
+    the given header.
+    """
+
+    table_header = header.copy()
+
+    for idx in range(header['TFIELDS']):
+        zform = 'ZFORM' + str(idx + 1)
+        if zform in header:
+            table_header.set('TFORM' + str(idx + 1), header[zform],
+                             header.comments[zform])
+
+    table_header['NAXIS1'] = header['ZNAXIS1']
+    table_header['NAXIS2'] = header['ZNAXIS2']
+    table_header['PCOUNT'] = header.get('ZPCOUNT', 0)
+    if 'ZTHEAP' in header:
+        table_header['THEAP'] = header['ZTHEAP']
+    elif 'THEAP' in table_header:
+        del table_header['THEAP']
+
+    # The checksums are those of the compressed table
+    for keyword in ('CHECKSUM', 'DATASUM'):
+        if keyword in table_header:
+            del table_header[keyword]
+
+    _strip_compression_keywords(table_header)
+    table_header._modified = False
+    return table_header
+
+
+def _strip_compression_keywords(header):
+    """Removes the table compression keywords from a header, in place."""
+
+    for keyword in list(header.keys()):
+        if (keyword in COMPRESSION_KEYWORDS or
+                (keyword[:5] in ('ZFORM', 'ZCTYP') and keyword[5:].isdigit())):
+            del header[keyword]
+
+
+def _default_compression_type(format):
+    """
+    Returns the default compression algorithm for columns of the given format
+    code.
+    """
+
+    if format in RICE_FORMATS and COMPRESSION_SUPPORTED:
+        return 'RICE_1'
+    elif ELEMENT_WIDTHS.get(format, 1) > 1:
+        return 'GZIP_2'
+    else:
+        return 'GZIP_1'
+
+
+def _compress_tile(values, compression_type, format):
+    """
+    Compresses the raw (big-endian) bytes of a column in a tile, given as a
+    2-D array with a row of bytes for each row of the table, and returns the
+    compressed bytes as a uint8 array.
+    """
+
+    values = np.ascontiguousarray(values).ravel()
+    width = ELEMENT_WIDTHS.get(format, 1)
+
+    if compression_type == 'NOCOMPRESS':
+        return values
+    elif compression_type == 'RICE_1':
+        if not COMPRESSION_SUPPORTED:
+            raise Exception('The pyfits.compression module is not available.  '
+                            'RICE_1 compression of table columns is '
+                            'disabled.')
+        values = values.view('>i%d' % width).astype('i%d' % width)
+        return compression.compress_rice(values, RICE_BLOCK_SIZE)
+
+    if compression_type == 'GZIP_2' and width > 1:
+        # Shuffle the bytes so that the most significant bytes of all the
+        # values come first
+        values = values.reshape(-1, width).T.ravel()
+
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED,
+                                  16 + zlib.MAX_WBITS)
+    compressed = compressor.compress(values) + compressor.flush()
+    return np.frombuffer(compressed, dtype=np.ubyte)
+
+
+def _decompress_tile(compressed, compression_type, format, nbytes):
+    """
+    Decompresses the bytes of a column in a tile, returning a uint8 array of
+    ``nbytes`` raw (big-endian) bytes.
+    """
+
+    width = ELEMENT_WIDTHS.get(format, 1)
+
+    if compression_type == 'NOCOMPRESS':
+        values = np.asarray(compressed, dtype=np.ubyte)
+    elif compression_type == 'RICE_1':
+        if not COMPRESSION_SUPPORTED:
+            raise Exception('The pyfits.compression module is not available.  '
+                            'RICE_1 compressed table columns cannot be read.')
+        values = compression.decompress_rice(compressed, nbytes // width,
+                                             width, RICE_BLOCK_SIZE)
+        values = values.astype(values.dtype.newbyteorder('>')).view(np.ubyte)
+    elif compression_type in ('GZIP_1', 'GZIP_2'):
+        # Accept both gzip and zlib streams
+        values = np.frombuffer(zlib.decompress(compressed.tostring(),
+                                               32 + zlib.MAX_WBITS),
+                               dtype=np.ubyte)
+        if compression_type == 'GZIP_2' and width > 1:
+            values = values.reshape(width, -1).T.ravel()
+    else:
+        raise ValueError('Unrecognized compression type for table column: '
+                         '%r' % compression_type)
+
+    if len(values) != nbytes:
+        raise ValueError('Compressed table tile has %d bytes when '
+                         'decompressed; expected %d' % (len(values), nbytes))
+
+    return values
+
+
+def _in_threads(func, nthreads):
+    """
+    Calls ``func(idx, nthreads)`` for each ``idx`` in ``range(nthreads)``, in
+    separate threads if there is more than one.
+    """
+
+    if nthreads > 1:
+        _run_in_threads(lambda idx: func(idx, nthreads), nthreads)
+    else:
+        func(0, 1)
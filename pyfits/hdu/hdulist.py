@@ -4,6 +4,7 @@ import shutil
 import sys
 import warnings
 
+from ..column import Column
 from ..extern.six import print_, string_types
 from ..file import _File
 from ..util import (_is_int, _tmp_name, _pad_length, ignore_sigint,
@@ -14,9 +15,30 @@ from . import compressed
 from .base import _BaseHDU, _ValidHDU, _NonstandardHDU, ExtensionHDU
 from .groups import GroupsHDU
 from .image import PrimaryHDU, ImageHDU
+from .table import BinTableHDU
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # Python 2 without the "futures" backport; checksums can't be verified in
+    # the background
+    ThreadPoolExecutor = None
 
-def fitsopen(name, mode='readonly', memmap=None, save_backup=False, **kwargs):
+
+HDU_INDEX_SUFFIX = '.hduindex'
+"""
+Suffix appended to the name of a FITS file to give the name of the sidecar
+file holding its HDU index; see `HDUList.write_index`.
+"""
+
+# The number of threads used to verify checksums when a file is opened with
+# background_checksum=True
+_CHECKSUM_THREADS = 4
+
+
+def fitsopen(name, mode='readonly', memmap=None, save_backup=False,
+             lazy_load_hdus=None, use_index=False, background_checksum=False,
+             **kwargs):
     """Factory function to open a FITS file and return an `HDUList` object.
 
     Parameters
@@ -41,6 +63,39 @@ def fitsopen(name, mode='readonly', memmap=None, save_backup=False, **kwargs):
         The backup has the same name as the original file with ".bak" appended.
         If "file.bak" already exists then "file.bak.1" is used, and so on.
 
+    lazy_load_hdus : bool, optional
+        By default (unless the ``LAZY_LOAD_HDUS`` setting is enabled) all
+        HDUs in the file are read and parsed when the file is opened.  If
+        `True`, only the first HDU is read up front, and further HDUs are
+        only read from the file as they are accessed by index or name.
+        Operations that need the full list, such as ``len()`` or iterating
+        past the last HDU read so far, will read the remaining HDUs on
+        demand.  This can greatly reduce the time to open files with many
+        extensions when only a few of them are actually needed.
+
+    use_index : bool, optional
+        If `True`, and the file has an up to date HDU index written by
+        `HDUList.write_index`, the index is used to find the HDUs in the file.
+        Only the HDUs that are actually accessed are then read, by seeking
+        directly to their location in the file, instead of reading all the
+        headers preceding them.  If the index is missing or out of date
+        (or the file is not opened read-only), the file is read normally.
+
+    background_checksum : bool or str, optional
+        If `True`, and the file is opened with ``checksum=True``, the
+        checksums of the HDUs are verified by a pool of background threads
+        instead of before the HDUs are returned, so that the headers and data
+        can be used in the meantime.  The ``checksum_future`` attribute of
+        each HDU is then a `concurrent.futures.Future` whose result is a
+        tuple of the results of the ``CHECKSUM`` and ``DATASUM``
+        verifications, as returned by `~_ValidHDU.verify_checksum` and
+        `~_ValidHDU.verify_datasum`; failures also raise a warning as usual.
+        If ``'wait'``, the checksums are also verified in the background,
+        but reading an HDU's data waits for its verification to finish.
+        This requires the `concurrent.futures` module (the ``futures``
+        package on Python 2), and that the file can be reopened by its name;
+        otherwise the checksums are verified when the file is opened.
+
     kwargs : dict, optional
         additional optional keyword arguments, possible values are:
 
@@ -118,10 +173,15 @@ def fitsopen(name, mode='readonly', memmap=None, save_backup=False, **kwargs):
         from pyfits import ENABLE_UINT
         kwargs['uint'] = ENABLE_UINT
 
+    if lazy_load_hdus is None:
+        from pyfits import LAZY_LOAD_HDUS
+        lazy_load_hdus = LAZY_LOAD_HDUS
+
     if not name:
         raise ValueError('Empty filename: %s' % repr(name))
 
-    return HDUList.fromfile(name, mode, memmap, save_backup, **kwargs)
+    return HDUList.fromfile(name, mode, memmap, save_backup, lazy_load_hdus,
+                            use_index, background_checksum, **kwargs)
 
 
 class HDUList(list, _Verify):
@@ -147,6 +207,18 @@ class HDUList(list, _Verify):
         self._file = file
         self._save_backup = False
 
+        # These are used when the HDUList is read lazily from a file; see
+        # _read_next_hdu.  An HDUList created from a list of HDUs is always
+        # "fully read"
+        self._open_kwargs = {}
+        self._data = None
+        self._in_read_next_hdu = False
+        self._read_all = True
+        # Used to verify the checksums of HDUs read from a file in the
+        # background; see _readfrom
+        self._checksum_executor = None
+        self._wait_for_checksum = False
+
         if hdus is None:
             hdus = []
 
@@ -165,9 +237,25 @@ class HDUList(list, _Verify):
 
         self.update_extend()
 
+    def __len__(self):
+        if not self._in_read_next_hdu:
+            self._read_all_hdus()
+
+        return super(HDUList, self).__len__()
+
+    def __repr__(self):
+        return repr(list(self))
+
     def __iter__(self):
-        for idx in range(len(self)):
-            yield self[idx]
+        # Not using len(self) here, so that HDUs which have not been read yet
+        # are only read from the file as the iteration reaches them
+        idx = 0
+        while True:
+            try:
+                yield self[idx]
+            except IndexError:
+                break
+            idx += 1
 
     def __getitem__(self, key):
         """
@@ -175,11 +263,29 @@ class HDUList(list, _Verify):
         """
 
         if isinstance(key, slice):
+            if (key.stop is None or key.stop < 0 or
+                    (key.start is not None and key.start < 0)):
+                self._read_all_hdus()
+            else:
+                while (super(HDUList, self).__len__() < key.stop and
+                        self._read_next_hdu()):
+                    pass
+            for idx in range(*key.indices(super(HDUList, self).__len__())):
+                self._read_indexed_hdu(idx)
             hdus = super(HDUList, self).__getitem__(key)
             return HDUList(hdus)
 
         idx = self.index_of(key)
-        return super(HDUList, self).__getitem__(idx)
+        if idx < 0:
+            # Negative indices are relative to the end of the file
+            self._read_all_hdus()
+
+        hdu = self._try_while_unread_hdus(super(HDUList, self).__getitem__,
+                                          idx)
+        if isinstance(hdu, _IndexedHDU):
+            hdu = self._read_indexed_hdu(idx)
+
+        return hdu
 
     def __contains__(self, item):
         """
@@ -196,6 +302,7 @@ class HDUList(list, _Verify):
         Set an HDU to the `HDUList`, indexed by number or name.
         """
 
+        self._read_all_hdus()
         _key = self.index_of(key)
         if isinstance(hdu, (slice, list)):
             if _is_int(_key):
@@ -253,7 +360,8 @@ class HDUList(list, _Verify):
 
     @classmethod
     def fromfile(cls, fileobj, mode=None, memmap=None,
-                 save_backup=False, **kwargs):
+                 save_backup=False, lazy_load_hdus=False, use_index=False,
+                 background_checksum=False, **kwargs):
         """
         Creates an `HDUList` instance from a file-like object.
 
@@ -263,7 +371,11 @@ class HDUList(list, _Verify):
         """
 
         return cls._readfrom(fileobj=fileobj, mode=mode, memmap=memmap,
-                             save_backup=save_backup, **kwargs)
+                             save_backup=save_backup,
+                             lazy_load_hdus=lazy_load_hdus,
+                             use_index=use_index,
+                             background_checksum=background_checksum,
+                             **kwargs)
 
     @classmethod
     def fromstring(cls, data, **kwargs):
@@ -489,6 +601,13 @@ class HDUList(list, _Verify):
         -------
         index : int
            The index of the HDU in the `HDUList`.
+
+        Notes
+        -----
+        If the `HDUList` is being read lazily from a file (see the
+        ``lazy_load_hdus`` argument to :func:`open`), HDUs are only read from
+        the file until a matching HDU is found.  In that case HDUs further on
+        in the file are not checked for duplicate names.
         """
 
         if _is_int(key):
@@ -505,7 +624,16 @@ class HDUList(list, _Verify):
 
         nfound = 0
         found = None
-        for idx, hdu in enumerate(self):
+        idx = 0
+        while True:
+            # HDUs located through an HDU index are not read here, as their
+            # names are known from the index
+            try:
+                hdu = self._try_while_unread_hdus(
+                        super(HDUList, self).__getitem__, idx)
+            except IndexError:
+                break
+
             name = hdu.name
             if isinstance(name, string_types):
                 name = name.strip().upper()
@@ -515,6 +643,15 @@ class HDUList(list, _Verify):
                 found = idx
                 nfound += 1
 
+            # When reading lazily, stop once all the HDUs read so far have
+            # been searched and a match was found, rather than reading the
+            # rest of the file
+            if (found is not None and not self._read_all and
+                    idx + 1 >= super(HDUList, self).__len__()):
+                break
+
+            idx += 1
+
         if (nfound == 0):
             raise KeyError('Extension %s not found.' % repr(key))
         elif (nfound > 1):
@@ -576,6 +713,11 @@ class HDUList(list, _Verify):
 
         self.verify(option=output_verify)
 
+        # Don't change the file while its checksums are still being verified
+        for hdu in super(HDUList, self).__iter__():
+            if isinstance(hdu, _BaseHDU):
+                hdu._wait_for_checksum_verification()
+
         if self._file.mode in ('append', 'ostream'):
             for hdu in self:
                 if verbose:
@@ -706,9 +848,22 @@ class HDUList(list, _Verify):
             if closed and hasattr(self._file, 'close'):
                 self._file.close()
 
-        # Give individual HDUs an opportunity to do on-close cleanup
-        for hdu in self:
-            hdu._close(closed=closed)
+        if closed and self._checksum_executor is not None:
+            # Checksum verifications that haven't started yet are cancelled;
+            # any that are running read from their own handles to the file,
+            # so they are left to finish
+            for hdu in super(HDUList, self).__iter__():
+                if (isinstance(hdu, _BaseHDU) and
+                        hdu.checksum_future is not None):
+                    hdu.checksum_future.cancel()
+            self._checksum_executor.shutdown(wait=False)
+            self._checksum_executor = None
+
+        # Give individual HDUs an opportunity to do on-close cleanup; HDUs
+        # that were never read do not need any
+        for hdu in super(HDUList, self).__iter__():
+            if isinstance(hdu, _BaseHDU):
+                hdu._close(closed=closed)
 
     def info(self, output=None):
         """
@@ -771,9 +926,79 @@ class HDUList(list, _Verify):
                 return self._file.name
         return None
 
+    def write_index(self, filename=None):
+        """
+        Write an index of the locations of the HDUs in the file associated
+        with this `HDUList` to a sidecar file.
+
+        The index records the header offset, data offset, data size,
+        ``XTENSION``, ``EXTNAME`` and ``EXTVER`` of each HDU, along with the
+        size and modification time of the FITS file, so that it can be used
+        to find HDUs in the file without reading the headers preceding them.
+        See the ``use_index`` argument to :func:`open`.  If the FITS file is
+        later modified the index is considered out of date and is ignored.
+
+        Parameters
+        ----------
+        filename : str, optional
+            The file to write the index to.  By default this is the name of
+            the FITS file with ``HDU_INDEX_SUFFIX`` (".hduindex") appended,
+            which is where :func:`open` looks for the index.
+        """
+
+        if self._file is None or not self._file.name or self._file.file_like:
+            raise ValueError('An HDU index can only be written for an HDUList '
+                             'read from a file on disk.')
+
+        self._read_all_hdus()
+
+        for hdu in super(HDUList, self).__iter__():
+            if isinstance(hdu, _IndexedHDU):
+                continue
+            if hdu._new or hdu._header._modified or hdu._data_replaced:
+                raise ValueError(
+                    'Cannot write an HDU index for an HDUList with unsaved '
+                    'changes; flush the changes or write the HDUList to a '
+                    'new file first.')
+
+        if filename is None:
+            filename = self._file.name + HDU_INDEX_SUFFIX
+
+        entries = [_IndexedHDU.fromhdu(hdu)
+                   for hdu in super(HDUList, self).__iter__()]
+        names = [entry.name for entry in entries]
+        xtensions = [entry.xtension for entry in entries]
+        name_width = max([len(name) for name in names] + [1])
+        xtension_width = max([len(xtension) for xtension in xtensions] + [1])
+
+        columns = [
+            Column(name='HDRLOC', format='K',
+                   array=[entry.header_offset for entry in entries]),
+            Column(name='DATLOC', format='K',
+                   array=[entry.data_offset for entry in entries]),
+            Column(name='DATSPAN', format='K',
+                   array=[entry.data_size for entry in entries]),
+            Column(name='XTENSION', format='%dA' % xtension_width,
+                   array=xtensions),
+            Column(name='EXTNAME', format='%dA' % name_width, array=names),
+            Column(name='EXTVER', format='K',
+                   array=[entry.ver for entry in entries])]
+
+        stat = os.stat(self._file.name)
+        index = BinTableHDU.from_columns(columns, name='HDUINDEX')
+        index.header['FILENAME'] = (os.path.basename(self._file.name),
+                                    'name of the indexed FITS file')
+        index.header['FILESIZE'] = (stat.st_size,
+                                    'size in bytes of the indexed file')
+        index.header['FILEMTIM'] = (stat.st_mtime,
+                                    'modification time of the indexed file')
+
+        HDUList([PrimaryHDU(), index]).writeto(filename, clobber=True)
+
     @classmethod
     def _readfrom(cls, fileobj=None, data=None, mode=None,
-                  memmap=None, save_backup=False, **kwargs):
+                  memmap=None, save_backup=False, lazy_load_hdus=False,
+                  use_index=False, background_checksum=False, **kwargs):
         """
         Provides the implementations from HDUList.fromfile and
         HDUList.fromstring, both of which wrap this method, as their
@@ -802,66 +1027,219 @@ class HDUList(list, _Verify):
             # _BaseHDU.fromstring call.
 
         hdulist._save_backup = save_backup
+        hdulist._open_kwargs = kwargs
+        hdulist._data = data
+
+        if fileobj is not None and ffo.writeonly:
+            # Output stream--not interested in reading/parsing the HDUs--just
+            # writing to the output file
+            return hdulist
+
+        checksum = kwargs.get('checksum')
+        if background_checksum and checksum and checksum != 'remove':
+            if ThreadPoolExecutor is None:
+                warnings.warn(
+                    'Verifying checksums in the background requires the '
+                    'concurrent.futures module (the "futures" package on '
+                    'Python 2); the checksums will be verified as the file '
+                    'is read.')
+            elif (fileobj is not None and not ffo.file_like and ffo.name and
+                    os.path.isfile(ffo.name)):
+                # The data is verified by reading it through a separate
+                # handle to the file, so the file must be reopenable
+                hdulist._checksum_executor = ThreadPoolExecutor(
+                    max_workers=_CHECKSUM_THREADS)
+                hdulist._wait_for_checksum = background_checksum == 'wait'
+
+        if use_index and mode in ('readonly', 'denywrite', 'copyonwrite'):
+            entries = _read_hdu_index(ffo)
+            if entries:
+                # All the HDUs are known from the index; they are read on
+                # demand by _read_indexed_hdu
+                super(HDUList, hdulist).extend(entries)
+                hdulist._resize = False
+                hdulist._truncate = False
+                return hdulist
+
+        hdulist._read_all = False
+
+        # Read the first HDU, or all of them if not loading lazily
+        hdulist._read_next_hdu()
+        if not lazy_load_hdus:
+            hdulist._read_all_hdus()
+
+        # If we're trying to read only and no header units were found,
+        # raise and exception
+        if (mode in ('readonly', 'denywrite') and
+                super(HDUList, hdulist).__len__() == 0):
+            raise IOError('Empty or corrupt FITS file')
+
+        # initialize/reset attributes to be used in "update/append" mode
+        hdulist._resize = False
+        hdulist._truncate = False
+
+        return hdulist
 
+    def _read_next_hdu(self):
+        """
+        Lazily load a single HDU from the fileobj or data string the `HDUList`
+        was opened from, unless no further HDUs are found.
+
+        Returns True if a new HDU was loaded, or False otherwise.
+        """
+
+        if self._read_all:
+            return False
+
+        fileobj, data, kwargs = self._file, self._data, self._open_kwargs
+
+        if fileobj is not None and fileobj.closed:
+            # HDUs can no longer be read once the file has been closed
+            self._read_all = True
+            return False
+
+        nloaded = super(HDUList, self).__len__()
         saved_compression_enabled = compressed.COMPRESSION_ENABLED
+        # Appending an HDU read from the file should not by itself cause the
+        # file to be considered resized
+        saved_resize = getattr(self, '_resize', False)
+        saved_truncate = getattr(self, '_truncate', False)
+        self._in_read_next_hdu = True
 
         try:
             if ('disable_image_compression' in kwargs and
-                kwargs['disable_image_compression']):
+                    kwargs['disable_image_compression']):
                 compressed.COMPRESSION_ENABLED = False
 
-            # read all HDUs
-            while True:
-                try:
-                    if fileobj is not None:
-                        if ffo.writeonly:
-                            # Output stream--not interested in reading/parsing
-                            # the HDUs--just writing to the output file
-                            return hdulist
-
-                        try:
-                            hdu = _BaseHDU.readfrom(ffo, **kwargs)
-                        except EOFError:
-                            break
-                        except IOError:
-                            if ffo.writeonly:
-                                break
-                            else:
-                                raise
-                    else:
-                        if not data:
-                            break
-                        hdu = _BaseHDU.fromstring(data)
-                        data = data[hdu._data_offset + hdu._data_size:]
-                    hdulist.append(hdu)
-                    hdu._new = False
-                    if 'checksum' in kwargs:
-                        hdu._output_checksum = kwargs['checksum']
-                # check in the case there is extra space after the last HDU or
-                # corrupted HDU
-                except (VerifyError, ValueError) as exc:
-                    warnings.warn(
-                        'Error validating header for HDU #%d (note: PyFITS '
-                        'uses zero-based indexing).\n%s\n'
-                        'There may be extra bytes after the last HDU or the '
-                        'file is corrupted.' %
-                        (len(hdulist), indent(str(exc))), VerifyWarning)
-                    del exc
-                    break
+            try:
+                if fileobj is not None:
+                    if nloaded > 0:
+                        # The file position may have been moved since the
+                        # last HDU was read, so seek to just past its end
+                        last = super(HDUList, self).__getitem__(-1)
+                        fileobj.seek(last._data_offset + last._data_size,
+                                     os.SEEK_SET)
 
-            # If we're trying to read only and no header units were found,
-            # raise and exception
-            if mode in ('readonly', 'denywrite') and len(hdulist) == 0:
-                raise IOError('Empty or corrupt FITS file')
+                    try:
+                        hdu = self._readfrom_file()
+                    except EOFError:
+                        self._read_all = True
+                        return False
+                    except IOError:
+                        if fileobj.writeonly:
+                            self._read_all = True
+                            return False
+                        else:
+                            raise
+                else:
+                    if not data:
+                        self._read_all = True
+                        return False
+                    hdu = _BaseHDU.fromstring(data)
+                    self._data = data[hdu._data_offset + hdu._data_size:]
+
+                self.append(hdu)
+                hdu._new = False
+                if 'checksum' in kwargs:
+                    hdu._output_checksum = kwargs['checksum']
+            # check in the case there is extra space after the last HDU or
+            # corrupted HDU
+            except (VerifyError, ValueError) as exc:
+                warnings.warn(
+                    'Error validating header for HDU #%d (note: PyFITS '
+                    'uses zero-based indexing).\n%s\n'
+                    'There may be extra bytes after the last HDU or the '
+                    'file is corrupted.' %
+                    (nloaded, indent(str(exc))), VerifyWarning)
+                del exc
+                self._read_all = True
+                return False
+        finally:
+            compressed.COMPRESSION_ENABLED = saved_compression_enabled
+            self._in_read_next_hdu = False
+            self._resize = saved_resize
+            self._truncate = saved_truncate
+
+        return True
+
+    def _read_indexed_hdu(self, idx):
+        """
+        If the HDU at the given index was located through an HDU index and
+        has not been read yet, read it from the file and replace its
+        placeholder in the `HDUList`.
+
+        Returns the HDU at the given index.
+        """
+
+        entry = super(HDUList, self).__getitem__(idx)
+        if not isinstance(entry, _IndexedHDU):
+            return entry
 
-            # initialize/reset attributes to be used in "update/append" mode
-            hdulist._resize = False
-            hdulist._truncate = False
+        if self._file.closed:
+            raise IOError('Cannot read HDU #%d from the file %r; the file has '
+                          'been closed.' % (idx, self._file.name))
+
+        kwargs = self._open_kwargs
+        saved_compression_enabled = compressed.COMPRESSION_ENABLED
+
+        try:
+            if ('disable_image_compression' in kwargs and
+                    kwargs['disable_image_compression']):
+                compressed.COMPRESSION_ENABLED = False
 
+            self._file.seek(entry.header_offset)
+            hdu = self._readfrom_file()
         finally:
             compressed.COMPRESSION_ENABLED = saved_compression_enabled
 
-        return hdulist
+        hdu._new = False
+        if 'checksum' in kwargs:
+            hdu._output_checksum = kwargs['checksum']
+
+        super(HDUList, self).__setitem__(idx, hdu)
+        return hdu
+
+    def _readfrom_file(self):
+        """
+        Reads the HDU at the current position in the file, and schedules the
+        verification of its checksums if they are being verified in the
+        background.
+        """
+
+        kwargs = self._open_kwargs
+        if self._checksum_executor is None:
+            return _BaseHDU.readfrom(self._file, **kwargs)
+
+        read_kwargs = dict(kwargs, checksum=False)
+        hdu = _BaseHDU.readfrom(self._file, **read_kwargs)
+        if isinstance(hdu, _ValidHDU):
+            hdu._verify_checksum_datasum(kwargs['checksum'],
+                                         executor=self._checksum_executor,
+                                         wait=self._wait_for_checksum)
+        return hdu
+
+    def _read_all_hdus(self):
+        """
+        Read all remaining HDUs from the file, if any, that have not yet been
+        read when loading lazily.
+        """
+
+        while self._read_next_hdu():
+            pass
+
+    def _try_while_unread_hdus(self, func, *args, **kwargs):
+        """
+        Attempt an operation that accesses an HDU by index and that can fail
+        with an `IndexError` if not all HDUs have been read yet.  Keep reading
+        HDUs until the operation succeeds or there are no more HDUs to read.
+        """
+
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except IndexError:
+                if not self._read_next_hdu():
+                    raise
 
     def _verify(self, option='warn'):
         text = ''
@@ -1091,3 +1469,75 @@ class HDUList(list, _Verify):
                 self._truncate = False
 
         return self._resize
+
+
+class _IndexedHDU(object):
+    """
+    Placeholder in an `HDUList` for an HDU whose location in the file is known
+    from an HDU index, but that has not been read yet.
+
+    Provides the ``name`` and ``ver`` attributes of the HDU so that
+    `HDUList.index_of` can look up HDUs without reading them.
+    """
+
+    def __init__(self, header_offset, data_offset, data_size, xtension, name,
+                 ver):
+        self.header_offset = header_offset
+        self.data_offset = data_offset
+        self.data_size = data_size
+        self.xtension = xtension
+        self.name = name
+        self.ver = ver
+
+    def __repr__(self):
+        return '<%s %r at offset %d>' % (self.__class__.__name__,
+                                         (self.name, self.ver),
+                                         self.header_offset)
+
+    @classmethod
+    def fromhdu(cls, hdu):
+        if isinstance(hdu, cls):
+            return hdu
+
+        xtension = hdu._header.get('XTENSION', '')
+        if not isinstance(xtension, string_types):
+            xtension = ''
+
+        return cls(hdu._header_offset, hdu._data_offset, hdu._data_size,
+                   xtension.rstrip(), hdu.name, hdu.ver)
+
+
+def _read_hdu_index(fileobj):
+    """
+    Reads the HDU index for the given `_File`, if there is one and it is up to
+    date with the file, and returns a list of `_IndexedHDU` for it.
+
+    Returns `None` if there is no usable index.
+    """
+
+    if not fileobj.name or fileobj.file_like:
+        return None
+
+    filename = fileobj.name + HDU_INDEX_SUFFIX
+    if not os.path.exists(filename):
+        return None
+
+    stat = os.stat(fileobj.name)
+
+    with fitsopen(filename) as hdul:
+        index = hdul[1]
+        header = index.header
+        if (header.get('FILENAME') != os.path.basename(fileobj.name) or
+                header.get('FILESIZE') != stat.st_size or
+                # The time is stored with the limited precision of a header
+                # card value
+                abs(header.get('FILEMTIM', 0) - stat.st_mtime) > 1e-5):
+            warnings.warn('The HDU index %r is out of date and will be '
+                          'ignored.' % filename)
+            return None
+
+        data = index.data
+        fields = [data.field(name).tolist()
+                  for name in ('HDRLOC', 'DATLOC', 'DATSPAN', 'XTENSION',
+                               'EXTNAME', 'EXTVER')]
+        return [_IndexedHDU(*entry) for entry in zip(*fields)]
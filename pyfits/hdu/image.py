@@ -8,7 +8,8 @@ from ..extern.six.moves import range
 
 from ..header import Header
 from ..util import (_is_pseudo_unsigned, _unsigned_zero, _is_int,
-                    lazyproperty, isiterable, deprecated, classproperty)
+                    _output_array, lazyproperty, isiterable, deprecated,
+                    classproperty)
 from .base import DELAYED, _ValidHDU, ExtensionHDU, BITPIX2DTYPE, DTYPE2BITPIX
 from ..verify import VerifyWarning
 
@@ -167,6 +168,156 @@ class _ImageBaseHDU(_ValidHDU):
 
         return Section(self)
 
+    def read(self, out=None, dtype=None):
+        """
+        Read the whole image, like `data`, but optionally into an existing
+        array or with a given dtype.
+
+        Unlike `data` the result is not kept by the HDU, so that reading the
+        image again reads it from the file again.  If the data has already
+        been loaded it is copied from `data` instead.
+
+        Parameters
+        ----------
+        out : `numpy.ndarray`, optional
+            An array with the shape of the image, into which the image is
+            read and scaled instead of a new array; it is returned.  For
+            example a series of images with the same shape may all be read
+            into one buffer.
+
+        dtype : dtype, optional
+            The dtype to scale the image to, instead of the dtype of `data`
+            (which is for example float64 for scaled 32-bit integer images).
+            If ``out`` is also given, it must have this dtype.
+
+        Returns
+        -------
+        data : `numpy.ndarray` or `None`
+            The image data; ``out`` if given.
+        """
+
+        if not self._data_loaded:
+            if not self.shape:
+                return None
+            return self.section.read(Ellipsis, out=out, dtype=dtype)
+        elif self.data is None or (out is None and dtype is None):
+            return self.data
+
+        data = _output_array(out, self.data.shape, dtype)
+        data[...] = self.data
+        return data if out is None else out
+
+    def iter_chunks(self, axis=0, size=None, out=None):
+        """
+        Iterate over the image in blocks along one of its axes, reading and
+        scaling one block at a time.
+
+        Only one block of the image is held in memory at once (as long as
+        earlier blocks are not kept), so that statistics or other reductions
+        can be computed over scaled images much larger than the available
+        memory.  If the data has already been loaded the blocks are slices of
+        `data` instead.
+
+        Parameters
+        ----------
+        axis : int, optional
+            The axis (in numpy order) to iterate along.  The default of 0 is
+            the slowest varying axis, which is the last axis in FITS order;
+            blocks along it are contiguous in the file and are read most
+            efficiently.
+
+        size : int, optional
+            The number of positions along ``axis`` in each block (the last
+            block may have fewer).  By default this is the length of ``out``
+            along ``axis`` if ``out`` is given, and otherwise each block holds
+            about 16 MB of scaled data.
+
+        out : `numpy.ndarray`, optional
+            An array with the shape of a full block into which each block is
+            scaled in turn, instead of allocating a new array for every block.
+            The blocks are then views of ``out``, so any values to be kept
+            past the next block must be copied.  ``out`` need not have the
+            dtype of `data`; for example a native float32 array may be used
+            for an image that would otherwise be scaled to float64.
+
+        Yields
+        ------
+        block : `numpy.ndarray`
+            The next block of the image.
+        """
+
+        shape = self.shape
+        naxis = len(shape)
+        if not -naxis <= axis < naxis:
+            raise ValueError('axis {0} is out of bounds for an image with {1} '
+                             'dimensions.'.format(axis, naxis))
+        axis %= naxis
+        if not all(shape):
+            return
+
+        if size is None:
+            if out is not None and out.ndim == naxis:
+                size = out.shape[axis]
+            else:
+                if self._data_loaded:
+                    itemsize = self.data.dtype.itemsize
+                elif (not self._do_not_scale_image_data and
+                        self._dtype_for_bitpix() is not None and
+                        (self._orig_bscale != 1 or self._orig_bzero != 0 or
+                         self._blank is not None)):
+                    itemsize = self._dtype_for_bitpix().itemsize
+                else:
+                    itemsize = abs(self._orig_bitpix) // 8
+                blocksize = itemsize
+                for idx, length in enumerate(shape):
+                    if idx != axis:
+                        blocksize *= length
+                size = max(_ITER_CHUNK_SIZE // max(blocksize, 1), 1)
+        elif size < 1:
+            raise ValueError('size must be at least 1.')
+
+        if out is not None:
+            block_shape = shape[:axis] + (size,) + shape[axis + 1:]
+            if out.shape != block_shape:
+                raise ValueError('out must have shape {0} for blocks of size '
+                                 '{1}; got {2}.'.format(block_shape, size,
+                                                        out.shape))
+
+        code = BITPIX2DTYPE[self._orig_bitpix]
+        rowsize = abs(self._orig_bitpix) // 8
+        for length in shape[1:]:
+            rowsize *= length
+        lead = (slice(None),) * axis
+        for start in range(0, shape[axis], size):
+            stop = min(start + size, shape[axis])
+            key = lead + (slice(start, stop),)
+            if out is not None:
+                # Only the last block may be shorter than out
+                buf = out[lead + (slice(0, stop - start),)]
+
+            if self._data_loaded:
+                if out is None:
+                    yield self.data[key]
+                else:
+                    buf[...] = self.data[key]
+                    yield buf
+                continue
+
+            if axis == 0:
+                raw_data = self._get_raw_data((stop - start,) + shape[1:],
+                                              code,
+                                              self._data_offset +
+                                              start * rowsize)
+                raw_data.dtype = raw_data.dtype.newbyteorder('>')
+            else:
+                key += (slice(None),) * (naxis - axis - 1)
+                raw_data = self.section._getrawdata(key)
+
+            if out is None:
+                yield self._scale_image_data(raw_data)
+            else:
+                yield self._scale_image_data_into(raw_data, buf)
+
     @property
     def shape(self):
         """
@@ -608,11 +759,12 @@ class _ImageBaseHDU(_ValidHDU):
 
             return data
 
-    def _get_scaled_image_data(self, offset, shape):
+    def _get_scaled_image_data(self, offset, shape, out=None, dtype=None):
         """
         Internal function for reading image data from a file and apply scale
         factors to it.  Normally this is used for the entire image, but it
-        supports alternate offset/shape for Section support.
+        supports alternate offset/shape for Section support.  The data is
+        scaled into ``out`` or to ``dtype`` if either is given.
         """
 
         code = BITPIX2DTYPE[self._orig_bitpix]
@@ -620,6 +772,21 @@ class _ImageBaseHDU(_ValidHDU):
         raw_data = self._get_raw_data(shape, code, offset)
         raw_data.dtype = raw_data.dtype.newbyteorder('>')
 
+        return self._scale_image_data(raw_data, out=out, dtype=dtype)
+
+    def _scale_image_data(self, raw_data, out=None, dtype=None):
+        """
+        Applies the scale factors and BLANK value, if any, to raw (big-endian)
+        image data from the file.
+
+        If ``out`` or ``dtype`` is given the data is scaled into ``out``, or a
+        new array of ``dtype``, with `_scale_image_data_into`.
+        """
+
+        if out is not None or dtype is not None:
+            out = _output_array(out, raw_data.shape, dtype)
+            return self._scale_image_data_into(raw_data, out)
+
         if self._do_not_scale_image_data or (
                 self._orig_bzero == 0 and self._orig_bscale == 1 and
                 self._blank is None):
@@ -681,6 +848,63 @@ class _ImageBaseHDU(_ValidHDU):
 
         return data
 
+    def _scale_image_data_into(self, raw_data, out):
+        """
+        Applies the scale factors and BLANK value, if any, to raw (big-endian)
+        image data as `_scale_image_data` does, but writes the result into the
+        existing array ``out`` (of the same shape, and any dtype that can hold
+        the scaled values) instead of a new array.  Returns ``out``.
+
+        Unless the data is pseudo-unsigned, integer arrays can only hold data
+        scaled by an integer ``BZERO`` alone; a ValueError is raised for data
+        which needs floating point values for its ``BSCALE``, ``BZERO`` or
+        blank pixels.
+        """
+
+        if self._do_not_scale_image_data or (
+                self._orig_bzero == 0 and self._orig_bscale == 1 and
+                self._blank is None):
+            out[...] = raw_data
+            return out
+
+        dtype = self._dtype_for_bitpix()
+        if dtype is not None and dtype.kind == 'u':
+            # Pseudo-unsigned integers: adding BZERO = 2**(bits - 1) to the
+            # signed values is the same as flipping the sign bit of their
+            # unsigned view, which works for any dtype of out
+            bits = dtype.itemsize * 8
+            unsigned = raw_data.view(dtype.newbyteorder('>'))
+            np.bitwise_xor(unsigned, dtype.type(1 << (bits - 1)), out,
+                           casting='unsafe')
+            return out
+
+        has_blanks = self._blank is not None and self._bitpix > 0
+        if out.dtype.kind not in 'fc' and (
+                self._orig_bscale != 1 or self._orig_bzero % 1 or has_blanks):
+            raise ValueError(
+                'Image data with BSCALE = %r, BZERO = %r and BLANK = %r '
+                'cannot be scaled into an array of dtype %s; a floating point '
+                'dtype is required.' % (self._orig_bscale, self._orig_bzero,
+                                        self._blank, out.dtype))
+
+        blanks = None
+        if has_blanks:
+            blanks = raw_data == self._blank
+
+        out[...] = raw_data
+        if self._orig_bscale != 1:
+            np.multiply(out, self._orig_bscale, out)
+        if self._orig_bzero != 0:
+            bzero = self._orig_bzero
+            if out.dtype.kind not in 'fc':
+                bzero = int(bzero)
+            np.add(out, bzero, out, casting='unsafe')
+
+        if blanks is not None:
+            out[blanks] = np.nan
+
+        return out
+
     def _summary(self):
         """
         Summarize the HDU: name, dimensions, and formats.
@@ -755,6 +979,20 @@ class _ImageBaseHDU(_ValidHDU):
             return super(_ImageBaseHDU, self)._calculate_datasum(
                 blocking=blocking)
 
+    def _data_bytes(self):
+        data = self.data
+
+        # The data is only written as is if it is already big-endian, and
+        # is not going to be converted back to its original type
+        if (data is None or data.dtype.fields is not None or
+                self._scale_back or _is_pseudo_unsigned(data.dtype) or
+                not data.flags.c_contiguous or
+                data.dtype.byteorder == '<' or
+                (data.dtype.byteorder == '=' and sys.byteorder == 'little')):
+            return None
+
+        return data.reshape(-1).view(np.uint8)
+
     @classproperty
     @deprecated('1.1.0', alternative='the module level constant BITPIX2DTYPE')
     def NumCode(cls):
@@ -766,6 +1004,15 @@ class _ImageBaseHDU(_ValidHDU):
         return DTYPE2BITPIX
 
 
+# Blocks yielded by _ImageBaseHDU.iter_chunks hold about this many bytes of
+# scaled data by default
+_ITER_CHUNK_SIZE = 2 ** 24
+
+# Runs of a non-contiguous Section that are separated by fewer than this many
+# bytes in the file are read from the file at once
+_SECTION_READ_GAP = 2 ** 16
+
+
 class Section(object):
     """
     Image section.
@@ -784,6 +1031,36 @@ class Section(object):
         self.hdu = hdu
 
     def __getitem__(self, key):
+        return self.read(key)
+
+    def read(self, key, out=None, dtype=None):
+        """
+        Read the section of the image given by ``key``, as ``section[key]``
+        does, optionally into an existing array or with a given dtype.
+
+        Parameters
+        ----------
+        key : int, slice, tuple, etc.
+            The index of the section, as given to ``section[key]``.
+
+        out : `numpy.ndarray`, optional
+            An array with the shape of the section, into which the section is
+            read and scaled instead of a new array; it is returned.  For
+            example the frames of a series of images with the same shape may
+            all be read into one buffer.
+
+        dtype : dtype, optional
+            The dtype to scale the section to, instead of the dtype of the
+            HDU's `data` (which is for example float64 for scaled 32-bit
+            integer images).  If ``out`` is also given, it must have this
+            dtype.
+
+        Returns
+        -------
+        data : `numpy.ndarray` or scalar
+            The section of the image; ``out`` if given.
+        """
+
         if not isinstance(key, tuple):
             key = (key,)
         naxis = len(self.hdu.shape)
@@ -802,6 +1079,24 @@ class Section(object):
         return_0dim = (all(isinstance(k, (int, np.integer)) for k in key)
                        and len(key) == naxis)
 
+        data = self._getsection(key, out=out, dtype=dtype)
+
+        if out is not None:
+            return out
+        elif return_scalar:
+            data = data.item()
+        elif return_0dim:
+            data = data.squeeze()
+        return data
+
+    def _getsection(self, key, out=None, dtype=None):
+        """
+        Returns the section of the image given by ``key``, which contains
+        exactly one index per axis, read into ``out`` or with the given
+        ``dtype`` if either is given (see `_output_array`).
+        """
+
+        naxis = len(self.hdu.shape)
         dims = []
         offset = 0
         # Find all leading axes for which a single point is used.
@@ -828,36 +1123,155 @@ class Section(object):
             dims = tuple(dims) or (1,)
             bitpix = self.hdu._orig_bitpix
             offset = self.hdu._data_offset + offset * abs(bitpix) // 8
-            data = self.hdu._get_scaled_image_data(offset, dims)
+            return self.hdu._get_scaled_image_data(offset, dims, out=out,
+                                                   dtype=dtype)
         else:
-            data = self._getdata(key)
+            return self._getdata(key, out=out, dtype=dtype)
 
-        if return_scalar:
-            data = data.item()
-        elif return_0dim:
-            data = data.squeeze()
-        return data
+    def _getdata(self, keys, out=None, dtype=None):
+        """
+        Reads a non-contiguous section of the image, given one index per axis.
+        Each axis is indexed independently: integers drop the axis, while
+        slices and integer or boolean arrays select the given indices along
+        the axis.
+        """
 
-    def _getdata(self, keys):
-        for idx, (key, axis) in enumerate(list(zip(keys, self.hdu.shape))):
-            if isinstance(key, slice):
-                ks = list(range(*key.indices(axis)))
-                break
-            elif isiterable(key):
-                # Handle both integer and boolean arrays.
-                ks = np.arange(axis, dtype=int)[key]
-                break
-            # This should always break at some point if _getdata is called.
+        return self.hdu._scale_image_data(self._getrawdata(keys), out=out,
+                                          dtype=dtype)
+
+    def _getrawdata(self, keys):
+        """
+        Like `_getdata`, but returns the raw (big-endian) data of the section
+        without applying any scale factors.
+        """
 
-        data = [self[keys[:idx] + (k,) + keys[idx + 1:]] for k in ks]
+        hdu = self.hdu
+        dtype = np.dtype(BITPIX2DTYPE[hdu._orig_bitpix]).newbyteorder('>')
 
-        if any(isinstance(key, slice) or isiterable(key)
-               for key in keys[idx + 1:]):
-            # data contains multidimensional arrays; combine them.
-            return np.array(data)
+        if hdu._buffer is not None or (hdu._file is not None and
+                                       hdu._file.memmap):
+            # Viewing the full image costs nothing, so just index it
+            raw_data = hdu._get_raw_data(hdu.shape, dtype, hdu._data_offset)
+            raw_data = self._index_array(raw_data, keys)
         else:
-            # Only singleton dimensions remain; concatenate in a 1D array.
-            return np.concatenate([np.atleast_1d(array) for array in data])
+            raw_data = self._read_runs(keys, dtype)
+
+        return raw_data
+
+    @staticmethod
+    def _index_array(array, keys):
+        """
+        Returns a copy of the section of an array given by ``keys`` (see
+        `_getdata`).  Integers and slices are applied as a strided view of the
+        array, so only the elements that are selected are read from it.
+        """
+
+        basic_keys = []
+        array_keys = []
+        for key in keys:
+            if _is_int(key) or isinstance(key, slice):
+                basic_keys.append(key)
+            else:
+                # The arrays are applied one axis at a time to select the
+                # indices along each axis independently
+                array_keys.append((len([k for k in basic_keys
+                                        if not _is_int(k)]),
+                                   np.arange(array.shape[len(basic_keys)])
+                                   [key]))
+                basic_keys.append(slice(None))
+
+        array = array[tuple(basic_keys)]
+        if not array_keys:
+            return array.copy()
+
+        for axis, indices in array_keys:
+            array = array.take(indices, axis=axis)
+        return array
+
+    def _read_runs(self, keys, dtype):
+        """
+        Reads the section of the image given by ``keys`` (see `_getdata`)
+        from the file, without reading the whole image.
+
+        The section is made up of runs of elements that are contiguous in the
+        file; runs that are close together are read with a single read, and
+        the elements are then gathered from the data that was read.
+        """
+
+        hdu = self.hdu
+        shape = hdu.shape
+        indices = []
+        out_shape = []
+        for key, axis in zip(keys, shape):
+            if _is_int(key):
+                indices.append(np.array([key]))
+            else:
+                if isinstance(key, slice):
+                    idx = np.arange(*key.indices(axis))
+                else:
+                    idx = np.arange(axis)[key]
+                indices.append(idx)
+                out_shape.append(len(idx))
+
+        # The runs are along the innermost axis that is not fully selected;
+        # the elements of all the axes after it are read along with each run
+        run_axis = len(shape) - 1
+        while (run_axis > 0 and len(indices[run_axis]) == shape[run_axis] and
+               (np.diff(indices[run_axis]) == 1).all()):
+            run_axis -= 1
+
+        inner = int(np.prod(shape[run_axis + 1:], dtype=np.int64))
+        run_indices = indices[run_axis]
+        if len(run_indices) and (np.diff(run_indices) == 1).all():
+            run_len = len(run_indices) * inner
+            run_indices = run_indices[:1]
+        else:
+            run_len = inner
+
+        # The element offset of the start of each run, in the order the runs
+        # appear in the section
+        starts = np.zeros((), dtype=np.int64)
+        stride = inner
+        for axis in range(run_axis, -1, -1):
+            idx = run_indices if axis == run_axis else indices[axis]
+            starts = np.add.outer(idx.astype(np.int64) * stride, starts)
+            stride *= shape[axis]
+        starts = starts.ravel()
+
+        if not len(starts) or not run_len:
+            return np.zeros(out_shape, dtype=dtype)
+
+        # Group the runs (in the order they appear in the file) so that runs
+        # separated by less than _SECTION_READ_GAP bytes are read at once
+        order = np.argsort(starts, kind='mergesort')
+        sorted_starts = starts[order]
+        ends = np.maximum.accumulate(sorted_starts + run_len)
+        gaps = (sorted_starts[1:] - ends[:-1]) * dtype.itemsize
+        new_group = np.concatenate(([True], gaps > _SECTION_READ_GAP))
+        group_idx = np.cumsum(new_group) - 1
+        group_starts = sorted_starts[new_group]
+        group_ends = ends[np.concatenate((new_group[1:], [True]))]
+        group_sizes = group_ends - group_starts
+
+        buf = np.empty(group_sizes.sum(), dtype=dtype)
+        buf_starts = np.cumsum(group_sizes) - group_sizes
+        for start, size, buf_start in zip(group_starts, group_sizes,
+                                          buf_starts):
+            offset = hdu._data_offset + int(start) * dtype.itemsize
+            buf[buf_start:buf_start + size] = hdu._get_raw_data(
+                int(size), dtype, offset)
+
+        # The location in buf of the start of each run
+        positions = np.empty_like(starts)
+        positions[order] = (buf_starts[group_idx] +
+                            sorted_starts - group_starts[group_idx])
+
+        if len(positions) == 1:
+            data = buf[positions[0]:positions[0] + run_len]
+        else:
+            data = buf[np.add.outer(positions, np.arange(run_len))]
+
+        return data.reshape(out_shape)
 
 
 class PrimaryHDU(_ImageBaseHDU):
@@ -1,12 +1,26 @@
 import gzip
 import os
 
+import numpy as np
+
+from ..column import _FormatP
 from ..file import _File
 from ..util import _pad_length, fileobj_name
 from .base import _BaseHDU, BITPIX2DTYPE
+from .compressed import (CompImageHDU, _offset_descriptors,
+                         DEFAULT_COMPRESSION_TYPE, DEFAULT_HCOMP_SCALE,
+                         DEFAULT_HCOMP_SMOOTH, DEFAULT_QUANTIZE_LEVEL,
+                         DEFAULT_QUANTIZE_METHOD, DEFAULT_DITHER_SEED,
+                         DITHER_SEED_CHECKSUM, DITHER_SEED_CLOCK)
 from .hdulist import HDUList
 from .image import PrimaryHDU
 
+try:
+    from pyfits import compression
+except ImportError:
+    # CompImageHDU raises an error about the missing module when used
+    pass
+
 
 class StreamingHDU(object):
     """
@@ -223,3 +237,296 @@ class StreamingHDU(object):
         """
 
         self._ffo.close()
+
+
+class CompImageStreamingHDU(object):
+    """
+    A class that provides the capability to stream image data to a tile
+    compressed image extension in a FITS file, so that an image larger than
+    the available memory can be compressed without holding all of it at once.
+
+    The image is written in chunks of whole rows of the image (that is, slices
+    along its last FITS axis, the first axis of the Numpy array).  Each tile
+    of the image is compressed as soon as all of its pixels have been written,
+    and its compressed data appended to the file; only the compressed table
+    rows, and a partial row of tiles, are kept in memory.  The pseudocode
+    below illustrates its use::
+
+        header = pyfits.Header()
+
+        for all the cards you need in the image header:
+            header[key] = (value, comment)
+
+        shdu = pyfits.CompImageStreamingHDU('filename.fits', header,
+                                            tile_size=[1024, 1024])
+
+        for each block of image rows:
+            shdu.write(data)
+
+        shdu.close()
+    """
+
+    def __init__(self, name, header,
+                 compression_type=DEFAULT_COMPRESSION_TYPE,
+                 tile_size=None,
+                 hcomp_scale=DEFAULT_HCOMP_SCALE,
+                 hcomp_smooth=DEFAULT_HCOMP_SMOOTH,
+                 quantize_level=DEFAULT_QUANTIZE_LEVEL,
+                 quantize_method=DEFAULT_QUANTIZE_METHOD,
+                 dither_seed=DEFAULT_DITHER_SEED):
+        """
+        Construct a `CompImageStreamingHDU` object given a file name and the
+        header of the image to compress.
+
+        Parameters
+        ----------
+        name : file path or file object
+            The file to which the compressed image will be streamed.  If
+            opened, the file object must be opened in a mode that allows
+            seeking back to and rewriting earlier parts of the file, such as
+            'wb+' or 'rb+'.
+
+        header : `Header` instance
+            The header of the (uncompressed) image to be written to the
+            file; its ``BITPIX`` and ``NAXISn`` keywords determine the type
+            and shape of the data that must be written to the stream.
+
+        compression_type, tile_size, hcomp_scale, hcomp_smooth : optional
+            The compression parameters, as for `CompImageHDU`.
+
+        quantize_level, quantize_method, dither_seed : optional
+            The floating point quantization parameters, as for
+            `CompImageHDU`.
+
+        Notes
+        -----
+        The compressed image is always appended to the end of the file as
+        an extension.  If the file does not already exist, it will be created
+        with a default Primary HDU.
+
+        The compressed image table, and the ``PCOUNT`` keyword giving the size
+        of its heap, are only known once the whole image has been compressed,
+        so they are written when the stream is closed.
+        """
+
+        if isinstance(name, gzip.GzipFile):
+            raise TypeError('CompImageStreamingHDU not supported for GzipFile '
+                            'objects.')
+
+        self._header = header.copy()
+
+        naxis = self._header.get('NAXIS', 0)
+        if naxis < 1:
+            raise ValueError('The header must describe an image with at '
+                             'least one axis.')
+
+        self._shape = tuple(self._header['NAXIS' + str(idx)]
+                            for idx in range(naxis, 0, -1))
+        self._dtype = np.dtype(BITPIX2DTYPE[self._header['BITPIX']])
+
+        # The checksum dither seed is computed from the first tile of the
+        # image, which has not been written yet
+        self._checksum_seed = dither_seed == DITHER_SEED_CHECKSUM
+        if self._checksum_seed:
+            dither_seed = DITHER_SEED_CLOCK
+
+        # Set up the compressed image table header with a stand-in for the
+        # image data that has the right type and shape but takes no memory
+        placeholder = np.lib.stride_tricks.as_strided(
+            np.zeros(1, dtype=self._dtype), shape=self._shape,
+            strides=(0,) * naxis)
+        self._hdu = CompImageHDU(placeholder, self._header,
+                                 compression_type=compression_type,
+                                 tile_size=tile_size,
+                                 hcomp_scale=hcomp_scale,
+                                 hcomp_smooth=hcomp_smooth,
+                                 quantize_level=quantize_level,
+                                 quantize_method=quantize_method,
+                                 dither_seed=dither_seed)
+        del self._hdu.data
+
+        hdr = self._hdu._header
+        nrows = hdr['NAXIS2']
+        self._tile = hdr['ZTILE' + str(naxis)]
+        self._layer_rows = nrows // -(-self._shape[0] // self._tile)
+        self._tbsize = hdr['NAXIS1'] * nrows
+        self._table = np.zeros(
+            nrows, dtype=self._hdu.columns.dtype.newbyteorder('>'))
+
+        filename = fileobj_name(name) or ''
+
+        if filename:
+            newfile = (not os.path.exists(filename) or
+                       os.path.getsize(filename) == 0)
+        else:
+            newfile = hasattr(name, 'len') and name.len == 0
+
+        if newfile:
+            hdulist = HDUList([PrimaryHDU()])
+            hdulist.writeto(name, 'exception')
+
+        self._ffo = _File(name, 'update')
+        if not self._ffo.rewritable():
+            self._ffo.close()
+            raise IOError('CompImageStreamingHDU requires a file that can be '
+                          'written to and seeked in.')
+        self._ffo.seek(0, 2)
+
+        # Write the header and reserve the space for the table; both are
+        # rewritten when the stream is closed
+        self._header_offset = self._hdu._writeheader(self._ffo)[0]
+        self._ffo.writearray(self._table)
+        self._ffo.flush()
+
+        self._heapsize = 0
+        self._rows_written = 0
+        self._pending = None
+        self.writecomplete = False
+
+    # Support the 'with' statement
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def write(self, data):
+        """
+        Write the given rows of image data to the stream.
+
+        Parameters
+        ----------
+        data : ndarray
+            The next rows of the image (that is, a slice along the first axis
+            of the image array, with the shape of the image in its other
+            axes), or a single row.  The rows need not cover whole tiles;
+            rows that do not yet make up complete tiles are held back until
+            the following rows are written.
+
+        Returns
+        -------
+        writecomplete : bool
+            Flag that when `True` indicates that all of the image has been
+            written to the stream.
+
+        Notes
+        -----
+        As with `StreamingHDU`, an `~.exceptions.IOError` exception is raised
+        if the data would overflow the image specified by the header, and a
+        `~.exceptions.TypeError` exception if the dtype of the data does not
+        match its ``BITPIX``.
+        """
+
+        data = np.asarray(data)
+        if data.ndim == len(self._shape) - 1:
+            data = data[np.newaxis]
+
+        pending = 0 if self._pending is None else len(self._pending)
+
+        if (self.writecomplete or
+                self._rows_written + pending + len(data) > self._shape[0]):
+            raise IOError('Attempt to write more data to the stream than the '
+                          'header specified.')
+
+        if self._dtype.name != data.dtype.name:
+            raise TypeError('Supplied data does not match the type specified '
+                            'in the header.')
+
+        if data.shape[1:] != self._shape[1:]:
+            raise ValueError('Supplied data does not match the shape of the '
+                             'image specified in the header.')
+
+        if self._pending is not None:
+            data = np.concatenate([self._pending, data])
+            self._pending = None
+
+        # Compress all complete rows of tiles, or everything that is left at
+        # the end of the image
+        if self._rows_written + len(data) == self._shape[0]:
+            nrows = len(data)
+        else:
+            nrows = len(data) // self._tile * self._tile
+
+        if nrows:
+            self._compress(data[:nrows])
+
+        if nrows < len(data):
+            self._pending = data[nrows:].copy()
+
+        self.writecomplete = self._rows_written == self._shape[0]
+
+        return self.writecomplete
+
+    def _compress(self, data):
+        """
+        Compresses whole rows of tiles of the image and appends their
+        compressed data to the heap.
+        """
+
+        start = self._rows_written
+        stop = start + len(data)
+
+        if start == 0 and self._checksum_seed:
+            self._hdu._header['ZDITHER0'] = self._hdu._generate_dither_seed(
+                DITHER_SEED_CHECKSUM, data)
+
+        # The compression module expects the data in native byte order
+        data = np.ascontiguousarray(data,
+                                    dtype=data.dtype.newbyteorder('='))
+
+        first_pixel = [1] * (len(self._shape) - 1) + [start + 1]
+        last_pixel = list(reversed(self._shape[1:])) + [stop]
+        heapsize, buf = compression.compress_hdu_section(
+            self._hdu, data, first_pixel, last_pixel)
+        # The size may be returned as a long, which is not a valid header
+        # value on Python 2
+        heapsize = int(heapsize)
+
+        rows = slice(start // self._tile * self._layer_rows,
+                     -(-stop // self._tile) * self._layer_rows)
+        self._table[rows] = buf[:self._tbsize].view(self._table.dtype)[rows]
+        _offset_descriptors(self._table, rows, self._hdu.columns,
+                            self._heapsize)
+
+        self._ffo.writearray(buf[self._tbsize:self._tbsize + heapsize])
+        self._ffo.flush()
+
+        self._heapsize += heapsize
+        self._rows_written = stop
+
+    def close(self):
+        """
+        Write the compressed image table and the final header, and close the
+        physical FITS file.
+
+        If not all of the image has been written to the stream, the file is
+        closed without writing them, leaving the extension incomplete.
+        """
+
+        if self._ffo.closed:
+            return
+
+        try:
+            if self.writecomplete:
+                size = self._tbsize + self._heapsize
+                self._ffo.write(_pad_length(size) * '\0')
+
+                # Only values in the header change, so it is rewritten in
+                # place followed by the table
+                header = self._hdu._header
+                header['PCOUNT'] = int(self._heapsize)
+                columns = self._hdu.columns
+                for idx, format in enumerate(columns._recformats):
+                    if isinstance(format, _FormatP):
+                        # May be either _FormatP or _FormatQ
+                        _max = int(self._table[columns[idx].name][:, 0].max())
+                        format = format.__class__(format.dtype,
+                                                  repeat=format.repeat,
+                                                  max=_max)
+                        header['TFORM' + str(idx + 1)] = format.tform
+                self._ffo.seek(self._header_offset)
+                self._hdu._writeheader(self._ffo)
+                self._ffo.writearray(self._table)
+                self._ffo.flush()
+        finally:
+            self._ffo.close()
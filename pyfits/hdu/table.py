@@ -25,9 +25,31 @@ from ..column import (FITS2NUMPY, KEYWORD_NAMES, KEYWORD_TO_ATTRIBUTE,
                       _cmp_recformats, _get_index)
 from ..fitsrec import FITS_rec, _get_recarray_field, _has_unicode_fields
 from ..header import Header
-from ..py3compat import ignored
+from ..py3compat import ignored, OrderedDict
 from ..util import lazyproperty, _is_int, _str_to_num, _pad_length, deprecated
-from .base import DELAYED, _ValidHDU, ExtensionHDU
+from .base import DELAYED, _ValidHDU, ExtensionHDU, _StreamingDatasum
+from .image import ImageHDU
+
+try:
+    from pyfits import compression
+    COMPRESSION_SUPPORTED = True
+except ImportError:
+    COMPRESSION_SUPPORTED = False
+
+
+# The arrays of variable length array columns are gathered into chunks of
+# about this many bytes to be written to the heap
+HEAP_CHUNK_SIZE = 2 ** 24
+
+# Row filter expressions are evaluated over chunks of about this many bytes of
+# table rows
+WHERE_CHUNK_SIZE = 2 ** 24
+
+# Tables are binned into histograms in chunks of about this many bytes of rows
+BIN_CHUNK_SIZE = 2 ** 24
+
+# Columns are read from tables in chunks of about this many bytes of rows
+READ_CHUNK_SIZE = 2 ** 24
 
 
 class FITSTableDumpDialect(csv.excel):
@@ -680,6 +702,23 @@ class _TableBaseHDU(ExtensionHDU, _TableLikeHDU):
                     keyword = keyword + str(idx + 1)
                     self._header[keyword] = val
 
+    def _data_bytes(self):
+        data = self.data
+
+        # Columns with converted values are written back to the table in
+        # full, and little-endian columns are byteswapped when written
+        if (not isinstance(data, FITS_rec) or data._converted or
+                not data.flags.c_contiguous):
+            return None
+
+        for name in data.dtype.names:
+            byteorder = data.dtype.fields[name][0].base.byteorder
+            if (byteorder == '<' or
+                    (byteorder == '=' and sys.byteorder == 'little')):
+                return None
+
+        return data.view(type=np.ndarray, dtype=np.ubyte).reshape(-1)
+
 
 class TableHDU(_TableBaseHDU):
     """
@@ -801,30 +840,28 @@ class BinTableHDU(_TableBaseHDU):
 
         with _binary_table_byte_swap(self.data) as data:
             dout = data.view(type=np.ndarray, dtype=np.ubyte)
-            csum = self._compute_checksum(dout, blocking=blocking)
-
-            # Now add in the heap data to the checksum (we can skip any gap
-            # between the table and the heap since it's all zeros and doesn't
-            # contribute to the checksum
-            # TODO: The following code may no longer be necessary since it is
-            # now possible to get a pointer directly to the heap data as a
-            # whole.  That said, it is possible for the heap section to contain
-            # data that is not actually pointed to by the table (i.e. garbage;
-            # this *shouldn't* happen but it is not disallowed either)--need to
-            # double check whether or not the checksum should include such
-            # garbage
-            for idx in range(data._nfields):
-                if isinstance(data.columns._recformats[idx], _FormatP):
-                    for coldata in data.field(idx):
-                        # coldata should already be byteswapped from the call
-                        # to _binary_table_byte_swap
-                        if not len(coldata):
-                            continue
-
-                        csum = self._compute_checksum(coldata, csum,
-                                                      blocking=blocking)
-
-            return csum
+            datasum = _StreamingDatasum()
+            datasum.update(dout)
+
+            # Now add in the heap data to the checksum, in the same order it
+            # is written by _writedata_internal.  The gap between the table and
+            # the heap is all zeros, but it still determines how the heap data
+            # is aligned to the 32-bit words being summed
+            if data._gap:
+                datasum.update(np.zeros(data._gap, dtype=np.ubyte))
+
+            if self._manages_own_heap:
+                datasum.update(data._get_heap_data())
+            else:
+                for idx in range(data._nfields):
+                    if isinstance(data.columns._recformats[idx], _FormatP):
+                        # The arrays should already be byteswapped from the
+                        # call to _binary_table_byte_swap
+                        heap_field = data._get_heap_field(idx)
+                        for chunk in _iter_heap_chunks(heap_field):
+                            datasum.update(chunk)
+
+            return datasum.datasum
 
     def _calculate_datasum(self, blocking):
         """
@@ -873,12 +910,11 @@ class BinTableHDU(_TableBaseHDU):
                                       _FormatP):
                         continue
 
-                    field = self.data.field(idx)
-                    for row in field:
-                        if len(row) > 0:
-                            nbytes += row.nbytes
-                            if not fileobj.simulateonly:
-                                fileobj.writearray(row)
+                    heap_field = self.data._get_heap_field(idx)
+                    for chunk in _iter_heap_chunks(heap_field):
+                        nbytes += chunk.nbytes
+                        if not fileobj.simulateonly:
+                            fileobj.writearray(chunk)
             else:
                 heap_data = data._get_heap_data()
                 if len(heap_data) > 0:
@@ -909,6 +945,754 @@ class BinTableHDU(_TableBaseHDU):
 
                 fileobj.writearray(item)
 
+    def read(self, rows=None, columns=None):
+        """
+        Read some of the rows and columns of the table.
+
+        The table is read a chunk of rows at a time, and only the bytes of the
+        requested columns are copied out of each chunk, so reading a few
+        columns of a wide table uses memory in proportion to the columns
+        read rather than to the width of the table.  If the data has already
+        been loaded the rows and columns are taken from `data`, including any
+        changes made to it.
+
+        Parameters
+        ----------
+        rows : int or slice, optional
+            The row or rows to read; by default all rows are read
+
+        columns : sequence of str or int, optional
+            The names or indices of the columns to read; by default all
+            columns are read
+
+        Returns
+        -------
+        data : `FITS_rec`
+            A new table holding the requested rows and columns
+        """
+
+        selected, indices = self._read_selection(rows, columns)
+
+        dtype = self.columns.dtype
+        fields = [dtype.fields[dtype.names[idx]][:2] for idx in indices]
+        rowsize = sum(field_dtype.itemsize for field_dtype, _ in fields)
+        raw = np.empty((len(selected), rowsize), dtype=np.ubyte)
+        heap = np.array([], dtype=np.ubyte)
+        gap = 0
+        with_heap = any(isinstance(self.columns._recformats[idx], _FormatP)
+                        for idx in indices)
+
+        # Rows are gathered in increasing order, and reversed afterwards for
+        # slices with a negative step
+        reverse = len(selected) > 1 and selected[0] > selected[-1]
+        if reverse:
+            selected = selected[::-1]
+        step = selected[1] - selected[0] if len(selected) > 1 else 1
+
+        # The heap of loaded data is gathered along with the rows; otherwise
+        # only the part of the heap used by the rows read is read afterwards
+        heap_in_chunks = with_heap and self._data_loaded
+
+        if len(selected):
+            chunk_rows = max(READ_CHUNK_SIZE // max(self._rowsize, 1), 1)
+            chunks = self._iter_raw_chunks(chunk_rows, selected[0],
+                                           selected[-1] + 1,
+                                           heap=heap_in_chunks)
+            for start, stop, header, chunk, chunk_heap in chunks:
+                begin, end = np.searchsorted(selected, [start, stop])
+                if step == 1:
+                    picked = slice(selected[begin] - start,
+                                   selected[begin] - start + end - begin)
+                else:
+                    picked = selected[begin:end] - start
+
+                pos = 0
+                for field_dtype, offset in fields:
+                    width = field_dtype.itemsize
+                    raw[begin:end, pos:pos + width] = \
+                        chunk[picked, offset:offset + width]
+                    pos += width
+
+                if heap_in_chunks:
+                    tbsize = (stop - start) * chunk.shape[1]
+                    gap = header.get('THEAP', tbsize) - tbsize
+                    heap = chunk_heap
+
+            if with_heap and not heap_in_chunks:
+                heap = self._read_heap_span(raw, fields, indices)
+
+        if reverse:
+            raw = raw[::-1]
+
+        nrows = len(raw)
+        header = self._raw_header(nrows, rowsize, len(heap),
+                                  nrows * rowsize + gap, indices)
+        table = BinTableHDU(data=DELAYED, header=header, uint=self._uint)
+        table._buffer = bytearray(raw.tostring() + heap.tostring())
+        if not table._buffer:
+            table._buffer = None
+        table._data_offset = 0
+        table._data_size = raw.size + heap.size
+        return table.data
+
+    def iter_chunks(self, nrows=None, columns=None, arrays=False):
+        """
+        Iterate over the rows of the table in chunks, reading and converting
+        one chunk at a time.
+
+        Each chunk is read with `read`, so that only the requested columns of
+        one chunk of rows are held in memory at once (as long as earlier
+        chunks are not kept), whether the file is memory mapped, read
+        normally, or compressed with gzip; this allows processing tables much
+        larger than the available memory.  If the data has already been
+        loaded the chunks are slices of `data` instead.
+
+        Parameters
+        ----------
+        nrows : int, optional
+            The number of rows in each chunk (the last chunk may have fewer);
+            by default each chunk holds about 16 MB of rows.
+
+        columns : sequence of str or int, optional
+            The names or indices of the columns to read; by default all
+            columns are read.
+
+        arrays : bool, optional
+            If `True`, each chunk is given as a dict mapping the names of the
+            columns to arrays of their values, converted as by
+            `FITS_rec.columns_to_arrays`, instead of as a `FITS_rec`.  The
+            same arrays are refilled for each chunk, so any values to be kept
+            past the next chunk must be copied.
+
+        Yields
+        ------
+        chunk : `FITS_rec` or dict
+            The next chunk of rows of the table.
+        """
+
+        total = self._nrows
+        if nrows is None:
+            nrows = max(READ_CHUNK_SIZE // max(self._rowsize, 1), 1)
+        elif nrows < 1:
+            raise ValueError('nrows must be at least 1.')
+
+        names = [self.columns.names[idx]
+                 for idx in self._column_indices(columns)]
+        buffers = None
+        for start in range(0, total, nrows):
+            stop = min(start + nrows, total)
+            if self._data_loaded and (columns is None or arrays):
+                chunk = self.data[start:stop]
+            else:
+                chunk = self.read(rows=slice(start, stop), columns=columns)
+
+            if not arrays:
+                yield chunk
+            elif buffers is None:
+                buffers = chunk.columns_to_arrays(names)
+                yield OrderedDict(zip(names, buffers))
+            else:
+                # Only the last chunk may be shorter than the first
+                out = [buf[:stop - start] for buf in buffers]
+                yield OrderedDict(zip(names,
+                                      chunk.columns_to_arrays(names, out=out)))
+
+    def _read_heap_span(self, raw, fields, indices):
+        """
+        Reads the part of the heap holding the arrays of the variable length
+        array columns in the raw rows gathered by `read`, and updates their
+        descriptors in place to point into it.  Returns the heap bytes read.
+        """
+
+        descriptors = []
+        pos = 0
+        for (field_dtype, _), idx in zip(fields, indices):
+            width = field_dtype.itemsize
+            recformat = self.columns._recformats[idx]
+            if isinstance(recformat, _FormatP):
+                desc = np.ascontiguousarray(raw[:, pos:pos + width])
+                desc = desc.view(field_dtype.base.newbyteorder('>'))
+                counts = desc[:, 0].astype(np.int64)
+                if recformat.format == 'X':
+                    nbytes = (counts + 7) // 8
+                else:
+                    # Character arrays have a dtype of 'a', of size 0
+                    nbytes = counts * (np.dtype(recformat.dtype).itemsize or 1)
+                descriptors.append((pos, width, desc, nbytes))
+            pos += width
+
+        used = [(desc[:, 1][nbytes > 0], (desc[:, 1] + nbytes)[nbytes > 0])
+                for _, _, desc, nbytes in descriptors]
+        starts = np.concatenate([start for start, _ in used])
+        if not len(starts):
+            return np.array([], dtype=np.ubyte)
+
+        low = int(starts.min())
+        high = int(np.concatenate([end for _, end in used]).max())
+        heap = self._get_raw_data(high - low, np.ubyte,
+                                  self._data_offset + self._theap + low)
+
+        for pos, width, desc, nbytes in descriptors:
+            desc[:, 1] = np.where(nbytes > 0, desc[:, 1] - low, 0)
+            raw[:, pos:pos + width] = desc.view(np.ubyte).reshape(-1, width)
+
+        return heap
+
+    def _read_selection(self, rows, columns):
+        """
+        Returns an array of the indices of the rows selected by the ``rows``
+        argument of `read`, and a list of the indices of the columns selected
+        by its ``columns`` argument.
+        """
+
+        nrows = self._nrows
+        if rows is None:
+            rows = slice(None)
+        elif _is_int(rows):
+            if rows < 0:
+                rows += nrows
+            if not 0 <= rows < nrows:
+                raise IndexError('Row index %d out of range' % rows)
+            rows = slice(rows, rows + 1)
+        elif not isinstance(rows, slice):
+            raise TypeError('rows must be an integer or a slice')
+
+        return np.arange(*rows.indices(nrows)), self._column_indices(columns)
+
+    def _column_indices(self, columns):
+        """
+        Returns a list of the indices of the columns selected by the
+        ``columns`` argument of `read`.
+        """
+
+        if columns is None:
+            return list(range(len(self.columns)))
+
+        if isinstance(columns, string_types) or _is_int(columns):
+            columns = [columns]
+
+        return [_get_index(self.columns.names, key) for key in columns]
+
+    def where(self, expression, mask=False):
+        """
+        Select the rows of the table for which a boolean expression is true.
+
+        The expression is evaluated by CFITSIO's row filter expression parser
+        directly on the raw bytes of the table, a chunk of rows at a time, so
+        finding the selected rows does not require converting any of the
+        table's columns, or even reading the data into memory all at once.
+        Columns are referred to by name, and their values are those after
+        ``TSCALn`` and ``TZEROn`` have been applied; variable length array
+        columns cannot be used in expressions.  For example::
+
+            >>> events = hdul[1].where('PI > 30 && STATUS == 0')
+
+        The full syntax of the expressions is described in the `CFITSIO
+        User's Guide
+        <http://heasarc.gsfc.nasa.gov/docs/software/fitsio/c/c_user/node97.html>`_.
+
+        Parameters
+        ----------
+        expression : str
+            A CFITSIO row filter expression evaluating to a boolean for each
+            row of the table.
+
+        mask : bool, optional
+            If `True`, return a boolean array with an element for each row of
+            the table instead of the selected rows.
+
+        Returns
+        -------
+        data : FITS_rec or array
+            The selected rows of the table, or the boolean mask selecting
+            them if ``mask=True``.
+
+        Raises
+        ------
+        ValueError
+            If the expression is not valid for this table, refers to a column
+            which does not exist or has variable length arrays, or does not
+            evaluate to a boolean.
+        """
+
+        if not COMPRESSION_SUPPORTED:
+            raise Exception('The pyfits.compression module is not available.  '
+                            'Row filter expressions cannot be evaluated.')
+
+        nrows = self._nrows
+        result = np.zeros(nrows, dtype=bool)
+        if not nrows:
+            return result if mask else self.data[result]
+
+        # The selected rows of an unloaded table are gathered from each chunk
+        # as it is evaluated, so that the table is only read once
+        gather = not (mask or self._data_loaded or self._has_heap)
+        selected = []
+
+        # The #ROW and #NROWS variables must see the whole table
+        if '#' in expression:
+            chunk_rows = nrows
+        else:
+            chunk_rows = max(WHERE_CHUNK_SIZE // max(self._rowsize, 1), 1)
+
+        # The chunks are closed on errors as well, so that loaded data is
+        # swapped back to its native byte order
+        with contextlib.closing(self._iter_raw_chunks(chunk_rows)) as chunks:
+            for start, stop, header, rows, heap in chunks:
+                buf = _filter_file(header, rows, heap)
+                chunk_result = compression.find_rows(buf, expression)
+                result[start:stop] = chunk_result
+                if gather:
+                    selected.append(rows[chunk_result])
+
+        if mask:
+            return result
+        elif not gather:
+            return self.data[result]
+
+        rows = np.concatenate(selected)
+        header = self._header.copy()
+        header['NAXIS2'] = len(rows)
+        for keyword in ('CHECKSUM', 'DATASUM'):
+            if keyword in header:
+                del header[keyword]
+
+        table = BinTableHDU(data=DELAYED, header=header, uint=self._uint)
+        table._buffer = bytearray(rows.tostring()) if rows.size else None
+        table._data_offset = 0
+        table._data_size = rows.size
+        return table.data
+
+    def bin(self, columns, binsize=1, range=None, weight=None):
+        """
+        Bin the rows of the table into a histogram image, such as an image of
+        the events in an event list.
+
+        The coordinate columns are read directly from the raw bytes of the
+        table a chunk of rows at a time, and each chunk is added to the
+        histogram, so no full-length converted copies of the columns are
+        made.  Their values are those after ``TSCALn`` and ``TZEROn`` have
+        been applied, and rows with a ``TNULLn`` value in any of the columns
+        are not counted.
+
+        Parameters
+        ----------
+        columns : str, int, or sequence
+            The names or indices of the columns giving the coordinates of each
+            row along the axes of the image, the first column along the first
+            axis (``NAXIS1``).  Up to four numeric columns with a single value
+            in each row may be binned.
+
+        binsize : float or sequence, optional
+            The width of the bins along each axis, in the units of its column
+            (default 1).
+
+        range : sequence, optional
+            A ``(min, max)`` pair for each axis, giving the range of values
+            binned along it; rows outside of the range are not counted.  By
+            default the range of each axis is taken from the ``TLMINn`` and
+            ``TLMAXn`` keywords of its column, if present, or otherwise from
+            the minimum and maximum values in the column.  For integer
+            columns the default range is widened by 0.5 at each end, so that
+            it covers the full width of the pixels at its minimum and maximum
+            values.
+
+        weight : str or float, optional
+            The name of a column whose values are summed in each bin instead
+            of counting the rows, or a constant weight for every row.
+
+        Returns
+        -------
+        hdu : ImageHDU
+            The histogram; a 32-bit integer image of counts, or a 64-bit float
+            image if a weight is given.  Its header has ``CTYPEn``,
+            ``CRPIXn``, ``CRVALn`` and ``CDELTn`` keywords relating the pixels
+            along each axis to the values of its column or, if the column has
+            ``TCTYPn``, ``TCRPXn``, ``TCRVLn`` and ``TCDLTn`` keywords, to
+            the world coordinates they define.
+        """
+
+        if isinstance(columns, string_types) or _is_int(columns):
+            columns = [columns]
+
+        indices = [_get_index(self.columns.names, col) for col in columns]
+        naxis = len(indices)
+        if not 1 <= naxis <= 4:
+            raise ValueError('Between 1 and 4 columns may be binned; got %d.'
+                             % naxis)
+
+        binsizes = np.array(binsize, dtype=np.float64) * np.ones(naxis)
+        if binsizes.shape != (naxis,) or not (binsizes > 0).all():
+            raise ValueError('binsize must be a positive number, or a '
+                             'sequence of one for each column.')
+
+        weight_index = None
+        if isinstance(weight, string_types):
+            weight_index = _get_index(self.columns.names, weight)
+            self._check_numeric_column(weight_index)
+
+        for idx in indices:
+            self._check_numeric_column(idx)
+
+        chunk_rows = max(BIN_CHUNK_SIZE // max(self._rowsize, 1), 1)
+
+        if range is None:
+            range = [None] * naxis
+        else:
+            range = [tuple(limits) for limits in range]
+            if len(range) != naxis or any(len(l) != 2 for l in range):
+                raise ValueError('range must have a (min, max) pair for each '
+                                 'column.')
+
+        if any(limits is None for limits in range):
+            range = self._bin_range(indices, range, chunk_rows)
+
+        lows = np.array([limits[0] for limits in range], dtype=np.float64)
+        highs = np.array([limits[1] for limits in range], dtype=np.float64)
+        if not (highs >= lows).all():
+            raise ValueError('The maximum of the range of each column must '
+                             'not be less than its minimum.')
+        nbins = np.maximum(np.ceil((highs - lows) / binsizes), 1).astype(int)
+
+        if weight is None:
+            hist = np.zeros(nbins.prod(), dtype=np.int64)
+        else:
+            hist = np.zeros(nbins.prod(), dtype=np.float64)
+
+        for start, stop, _, rows, _ in self._iter_raw_chunks(chunk_rows):
+            keep = np.ones(stop - start, dtype=bool)
+            flat = np.zeros(stop - start, dtype=np.intp)
+
+            # The image is stored with its first axis varying fastest
+            for idx, low, high, size, nbin in reversed(list(zip(
+                    indices, lows, highs, binsizes, nbins))):
+                values, valid = self._raw_column_values(rows, idx)
+                keep &= valid & (values >= low) & (values <= high)
+                pix = np.floor(np.where(keep, values - low, 0) / size)
+                flat = flat * nbin + np.minimum(pix.astype(np.intp), nbin - 1)
+
+            weights = None
+            if weight_index is not None:
+                weights, valid = self._raw_column_values(rows, weight_index)
+                keep &= valid
+                weights = weights[keep]
+
+            hist += np.bincount(flat[keep], weights=weights,
+                                minlength=len(hist))
+
+        if weight is None:
+            hist = hist.astype(np.int32)
+        elif weight_index is None:
+            hist *= weight
+
+        hdu = ImageHDU(data=hist.reshape(tuple(nbins[::-1])))
+        header = hdu.header
+        for axis, (idx, low, size) in enumerate(zip(indices, lows, binsizes)):
+            column = self.columns[idx]
+            axis = str(axis + 1)
+            col = str(idx + 1)
+            # Pixel p (counting from 1) along the axis covers the values
+            # from low + (p - 1) * size to low + p * size, so its center is at
+            # low + (p - 0.5) * size
+            if 'TCTYP' + col in self._header:
+                crpix = self._header.get('TCRPX' + col, 0.0)
+                header['CTYPE' + axis] = self._header['TCTYP' + col]
+                header['CRPIX' + axis] = (crpix - low) / size + 0.5
+                header['CRVAL' + axis] = self._header.get('TCRVL' + col, 0.0)
+                header['CDELT' + axis] = \
+                    self._header.get('TCDLT' + col, 1.0) * size
+                unit = self._header.get('TCUNI' + col)
+            else:
+                header['CTYPE' + axis] = column.name
+                header['CRPIX' + axis] = 1.0
+                header['CRVAL' + axis] = low + 0.5 * size
+                header['CDELT' + axis] = size
+                unit = column.unit
+            if unit:
+                header['CUNIT' + axis] = unit
+
+        return hdu
+
+    def in_region(self, filename, columns=('X', 'Y')):
+        """
+        Test which rows of the table have coordinates within the regions of a
+        region file.
+
+        The region file may be in ds9 (SAO) format or a FITS region file, and
+        is read and evaluated by CFITSIO's region filtering code, a chunk of
+        rows at a time, just as by the ``regfilter()`` function in
+        `BinTableHDU.where` expressions.  The regions are in the pixel
+        coordinates given by the values of two coordinate columns.  Region
+        files given in sky coordinates are converted to pixels with the
+        ``TCTYPn``, ``TCRVLn``, ``TCRPXn``, ``TCDLTn`` and ``TCROTn``
+        keywords of those columns.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the region file.
+
+        columns : sequence, optional
+            The names or indices of the x and y coordinate columns (by default
+            ``'X'`` and ``'Y'``).
+
+        Returns
+        -------
+        mask : array
+            A boolean array with an element for each row of the table, which
+            is `True` for the rows within the regions.  Rows with a null
+            coordinate are never within the regions.
+        """
+
+        if not COMPRESSION_SUPPORTED:
+            raise Exception('The pyfits.compression module is not available.  '
+                            'Region files cannot be evaluated.')
+
+        if isinstance(columns, string_types) or len(columns) != 2:
+            raise ValueError('columns must give the x and y coordinate '
+                             'columns.')
+
+        indices = [_get_index(self.columns.names, col) for col in columns]
+        for idx in indices:
+            self._check_numeric_column(idx)
+
+        wcs = self._region_wcs(*indices)
+        result = np.zeros(self._nrows, dtype=bool)
+        chunk_rows = max(WHERE_CHUNK_SIZE // max(self._rowsize, 1), 1)
+
+        def iter_points(chunks):
+            # Rows with null coordinates are masked out as the points of each
+            # chunk are passed on to be tested
+            for start, stop, _, rows, _ in chunks:
+                x, xvalid = self._raw_column_values(rows, indices[0])
+                y, yvalid = self._raw_column_values(rows, indices[1])
+                result[start:stop] = xvalid & yvalid
+                yield x, y
+
+        # The region file is read once, and the points tested against it one
+        # chunk at a time
+        with contextlib.closing(self._iter_raw_chunks(chunk_rows)) as chunks:
+            inside = compression.in_region(filename, iter_points(chunks), wcs)
+
+        if inside:
+            result &= np.concatenate(inside)
+
+        return result
+
+    def _region_wcs(self, xidx, yidx):
+        """
+        Returns the celestial coordinates of the given x and y columns in the
+        form used by `compression.in_region`, or `None` if they don't have
+        them.
+        """
+
+        header = self._header
+        xcol = str(xidx + 1)
+        ycol = str(yidx + 1)
+        if 'TCTYP' + xcol not in header or 'TCTYP' + ycol not in header:
+            return None
+
+        # As with CFITSIO, the projection type is that of the x column, and
+        # the rotation that of the y column
+        return (float(header.get('TCRVL' + xcol, 0.0)),
+                float(header.get('TCRVL' + ycol, 0.0)),
+                float(header.get('TCRPX' + xcol, 0.0)),
+                float(header.get('TCRPX' + ycol, 0.0)),
+                float(header.get('TCDLT' + xcol, 1.0)),
+                float(header.get('TCDLT' + ycol, 1.0)),
+                float(header.get('TCROT' + ycol, 0.0)),
+                str(header['TCTYP' + xcol][4:8]))
+
+    def _check_numeric_column(self, idx):
+        column = self.columns[idx]
+        dtype = self.columns.dtype[idx]
+        if (dtype.shape or dtype.kind not in 'iuf' or
+                column.format.format in ('L', 'X')):
+            raise ValueError(
+                'Column %r is not a numeric column with a single value in '
+                'each row.' % column.name)
+
+    def _bin_range(self, indices, range, chunk_rows):
+        """
+        Fills in the default range of each of the binned columns for which no
+        range was given.
+        """
+
+        range = list(range)
+        defaults = [axis for axis, limits in enumerate(range)
+                    if limits is None]
+        missing = []
+        for axis in defaults:
+            col = str(indices[axis] + 1)
+            if 'TLMIN' + col in self._header and 'TLMAX' + col in self._header:
+                range[axis] = (self._header['TLMIN' + col],
+                               self._header['TLMAX' + col])
+            else:
+                missing.append(axis)
+
+        if missing:
+            lows = dict((axis, np.inf) for axis in missing)
+            highs = dict((axis, -np.inf) for axis in missing)
+            for _, _, _, rows, _ in self._iter_raw_chunks(chunk_rows):
+                for axis in missing:
+                    values, valid = self._raw_column_values(
+                        rows, indices[axis])
+                    values = values[valid & ~np.isnan(values)]
+                    if len(values):
+                        lows[axis] = min(lows[axis], values.min())
+                        highs[axis] = max(highs[axis], values.max())
+
+            for axis in missing:
+                if lows[axis] > highs[axis]:
+                    # There are no values to bin
+                    lows[axis] = highs[axis] = 0.0
+                range[axis] = (lows[axis], highs[axis])
+
+        for axis in defaults:
+            column = self.columns[indices[axis]]
+            if (self.columns.dtype[indices[axis]].kind in 'iu' and
+                    column.bscale in (None, '', 1)):
+                # Integer values are the centers of pixels of width 1
+                range[axis] = (range[axis][0] - 0.5, range[axis][1] + 0.5)
+
+        return range
+
+    def _raw_column_values(self, rows, idx):
+        """
+        Returns the physical values of a numeric column, as float64, from raw
+        table rows yielded by `_iter_raw_chunks`, along with a boolean array
+        that is `False` for the rows where the column is null.
+        """
+
+        column = self.columns[idx]
+        dtype = self.columns.dtype
+        field_dtype, offset = dtype.fields[dtype.names[idx]][:2]
+        raw = rows[:, offset:offset + field_dtype.itemsize]
+        raw = np.ascontiguousarray(raw).view(field_dtype.newbyteorder('>'))
+        raw = raw.ravel()
+
+        if column.null not in (None, '') and field_dtype.kind in 'iu':
+            valid = raw != column.null
+        else:
+            valid = np.ones(len(raw), dtype=bool)
+
+        values = raw.astype(np.float64)
+        if column.bscale not in (None, '', 1):
+            values *= column.bscale
+        if column.bzero not in (None, '', 0):
+            values += column.bzero
+
+        return values, valid
+
+    @property
+    def _rowsize(self):
+        if self._data_loaded:
+            return self.data._raw_itemsize
+        return self._header['NAXIS1']
+
+    @property
+    def _has_heap(self):
+        return any(isinstance(recformat, _FormatP)
+                   for recformat in self.columns._recformats)
+
+    def _iter_raw_chunks(self, chunk_rows, first=0, last=None, heap=True):
+        """
+        Yields the raw bytes of the rows from ``first`` to ``last`` (by default
+        all rows) of the table in chunks of up to ``chunk_rows`` rows, as
+        tuples of ``(start, stop, header, rows, heap)``, where ``rows`` is a
+        ``(stop - start, rowsize)`` uint8 array of the rows from ``start`` to
+        ``stop``, ``heap`` is a uint8 array of the bytes following the rows
+        (including any gap before the heap), and ``header`` is a binary table
+        header describing them.
+
+        Unless ``heap`` is `False`, tables with variable length array columns
+        are yielded in one chunk of all their rows along with their heap.
+        Loaded tables are temporarily byteswapped to big-endian while the
+        chunks are yielded.
+        """
+
+        nrows = self._nrows
+        if last is None:
+            last = nrows
+        rowsize = self._rowsize
+        empty = np.array([], dtype=np.ubyte)
+
+        if not self._data_loaded:
+            offset = self._data_offset
+            if self._has_heap and heap:
+                raw = self._get_raw_data(self._data_size, np.ubyte, offset)
+                tbsize = nrows * rowsize
+                header = self._raw_header(nrows, rowsize,
+                                             self._data_size - tbsize,
+                                             self._theap)
+                yield (0, nrows, header, raw[:tbsize].reshape(nrows, rowsize),
+                       raw[tbsize:])
+                return
+
+            for start in range(first, last, chunk_rows):
+                stop = min(start + chunk_rows, last)
+                rows = self._get_raw_data((stop - start, rowsize), np.ubyte,
+                                          offset + start * rowsize)
+                yield (start, stop, self._raw_header(stop - start, rowsize),
+                       rows, empty)
+            return
+
+        data = self.data
+        data._scale_back(update_heap_pointers=not self._manages_own_heap)
+        with _binary_table_byte_swap(data) as swapped:
+            raw = np.ascontiguousarray(swapped.view(type=np.ndarray))
+            raw = raw.view(np.ubyte).reshape(nrows, rowsize)
+
+            if self._has_heap and heap:
+                heap = [np.zeros(data._gap, dtype=np.ubyte)]
+                if self._manages_own_heap:
+                    heap.append(data._get_heap_data())
+                else:
+                    for idx in range(data._nfields):
+                        if isinstance(data.columns._recformats[idx],
+                                      _FormatP):
+                            heap.extend(_iter_heap_chunks(
+                                data._get_heap_field(idx)))
+                heap = np.concatenate(heap)
+                header = self._raw_header(nrows, rowsize, len(heap),
+                                             nrows * rowsize + data._gap)
+                yield 0, nrows, header, raw, heap
+                return
+
+            for start in range(first, last, chunk_rows):
+                stop = min(start + chunk_rows, last)
+                yield (start, stop, self._raw_header(stop - start, rowsize),
+                       raw[start:stop], empty)
+
+    def _raw_header(self, nrows, rowsize, pcount=0, theap=None,
+                    indices=None):
+        """
+        Returns a minimal binary table header for ``nrows`` raw rows of the
+        columns of this table with the given indices (by default all of them),
+        as needed to read them as a new table, or by CFITSIO to evaluate
+        expressions over them.
+        """
+
+        if indices is None:
+            indices = list(range(len(self.columns)))
+
+        header = Header([
+            ('XTENSION', 'BINTABLE'), ('BITPIX', 8), ('NAXIS', 2),
+            ('NAXIS1', rowsize), ('NAXIS2', nrows), ('PCOUNT', pcount),
+            ('GCOUNT', 1), ('TFIELDS', len(indices))])
+
+        if theap is not None and theap != nrows * rowsize:
+            header['THEAP'] = theap
+
+        for new_idx, idx in enumerate(indices):
+            column = self.columns[idx]
+            for keyword, attr in six.iteritems(KEYWORD_TO_ATTRIBUTE):
+                val = getattr(column, attr)
+                if val is not None:
+                    header[keyword + str(new_idx + 1)] = val
+
+        return header
+
     _tdump_file_format = textwrap.dedent("""
 
         - **datafile:** Each line of the data file represents one row of table
@@ -1450,6 +2234,64 @@ def new_table(input, header=None, nrows=0, fill=False, tbtype=BinTableHDU):
     return cls.from_columns(input, header=header, nrows=nrows, fill=fill)
 
 
+def _iter_heap_chunks(field, chunk_size=HEAP_CHUNK_SIZE):
+    """
+    Yields the bytes of the arrays in a variable length array column, in
+    order, as a few large uint8 arrays, so that they can be written to the
+    heap (or checksummed) without handling each row separately.
+
+    When the arrays of the column are all views of one array of values (see
+    `_VLF.from_ragged`) that array is yielded as is; otherwise the arrays are
+    concatenated into chunks of about ``chunk_size`` bytes.
+    """
+
+    values = getattr(field, 'values', None)
+    if values is not None:
+        offsets = field.offsets
+        values = np.ascontiguousarray(values[offsets[0]:offsets[-1]])
+        if values.size:
+            yield values.ravel().view(np.ubyte)
+        return
+
+    chunk = []
+    chunk_nbytes = 0
+    for row in field:
+        if not len(row):
+            continue
+
+        chunk.append(np.ascontiguousarray(row).ravel().view(np.ubyte))
+        chunk_nbytes += row.nbytes
+        if chunk_nbytes >= chunk_size:
+            yield chunk[0] if len(chunk) == 1 else np.concatenate(chunk)
+            chunk = []
+            chunk_nbytes = 0
+
+    if chunk:
+        yield chunk[0] if len(chunk) == 1 else np.concatenate(chunk)
+
+
+def _filter_file(header, rows, heap):
+    """
+    Returns a uint8 array containing a complete FITS file, with an empty
+    primary HDU followed by a binary table with the given header, raw rows and
+    heap, as evaluated by `compression.find_rows`.
+    """
+
+    primary = Header([('SIMPLE', True), ('BITPIX', 8), ('NAXIS', 0),
+                      ('EXTEND', True)]).tostring().encode('ascii')
+    header = header.tostring().encode('ascii')
+
+    nbytes = rows.size + heap.size
+    size = len(primary) + len(header) + nbytes + _pad_length(nbytes)
+    buf = np.zeros(size, dtype=np.ubyte)
+    offset = len(primary) + len(header)
+    buf[:offset] = np.frombuffer(primary + header, dtype=np.ubyte)
+    buf[offset:offset + rows.size] = rows.ravel()
+    offset += rows.size
+    buf[offset:offset + heap.size] = heap
+    return buf
+
+
 @contextlib.contextmanager
 def _binary_table_byte_swap(data):
     """
@@ -1496,7 +2338,17 @@ def _binary_table_byte_swap(data):
         # deal with var length table
         recformat = data.columns._recformats[idx]
         if isinstance(recformat, _FormatP):
-            coldata = data.field(idx)
+            coldata = data._get_heap_field(idx)
+            values = getattr(coldata, 'values', None)
+            if (values is not None and
+                    not isinstance(values, chararray.chararray)):
+                # The arrays of all the rows are views of one array of
+                # values, which can be swapped all at once
+                if (values.itemsize > 1 and
+                        values.dtype.base.str[0] in swap_types):
+                    to_swap.append(values)
+                continue
+
             for c in coldata:
                 if (not isinstance(c, chararray.chararray) and
                         c.itemsize > 1 and c.dtype.str[0] in swap_types):
@@ -1507,9 +2359,10 @@ def _binary_table_byte_swap(data):
 
     data.dtype = np.dtype(list(zip(names, formats)))
 
-    yield data
-
-    for arr in to_swap:
-        arr.byteswap(True)
+    try:
+        yield data
+    finally:
+        for arr in to_swap:
+            arr.byteswap(True)
 
-    data.dtype = orig_dtype
+        data.dtype = orig_dtype
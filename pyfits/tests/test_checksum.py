@@ -4,9 +4,13 @@ import contextlib
 import sys
 import warnings
 
+import nose
 import numpy as np
 
+from nose.tools import assert_raises
+
 import pyfits as fits
+from ..extern.six import BytesIO
 from ..hdu.base import _ValidHDU
 from . import PyfitsTestCase
 from .test_table import comparerecords
@@ -434,3 +438,151 @@ class TestChecksumFunctions(PyfitsTestCase):
             assert header2['FOO'] == 'BAR'
             assert (data2['TIME'][1:] == data['TIME'][1:]).all()
             assert data2['TIME'][0] == 42
+
+    def test_compute_checksum(self):
+        """
+        Tests the ones-complement sum on buffers that are not a multiple of
+        the block size or of 4 bytes, with end-around carries.
+        """
+
+        hdu = fits.PrimaryHDU()
+
+        # All 0xFF bytes sum to negative zero
+        data = np.zeros(8, dtype=np.uint8) + 0xFF
+        assert hdu._compute_checksum(data) == 0xFFFFFFFF
+        assert hdu._compute_checksum(np.zeros(8, dtype=np.uint8)) == 0
+
+        # Trailing bytes are summed as a zero padded word
+        data = np.array([0, 0, 0, 1, 2, 3, 4], dtype=np.uint8)
+        assert hdu._compute_checksum(data) == 0x02030401
+        assert hdu._compute_checksum(data, 0xFFFFFFFF) == 0x02030401
+        assert hdu._compute_checksum(data, 0xFDFCFBFF) == 1
+
+        data = np.arange(2880 * 3 + 5, dtype=np.uint32).view(np.uint8)
+        standard = hdu._compute_checksum(data, 123, blocking='standard')
+        assert standard == hdu._compute_checksum(data, 123,
+                                                 blocking='nonstandard')
+        words = data[:len(data) // 4 * 4].view('>u4').astype(np.int64)
+        assert standard == (int(words.sum()) + 123 - 1) % 0xFFFFFFFF + 1
+
+    def test_checksum_while_writing(self):
+        """
+        Tests that the checksums computed while the data is written match
+        those computed from the data in memory, including when writing to
+        outputs that the header can't be rewritten to, and for variable
+        length arrays whose rows aren't aligned to 4 bytes.
+        """
+
+        c1 = fits.Column(name='var', format='PB()',
+                         array=np.array([[1, 2, 3], [4, 5], [6]], 'O'))
+        c2 = fits.Column(name='abc', format='3A', array=['a', 'bc', 'def'])
+        hdul = fits.HDUList([
+            fits.PrimaryHDU(np.arange(1001, dtype=np.int16)),
+            fits.BinTableHDU.from_columns([c1, c2]),
+            fits.ImageHDU(np.linspace(0, 1, 77).astype(np.float32))])
+
+        hdul.writeto(self.temp('tmp.fits'), checksum=True)
+        hdul.writeto(self.temp('tmp.fits.gz'), checksum=True)
+        buf = BytesIO()
+        hdul.writeto(buf, checksum=True)
+        buf.seek(0)
+
+        for filename in (self.temp('tmp.fits'), self.temp('tmp.fits.gz'),
+                         buf):
+            with fits.open(filename, checksum=True) as hdul2:
+                for hdu, hdu2 in zip(hdul, hdul2):
+                    assert hdu2._checksum == hdu.header['CHECKSUM']
+                    assert hdu2._datasum == hdu.header['DATASUM']
+                    assert hdu2.verify_checksum() == 1
+                    assert hdu2.verify_datasum() == 1
+                    # Compare against the datasum from the data in memory
+                    assert hdu2._datasum == str(hdu._calculate_datasum(
+                        'standard'))
+
+    def test_update_data_incremental_checksum(self):
+        """
+        Tests that the checksums of data modified with update_data in update
+        mode are updated from just the modified blocks.
+        """
+
+        c1 = fits.Column(name='a', format='J', array=np.arange(1000))
+        c2 = fits.Column(name='b', format='D', array=np.arange(1000) / 3.0)
+        hdul = fits.HDUList([
+            fits.PrimaryHDU(np.arange(300 * 301, dtype=np.int16).reshape(
+                300, 301)),
+            fits.ImageHDU(np.arange(77, dtype=np.uint8)),
+            fits.BinTableHDU.from_columns([c1, c2])])
+        hdul.writeto(self.temp('tmp.fits'), checksum=True)
+
+        with fits.open(self.temp('tmp.fits'), mode='update',
+                       checksum=True) as hdul:
+            hdul[0].update_data((slice(10, 20), slice(5, 9)), 7)
+            hdul[0].update_data((slice(None, None, 97), 3), 99)
+            hdul[0].update_data(hdul[0].data == 5, -1)
+            hdul[1].update_data(slice(70, None), 0)
+            hdul[2].update_data(slice(10, 12), [(1, 2.5), (3, 4.5)])
+            hdul[2].update_data('a', 0)
+            assert len(hdul[0]._modified_blocks) < 10
+            hdul.flush()
+
+            # The data was checksummed incrementally, so the new datasum is
+            # known for further updates
+            for hdu in hdul:
+                assert not len(hdu._modified_blocks)
+                assert hdu._datasum_base == int(hdu.header['DATASUM'])
+
+        with fits.open(self.temp('tmp.fits'), checksum=True) as hdul:
+            assert hdul[0].data[15, 6] == 7
+            assert hdul[0].data[97, 3] == 99
+            assert (hdul[1].data[70:] == 0).all()
+            assert hdul[2].data['b'][11] == 4.5
+            for hdu in hdul:
+                assert hdu.verify_datasum() == 1
+                assert hdu.verify_checksum() == 1
+
+    def test_background_checksum(self):
+        """
+        Tests verifying checksums in the background when opening a file with
+        background_checksum=True.
+        """
+
+        if fits.hdu.hdulist.ThreadPoolExecutor is None:
+            raise nose.SkipTest('concurrent.futures not available')
+
+        c1 = fits.Column(name='a', format='J', array=np.arange(1000))
+        hdul = fits.HDUList([
+            fits.PrimaryHDU(np.arange(5000, dtype=np.int32)),
+            fits.BinTableHDU.from_columns([c1]), fits.ImageHDU()])
+        hdul.writeto(self.temp('tmp.fits'), checksum=True)
+
+        with fits.open(self.temp('tmp.fits'), checksum=True,
+                       background_checksum=True) as hdul:
+            for hdu in hdul:
+                assert hdu.checksum_future.result() == (1, 1)
+                assert hdu._checksum == hdu.header['CHECKSUM']
+                assert hdu._datasum == hdu.header['DATASUM']
+            data_offset = hdul[0]._data_offset
+
+        # Corrupt the data of the primary HDU
+        with open(self.temp('tmp.fits'), 'r+b') as f:
+            f.seek(data_offset + 100)
+            f.write(b'\x01\x02')
+
+        with fits.open(self.temp('tmp.fits'), checksum=True,
+                       background_checksum='wait') as hdul:
+            # The header can be used regardless, but reading the data waits
+            # for verification, which fails (the verification warnings are
+            # turned into exceptions by the test setup)
+            assert hdul[0].header['NAXIS1'] == 5000
+            assert_raises(UserWarning, lambda: hdul[0].data)
+            assert hdul[1].checksum_future.result() == (1, 1)
+            assert (hdul[1].data['a'] == np.arange(1000)).all()
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            with fits.open(self.temp('tmp.fits'), checksum=True,
+                           background_checksum=True) as hdul:
+                assert hdul[0].checksum_future.result() == (0, 0)
+            messages = [str(x.message) for x in w]
+            assert any('Checksum verification failed' in m for m in messages)
+            assert any('Datasum verification failed' in m for m in messages)
@@ -784,3 +784,142 @@ class TestHDUListFunctions(PyfitsTestCase):
         assert ('a', 2) not in hdulist
         assert ('b', 1) not in hdulist
         assert ('b', 2) not in hdulist
+
+    def test_lazy_load_hdus(self):
+        """
+        Tests that with ``lazy_load_hdus=True`` HDUs are only read from the
+        file as they are needed.
+        """
+
+        hdul = fits.HDUList([fits.PrimaryHDU()])
+        for idx in range(5):
+            hdul.append(fits.ImageHDU(np.arange(10) + idx,
+                                      name='SCI%d' % idx))
+        hdul.writeto(self.temp('test.fits'))
+
+        nloaded = lambda h: list.__len__(h)
+
+        with fits.open(self.temp('test.fits'), lazy_load_hdus=True) as hdul:
+            assert nloaded(hdul) == 1
+
+            assert hdul[2].name == 'SCI1'
+            assert nloaded(hdul) == 3
+
+            assert np.all(hdul['SCI2'].data == np.arange(10) + 2)
+            assert nloaded(hdul) == 4
+
+            # Already loaded HDUs should not require reading further
+            assert 'SCI0' in hdul
+            assert nloaded(hdul) == 4
+
+            assert len(hdul) == 6
+            assert nloaded(hdul) == 6
+            assert [hdu.name for hdu in hdul[1:]] == \
+                ['SCI%d' % idx for idx in range(5)]
+
+        with fits.open(self.temp('test.fits'), lazy_load_hdus=True) as hdul:
+            assert hdul[-1].name == 'SCI4'
+            assert nloaded(hdul) == 6
+
+        with fits.open(self.temp('test.fits'), lazy_load_hdus=True) as hdul:
+            assert len(hdul[:3]) == 3
+            assert nloaded(hdul) == 3
+            assert [hdu.name for hdu in hdul] == \
+                ['PRIMARY'] + ['SCI%d' % idx for idx in range(5)]
+            assert_raises(IndexError, lambda: hdul[6])
+            assert_raises(KeyError, lambda: hdul['SCI5'])
+
+    def test_lazy_load_hdus_update(self):
+        """
+        Tests that a lazily loaded file can be updated, and that HDUs are not
+        read after the file is closed.
+        """
+
+        hdul = fits.HDUList([fits.PrimaryHDU()])
+        for idx in range(3):
+            hdul.append(fits.ImageHDU(np.arange(10), name='SCI%d' % idx))
+        hdul.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits'), mode='update',
+                       lazy_load_hdus=True) as hdul:
+            hdul['SCI1'].header['TEST'] = 'TEST'
+            hdul[1].data[:] = 1
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            assert len(hdul) == 4
+            assert hdul[2].header['TEST'] == 'TEST'
+            assert np.all(hdul[1].data == 1)
+
+        hdul = fits.open(self.temp('test.fits'), lazy_load_hdus=True)
+        hdul.close()
+        assert list.__len__(hdul) == 1
+        assert_raises(IndexError, lambda: hdul[1])
+
+    def test_convenience_duplicate_extname(self):
+        """
+        Tests that the convenience functions, which read lazily when the
+        extension is given by index, still find all the extensions with a
+        given name.
+        """
+
+        hdul = fits.HDUList([fits.PrimaryHDU(),
+                             fits.ImageHDU(np.arange(10), name='SCI'),
+                             fits.ImageHDU(np.arange(5), name='SCI')])
+        hdul.writeto(self.temp('test.fits'))
+
+        assert_raises(KeyError, fits.getdata, self.temp('test.fits'), 'SCI')
+        assert_raises(KeyError, fits.getheader, self.temp('test.fits'),
+                      extname='SCI')
+        assert (fits.getdata(self.temp('test.fits'), 2) == np.arange(5)).all()
+
+    def test_hdu_index(self):
+        """
+        Tests writing an HDU index for a file, and using it to read HDUs
+        directly.
+        """
+
+        hdul = fits.HDUList([fits.PrimaryHDU()])
+        for idx in range(5):
+            hdu = fits.ImageHDU(np.arange(10) + idx, name='SCI')
+            hdu.ver = idx + 1
+            hdul.append(hdu)
+        hdul.append(fits.BinTableHDU.from_columns(
+            [fits.Column(name='a', format='J', array=np.arange(3))],
+            name='TAB'))
+        hdul.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            hdul.write_index()
+
+        assert os.path.exists(self.temp('test.fits.hduindex'))
+
+        nloaded = lambda h: len([hdu for hdu in list.__iter__(h)
+                                 if isinstance(hdu, fits.hdu.base._BaseHDU)])
+
+        with fits.open(self.temp('test.fits'), use_index=True) as hdul:
+            assert nloaded(hdul) == 0
+            assert len(hdul) == 7
+            assert hdul.index_of(('SCI', 3)) == 3
+            assert nloaded(hdul) == 0
+
+            assert np.all(hdul['SCI', 4].data == np.arange(10) + 3)
+            assert hdul['TAB'].data['a'].tolist() == [0, 1, 2]
+            assert nloaded(hdul) == 2
+            assert hdul[4]._header_offset == hdul.fileinfo(4)['hdrLoc']
+
+            assert [hdu.ver for hdu in hdul[1:6]] == [1, 2, 3, 4, 5]
+            assert nloaded(hdul) == 7
+
+        assert fits.getheader(self.temp('test.fits'), 'SCI', 2,
+                              use_index=True)['EXTVER'] == 2
+
+        # Modifying the file makes the index out of date
+        with fits.open(self.temp('test.fits'), mode='append') as hdul:
+            hdul.append(fits.ImageHDU(name='NEW'))
+
+        with catch_warnings(record=True) as w:
+            with fits.open(self.temp('test.fits'), use_index=True) as hdul:
+                assert nloaded(hdul) == len(hdul) == 8
+                assert hdul[-1].name == 'NEW'
+            assert len(w) == 1
+            assert 'out of date' in str(w[0].message)
@@ -2,6 +2,7 @@
 
 import math
 import os
+import threading
 import time
 import warnings
 
@@ -9,6 +10,7 @@ import numpy as np
 
 import pyfits as fits
 from ..util import PyfitsPendingDeprecationWarning
+from ..column import _FormatP
 from ..hdu.compressed import SUBTRACTIVE_DITHER_1, DITHER_SEED_CHECKSUM
 from . import PyfitsTestCase
 from .test_table import comparerecords
@@ -568,6 +570,232 @@ class TestImageFunctions(PyfitsTestCase):
         assert (d.section[0:2, 0:2] == dat[0:2, 0:2]).all()
         assert not d._data_loaded
 
+    def test_section_data_strided(self):
+        """
+        Tests non-contiguous sections, read both with and without memmap, and
+        with and without scaling.
+        """
+
+        a = np.arange(7 * 11 * 13, dtype=np.int16).reshape((7, 11, 13))
+        hdu = fits.PrimaryHDU(a)
+        hdu.writeto(self.temp('test.fits'))
+        hdu.header['BSCALE'] = 2.0
+        hdu.header['BZERO'] = 1.0
+        hdu.writeto(self.temp('scaled.fits'))
+
+        for filename in ('test.fits', 'scaled.fits'):
+            for memmap in (None, False):
+                with fits.open(self.temp(filename), memmap=memmap) as hdul:
+                    dat = hdul[0].data.copy()
+
+                with fits.open(self.temp(filename), memmap=memmap) as hdul:
+                    d = hdul[0]
+                    sec = d.section[:, 3, 4]
+                    assert sec.dtype == dat.dtype
+                    assert (sec == dat[:, 3, 4]).all()
+                    assert (d.section[:, 2:5, 4] == dat[:, 2:5, 4]).all()
+                    assert (d.section[1:6:2, :, ::3] ==
+                            dat[1:6:2, :, ::3]).all()
+                    assert (d.section[::-1, :, 6] == dat[::-1, :, 6]).all()
+                    assert (d.section[1, :, 1:12] == dat[1, :, 1:12]).all()
+                    assert (d.section[[0, 3, 2], 5, 2:9] ==
+                            dat[[0, 3, 2], 5, 2:9]).all()
+                    # Arrays index each axis independently
+                    assert (d.section[2, [1, 1, 4], [0, 12]] ==
+                            dat[2][[1, 1, 4]][:, [0, 12]]).all()
+                    mask = np.arange(11) % 2 == 0
+                    assert (d.section[:, mask, 3:4] == dat[:, mask, 3:4]).all()
+                    assert d.section[2:2, 3, 4].shape == (0,)
+                    assert not d._data_loaded
+
+    def test_iter_chunks(self):
+        """
+        Tests reading an image in blocks along each axis, with and without
+        memmap, scaling, and reusing an output buffer.
+        """
+
+        a = np.arange(7 * 11 * 13, dtype=np.int16).reshape((7, 11, 13))
+        hdu = fits.PrimaryHDU(a)
+        hdu.writeto(self.temp('test.fits'))
+        hdu.header['BSCALE'] = 2.0
+        hdu.header['BZERO'] = 1.0
+        hdu.writeto(self.temp('scaled.fits'))
+
+        for filename in ('test.fits', 'scaled.fits'):
+            for memmap in (None, False):
+                with fits.open(self.temp(filename), memmap=memmap) as hdul:
+                    dat = hdul[0].data.copy()
+
+                with fits.open(self.temp(filename), memmap=memmap) as hdul:
+                    d = hdul[0]
+                    blocks = list(d.iter_chunks(size=3))
+                    assert [b.shape[0] for b in blocks] == [3, 3, 1]
+                    assert all(b.dtype == dat.dtype for b in blocks)
+                    assert (np.concatenate(blocks) == dat).all()
+
+                    blocks = [b.copy() for b in d.iter_chunks(axis=-1, size=5)]
+                    assert [b.shape for b in blocks] == [(7, 11, 5),
+                                                         (7, 11, 5),
+                                                         (7, 11, 3)]
+                    assert (np.concatenate(blocks, axis=2) == dat).all()
+
+                    out = np.empty((7, 4, 13), dtype=np.float32)
+                    blocks = []
+                    for block in d.iter_chunks(axis=1, out=out):
+                        assert np.may_share_memory(block, out)
+                        blocks.append(block.copy())
+                    assert [b.shape[1] for b in blocks] == [4, 4, 3]
+                    assert (np.concatenate(blocks, axis=1) == dat).all()
+                    assert not d._data_loaded
+
+                    # Once loaded the blocks are views of the data
+                    d.data
+                    block = next(d.iter_chunks(size=2))
+                    assert np.may_share_memory(block, d.data)
+                    assert (block == dat[:2]).all()
+
+        try:
+            orig_chunk_size = fits.hdu.image._ITER_CHUNK_SIZE
+            fits.hdu.image._ITER_CHUNK_SIZE = 4 * 11 * 13 * 2
+            with fits.open(self.temp('scaled.fits')) as hdul:
+                # The scaled data is float32
+                blocks = list(hdul[0].iter_chunks())
+                assert [b.shape[0] for b in blocks] == [2, 2, 2, 1]
+        finally:
+            fits.hdu.image._ITER_CHUNK_SIZE = orig_chunk_size
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            d = hdul[0]
+            assert_raises(ValueError, list, d.iter_chunks(axis=3))
+            assert_raises(ValueError, list, d.iter_chunks(size=0))
+            assert_raises(ValueError, list,
+                          d.iter_chunks(size=2, out=np.empty((3, 11, 13))))
+
+    def test_iter_chunks_uint_blanks(self):
+        """
+        Tests reading blocks of pseudo-unsigned and BLANK images into output
+        buffers of other dtypes.
+        """
+
+        a = np.array([[0, 1], [65535, 32768], [40000, 7]], dtype=np.uint16)
+        fits.PrimaryHDU(a).writeto(self.temp('uint.fits'))
+        with fits.open(self.temp('uint.fits'), uint=True) as hdul:
+            d = hdul[0]
+            for dtype in (np.uint16, np.int64, np.float64):
+                out = np.empty((2, 2), dtype=dtype)
+                blocks = [b.copy() for b in d.iter_chunks(out=out)]
+                assert (np.concatenate(blocks) == a).all()
+            assert not d._data_loaded
+            assert (np.concatenate(list(d.iter_chunks(size=2))) == a).all()
+            assert d.data.dtype == np.uint16
+
+        a = np.array([[1, -1], [3, 4], [-1, 6]], dtype=np.int32)
+        hdu = fits.PrimaryHDU(a)
+        hdu.header['BLANK'] = -1
+        hdu.header['BZERO'] = 10
+        hdu.writeto(self.temp('blank.fits'))
+        with fits.open(self.temp('blank.fits')) as hdul:
+            d = hdul[0]
+            for out in (None, np.empty((1, 2), dtype=np.float32)):
+                blocks = [b.copy() for b in d.iter_chunks(size=1, out=out)]
+                result = np.concatenate(blocks)
+                assert np.isnan(result[a == -1]).all()
+                assert (result[a != -1] == a[a != -1] + 10).all()
+
+    def test_read_out_dtype(self):
+        """
+        Tests reading images and sections into existing arrays, and scaling
+        them to a given dtype.
+        """
+
+        a = np.arange(5 * 6, dtype=np.int32).reshape((5, 6)) - 10
+        hdu = fits.PrimaryHDU(a)
+        hdu.writeto(self.temp('test.fits'))
+        hdu.header['BSCALE'] = 0.5
+        hdu.header['BZERO'] = 3.0
+        hdu.writeto(self.temp('scaled.fits'))
+
+        for filename in ('test.fits', 'scaled.fits'):
+            for memmap in (None, False):
+                with fits.open(self.temp(filename), memmap=memmap) as hdul:
+                    dat = hdul[0].data.copy()
+                if filename == 'scaled.fits':
+                    assert dat.dtype == np.float64
+
+                with fits.open(self.temp(filename), memmap=memmap) as hdul:
+                    d = hdul[0]
+                    out = np.empty((5, 6), dtype=np.float32)
+                    assert d.read(out=out) is out
+                    assert (out == dat).all()
+                    data = d.read(dtype=np.float32)
+                    assert data.dtype == np.float32
+                    assert (data == dat).all()
+                    assert d.read().dtype == dat.dtype
+
+                    row = np.empty(6, dtype=np.float32)
+                    assert d.section.read(2, out=row) is row
+                    assert (row == dat[2]).all()
+                    col = np.empty(3)
+                    d.section.read((slice(1, 4), 3), out=col)
+                    assert (col == dat[1:4, 3]).all()
+                    data = d.section.read((slice(None), slice(1, None, 2)),
+                                          dtype=np.float32)
+                    assert data.dtype == np.float32
+                    assert (data == dat[:, 1::2]).all()
+                    assert not d._data_loaded
+
+                    # Loaded data is copied
+                    d.data
+                    out[...] = 0
+                    assert d.read(out=out) is out
+                    assert (out == dat).all()
+                    assert d.read() is d.data
+
+                    out = np.empty((5, 6), dtype=np.float32)
+                    data = fits.getdata(self.temp(filename), out=out)
+                    assert data is out
+                    assert (out == dat).all()
+                    data = fits.getdata(self.temp(filename), dtype='float32')
+                    assert data.dtype == np.float32
+                    assert (data == dat).all()
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            d = hdul[0]
+            assert_raises(ValueError, d.read, out=np.empty((6, 5)))
+            assert_raises(ValueError, d.read, out=np.empty((5, 6)),
+                          dtype=np.float32)
+            assert_raises(ValueError, d.section.read, 1,
+                          out=np.empty(5))
+
+        # Integer arrays can only hold data scaled by an integer BZERO
+        with fits.open(self.temp('scaled.fits')) as hdul:
+            d = hdul[0]
+            assert_raises(ValueError, d.read, dtype=np.int32)
+            assert_raises(ValueError, d.section.read, 1,
+                          out=np.empty(6, dtype=np.int64))
+
+        hdu = fits.PrimaryHDU(a)
+        hdu.header['BZERO'] = 100
+        hdu.writeto(self.temp('offset.fits'))
+        hdu.header['BLANK'] = -10
+        hdu.writeto(self.temp('blank.fits'))
+
+        with fits.open(self.temp('offset.fits')) as hdul:
+            data = hdul[0].read(dtype=np.int64)
+            assert data.dtype == np.int64
+            assert (data == a + 100).all()
+        with fits.open(self.temp('blank.fits')) as hdul:
+            assert_raises(ValueError, hdul[0].read, dtype=np.int64)
+            data = hdul[0].read(dtype=np.float32)
+            assert np.isnan(data[0, 0])
+            assert (data.flat[1:] == a.flat[1:] + 100).all()
+
+        fits.BinTableHDU.from_columns(
+            [fits.Column(name='a', format='J', array=np.arange(3))]
+        ).writeto(self.temp('table.fits'))
+        assert_raises(TypeError, fits.getdata, self.temp('table.fits'),
+                      dtype='float32')
+
     def test_do_not_scale_image_data(self):
         hdul = fits.open(self.data('scale.fits'), do_not_scale_image_data=True)
         assert hdul[0].data.dtype == np.dtype('>i2')
@@ -1497,3 +1725,332 @@ class TestCompressedImage(PyfitsTestCase):
             # There's no good reason to have a duplicate keyword, but
             # technically it isn't invalid either :/
             assert hdul[1]._header.count('ZTENSION') == 2
+
+    def test_comp_image_section(self):
+        """
+        Tests that sections of a compressed image decompress only the tiles
+        they overlap, and match the corresponding slices of the full data.
+        """
+
+        data = np.arange(100 * 120, dtype=np.int32).reshape((100, 120))
+        chdu = fits.CompImageHDU(data=data, tile_size=(16, 16))
+        chdu.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            section = hdul[1].section
+            assert (section[20:30, 40:50] == data[20:30, 40:50]).all()
+            # Only the tiles overlapping the section were decompressed
+            assert len(section._tile_cache) == 2
+            assert not hdul[1]._data_loaded
+
+            assert section[5, 7] == data[5, 7]
+            for key in [(slice(None, None, 7), slice(3, None, 13)),
+                        (Ellipsis, -1), ([1, 50, 3], slice(2, 9)),
+                        (slice(10, 10),), (slice(None, None, -3),)]:
+                section_data = section[key]
+                assert section_data.shape == data[key].shape
+                assert (section_data == data[key]).all()
+
+            # The cache never holds more than cache_size bytes of tiles
+            section.clear_cache()
+            section.cache_size = 3 * 16 * 16 * 4
+            assert (section[:, :] == data).all()
+            assert section._tile_cache_nbytes <= section.cache_size
+
+            assert not hdul[1]._data_loaded
+
+    def test_comp_image_section_scaled(self):
+        """
+        Tests that sections of a compressed image with BSCALE/BZERO are scaled
+        the same way as the full data.
+        """
+
+        with fits.open(self.data('scale.fits'),
+                       do_not_scale_image_data=True) as hdul:
+            chdu = fits.CompImageHDU(data=hdul[0].data,
+                                     header=hdul[0].header)
+            chdu.writeto(self.temp('scale.fits'))
+
+        with fits.open(self.temp('scale.fits')) as hdul:
+            data = hdul[1].data.copy()
+
+        with fits.open(self.temp('scale.fits')) as hdul:
+            section_data = hdul[1].section[1:, ::2]
+            assert section_data.dtype == data.dtype
+            assert (section_data == data[1:, ::2]).all()
+
+    def test_comp_image_section_read_out(self):
+        """
+        Tests reading sections of a compressed image into existing arrays and
+        with a given dtype.
+        """
+
+        data = np.arange(40 * 50, dtype=np.int32).reshape((40, 50))
+        chdu = fits.CompImageHDU(data=data, tile_size=(16, 16))
+        chdu.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            section = hdul[1].section
+            out = np.empty((10, 20), dtype=np.float32)
+            assert section.read((slice(5, 15), slice(10, 30)), out=out) is out
+            assert (out == data[5:15, 10:30]).all()
+            sec = section.read((3, slice(None)), dtype=np.float64)
+            assert sec.dtype == np.float64
+            assert (sec == data[3]).all()
+            assert not hdul[1]._data_loaded
+
+        out = np.empty((40, 50), dtype=np.int64)
+        assert fits.getdata(self.temp('test.fits'), out=out) is out
+        assert (out == data).all()
+
+    def test_comp_image_threads(self):
+        """
+        Tests that compressing an image with several threads gives exactly the
+        same file as compressing it with a single thread.
+        """
+
+        np.random.seed(42)
+        int_data = np.random.randint(0, 5000, size=(300, 257)).astype(np.int32)
+        float_data = np.random.normal(size=(301, 200)).astype(np.float32)
+        cube_data = np.random.randint(0, 5000, size=(7, 40, 30)).astype(np.int16)
+
+        for data, kwargs in [(int_data, {'tile_size': (16, 16)}),
+                             (int_data, {'compression_type': 'GZIP_1'}),
+                             (float_data, {'tile_size': (32, 50),
+                                           'dither_seed': 42}),
+                             (cube_data, {'tile_size': (10, 8, 2)})]:
+            fits.CompImageHDU(data, **kwargs).writeto(self.temp('serial.fits'),
+                                                      clobber=True)
+            for threads in (2, 3, 100):
+                hdu = fits.CompImageHDU(data, threads=threads, **kwargs)
+                hdu.writeto(self.temp('threads.fits'), clobber=True)
+                with open(self.temp('serial.fits'), 'rb') as serial:
+                    with open(self.temp('threads.fits'), 'rb') as threaded:
+                        assert serial.read() == threaded.read()
+
+    def test_comp_image_threads_decompress(self):
+        """
+        Tests that decompressing an image with several threads gives the same
+        data as decompressing it with a single thread.
+        """
+
+        np.random.seed(42)
+        int_data = np.random.randint(0, 5000, size=(300, 257)).astype(np.int32)
+        float_data = np.random.normal(size=(301, 200)).astype(np.float32)
+
+        for data, kwargs in [(int_data, {'tile_size': (16, 16)}),
+                             (float_data, {'tile_size': (32, 50),
+                                           'dither_seed': 42})]:
+            fits.CompImageHDU(data, **kwargs).writeto(self.temp('test.fits'),
+                                                      clobber=True)
+            with fits.open(self.temp('test.fits')) as hdul:
+                serial_data = hdul[1].data
+
+                for threads in (2, 3, 100):
+                    with fits.open(self.temp('test.fits'),
+                                   threads=threads) as hdul2:
+                        threaded_data = hdul2[1].data
+                        assert threaded_data.dtype == serial_data.dtype
+                        assert (threaded_data == serial_data).all()
+
+    def test_comp_image_concurrent_threads(self):
+        """
+        Tests that the compression module can be used to compress and
+        decompress different images, and sections of the same image, from
+        several threads at once.
+        """
+
+        np.random.seed(42)
+        images = [np.random.randint(0, 5000, size=(200, 150)).astype(np.int32)
+                  for _ in range(4)]
+        images.append(np.random.normal(size=(200, 150)).astype(np.float32))
+
+        def compress(idx, filename):
+            compression_type = 'HCOMPRESS_1' if idx == 3 else 'RICE_1'
+            hdu = fits.CompImageHDU(images[idx], tile_size=(16, 16),
+                                    dither_seed=1,
+                                    compression_type=compression_type)
+            hdu.writeto(filename)
+            with open(filename, 'rb') as f:
+                return f.read()
+
+        compressed = [compress(idx, self.temp('%d.fits' % idx))
+                      for idx in range(len(images))]
+
+        expected = []
+        for idx in range(len(images)):
+            with fits.open(self.temp('%d.fits' % idx)) as hdul:
+                expected.append((hdul[1].data, hdul[1].section[40:90, 20:70]))
+
+        results = {}
+        errors = []
+
+        def run(thread_idx):
+            idx = thread_idx % len(images)
+            try:
+                with fits.open(self.temp('%d.fits' % idx)) as hdul:
+                    section = hdul[1].section[40:90, 20:70]
+                    results[thread_idx] = (hdul[1].data.copy(), section)
+                filename = self.temp('thread%d.fits' % thread_idx)
+                assert compress(idx, filename) == compressed[idx]
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=run, args=(thread_idx,))
+                   for thread_idx in range(3 * len(images))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        for thread_idx, (data, section) in results.items():
+            idx = thread_idx % len(images)
+            assert (data == expected[idx][0]).all()
+            assert (section == expected[idx][1]).all()
+
+    def test_comp_image_streaming(self):
+        """
+        Tests that streaming an image to a CompImageStreamingHDU in chunks of
+        rows that do not line up with the tiles gives the same file as
+        writing a CompImageHDU of the whole image.
+        """
+
+        np.random.seed(42)
+        int_data = np.random.randint(0, 5000, size=(53, 37)).astype('>i2')
+        float_data = np.random.normal(size=(4, 53, 37)).astype(np.float32)
+
+        for data, kwargs in [
+                (int_data, {'tile_size': (37, 5)}),
+                (int_data, {'tile_size': (10, 5),
+                            'compression_type': 'GZIP_1'}),
+                (float_data, {'tile_size': (37, 10, 1),
+                              'quantize_method': SUBTRACTIVE_DITHER_1,
+                              'dither_seed': DITHER_SEED_CHECKSUM})]:
+            header = fits.ImageHDU(data).header
+            fits.CompImageHDU(data, header, **kwargs).writeto(
+                self.temp('expected.fits'), clobber=True)
+
+            if os.path.exists(self.temp('stream.fits')):
+                os.remove(self.temp('stream.fits'))
+            shdu = fits.CompImageStreamingHDU(self.temp('stream.fits'),
+                                              header, **kwargs)
+            with shdu:
+                # A single row, partial rows of tiles, and the last row
+                assert not shdu.write(data[0])
+                assert not shdu.write(data[1:3])
+                assert not shdu.write(data[3:-1])
+                assert shdu.write(data[-1:])
+                assert_raises(IOError, shdu.write, data[:1])
+
+            with open(self.temp('expected.fits'), 'rb') as f1:
+                with open(self.temp('stream.fits'), 'rb') as f2:
+                    assert f1.read() == f2.read()
+
+            with fits.open(self.temp('stream.fits')) as hdul:
+                assert isinstance(hdul[1], fits.CompImageHDU)
+                if data.dtype.kind == 'i':
+                    assert (hdul[1].data == data).all()
+                else:
+                    assert np.allclose(hdul[1].data, data, atol=0.1)
+
+        # Appending to an existing file, and bad data
+        fits.writeto(self.temp('append.fits'), np.zeros(10))
+        header = fits.ImageHDU(int_data).header
+        with fits.CompImageStreamingHDU(self.temp('append.fits'),
+                                        header) as shdu:
+            assert_raises(TypeError, shdu.write, int_data.astype(np.int32))
+            assert_raises(ValueError, shdu.write, int_data[:, :10])
+            shdu.write(int_data)
+
+        with fits.open(self.temp('append.fits')) as hdul:
+            assert len(hdul) == 2
+            assert (hdul[1].data == int_data).all()
+
+    def test_comp_image_update_tiles(self):
+        """
+        Tests that updating a few pixels of a compressed image in update mode
+        with update_data recompresses only the modified tiles, writing them
+        over the existing file when they fit in the heap.
+        """
+
+        np.random.seed(42)
+        data = np.random.randint(0, 5000, size=(50, 40)).astype(np.int32)
+        fits.CompImageHDU(data, tile_size=(10, 10)).writeto(self.temp('a.fits'))
+        size = os.path.getsize(self.temp('a.fits'))
+
+        with fits.open(self.temp('a.fits'), mode='update') as hdul:
+            hdu = hdul[1]
+            assert sorted(hdu._tiles_for_key((slice(5, 15), 3))) == [0, 4]
+            mask = np.zeros(data.shape, dtype=bool)
+            mask[[0, 49], [0, 39]] = True
+            assert sorted(hdu._tiles_for_key(mask)) == [0, 19]
+
+            hdu.update_data((slice(12, 18), slice(22, 28)), 0)
+            hdu.update_data(mask, 1)
+            assert hdu._modified_tiles == set([0, 6, 19])
+
+        data[12:18, 22:28] = 0
+        data[mask] = 1
+        assert os.path.getsize(self.temp('a.fits')) == size
+        with fits.open(self.temp('a.fits')) as hdul:
+            assert (hdul[1].data == data).all()
+
+        # Tiles which grow are appended to the heap, resizing the file if
+        # they don't fit in its last block
+        zeros = np.zeros((50, 40), dtype=np.int32)
+        fits.CompImageHDU(zeros, tile_size=(10, 10)).writeto(
+            self.temp('b.fits'))
+
+        with fits.open(self.temp('b.fits'), mode='update') as hdul:
+            hdul[1].update_data((slice(20, 30), slice(10, 20)),
+                                data[20:30, 10:20])
+            hdul[1].update_data((slice(0, 10), slice(0, 40)), data[:10])
+
+        zeros[20:30, 10:20] = data[20:30, 10:20]
+        zeros[:10] = data[:10]
+        with fits.open(self.temp('b.fits')) as hdul:
+            assert (hdul[1].data == zeros).all()
+            assert hdul[1]._header['PCOUNT'] > 0
+
+    def test_comp_image_update_tiles_twice(self):
+        """
+        Tests that PCOUNT covers the whole heap after a tile grows and is
+        moved to its end, leaving unused space behind, so that the file can
+        be updated again.
+        """
+
+        def heap_extent(hdu):
+            table = hdu.compressed_data
+            ends = [0]
+            for name, format in zip(table.names, table.columns._recformats):
+                if isinstance(format, _FormatP):
+                    itemsize = np.dtype(format.dtype).itemsize
+                    ends.extend(offset + count * itemsize for count, offset
+                                in np.recarray.field(table, name) if count)
+            return max(ends)
+
+        np.random.seed(42)
+        data = np.random.randint(0, 5000, size=(50, 40)).astype(np.int32)
+        zeros = np.zeros((50, 40), dtype=np.int32)
+        fits.CompImageHDU(zeros, tile_size=(10, 10)).writeto(
+            self.temp('a.fits'))
+
+        with fits.open(self.temp('a.fits'), mode='update') as hdul:
+            hdul[1].update_data((slice(0, 10), slice(0, 10)), data[:10, :10])
+        zeros[:10, :10] = data[:10, :10]
+
+        with fits.open(self.temp('a.fits')) as hdul:
+            hdu = hdul[1]
+            assert hdu._header['PCOUNT'] == heap_extent(hdu)
+            assert (hdu.data == zeros).all()
+
+        with fits.open(self.temp('a.fits'), mode='update') as hdul:
+            hdul[1].update_data((slice(40, 50), slice(30, 40)),
+                                data[40:, 30:])
+        zeros[40:, 30:] = data[40:, 30:]
+
+        with fits.open(self.temp('a.fits'), checksum=True) as hdul:
+            hdu = hdul[1]
+            assert hdu._header['PCOUNT'] == heap_extent(hdu)
+            assert (hdu.data == zeros).all()
@@ -6,6 +6,7 @@ from warnings import catch_warnings
 import contextlib
 import copy
 import gc
+import gzip
 
 import numpy as np
 from numpy import char as chararray
@@ -219,6 +220,462 @@ class TestTableFunctions(PyfitsTestCase):
         tt.close()
         fd.close()
 
+    def test_bit_array_packed(self):
+        """
+        Tests reading and writing bit array (X format) columns, both
+        expanded to booleans and as their packed bytes.
+        """
+
+        bits = np.zeros((4, 19), dtype=bool)
+        bits[0, [0, 7, 8, 18]] = True
+        bits[1] = True
+        bits[3, 1::2] = True
+        c1 = fits.Column(name='flags', format='19X', array=bits)
+        c2 = fits.Column(name='j', format='J', array=np.arange(4))
+        fits.BinTableHDU.from_columns([c1, c2]).writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            data = hdul[1].data
+            assert data['flags'].dtype == bool
+            assert (data['flags'] == bits).all()
+
+            packed = data.field('flags', packed=True)
+            assert packed.dtype == np.uint8
+            assert packed.shape == (4, 3)
+            assert (packed[0] == [0x81, 0x80, 0x20]).all()
+            # The unused bits at the end of the last byte are zero
+            assert (packed[1] == [0xff, 0xff, 0xe0]).all()
+            assert (packed[2] == 0).all()
+            assert (packed[3] == [0x55, 0x55, 0x40]).all()
+            assert data.field('j', packed=True) is not None
+
+        with fits.open(self.temp('test.fits'), mode='update') as hdul:
+            data = hdul[1].data
+            # Changes to the expanded bits are kept when the packed bits are
+            # accessed, and changes to those are written
+            data['flags'][2, 2] = True
+            packed = data.field('flags', packed=True)
+            assert packed[2, 0] == 0x20
+            packed[2, 2] = 0x80
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            expected = bits.copy()
+            expected[2, [2, 16]] = True
+            assert (hdul[1].data['flags'] == expected).all()
+
+    def test_where(self):
+        """
+        Tests selecting the rows of a table with a CFITSIO row filter
+        expression, with the table loaded or not and over several chunks.
+        """
+
+        pi = np.arange(100, dtype=np.int16)
+        status = np.arange(100) % 3
+        c1 = fits.Column(name='PI', format='I', array=pi)
+        c2 = fits.Column(name='STATUS', format='J', array=status)
+        c3 = fits.Column(name='ENERGY', format='E', bscale=0.5, bzero=1.0,
+                         array=pi * 0.5 + 1.0)
+        fits.BinTableHDU.from_columns([c1, c2, c3]).writeto(
+            self.temp('test.fits'))
+
+        expected = (pi > 30) & (status == 0)
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            hdu = hdul[1]
+            mask = hdu.where('PI > 30 && STATUS == 0', mask=True)
+            assert mask.dtype == bool
+            assert (mask == expected).all()
+            assert not hdu._data_loaded
+
+            # Scaled columns are compared by their physical values
+            assert (hdu.where('ENERGY < 11', mask=True) == (pi < 20)).all()
+
+            data = hdu.where('PI > 30 && STATUS == 0')
+            assert not hdu._data_loaded
+            assert len(data) == expected.sum()
+            assert (data['PI'] == pi[expected]).all()
+            assert (data['STATUS'] == 0).all()
+            assert np.allclose(data['ENERGY'], pi[expected] * 0.5 + 1.0)
+
+            assert len(hdu.where('PI < 0')) == 0
+
+        table_module = fits.hdu.table
+        orig_chunk_size = table_module.WHERE_CHUNK_SIZE
+        table_module.WHERE_CHUNK_SIZE = 100
+        try:
+            with fits.open(self.temp('test.fits')) as hdul:
+                hdu = hdul[1]
+                data = hdu.where('PI > 30 && STATUS == 0')
+                assert (data['PI'] == pi[expected]).all()
+
+                # Loaded data is evaluated as it is, including unsaved changes
+                hdu.data['STATUS'][31] = 0
+                expected[31] = True
+                assert (hdu.where('PI > 30 && STATUS == 0', mask=True) ==
+                        expected).all()
+                data = hdu.where('PI > 30 && STATUS == 0')
+                assert (data['PI'] == pi[expected]).all()
+                # The table itself is still in its native byte order
+                assert hdu.data['STATUS'][31] == 0
+                assert (hdu.data['PI'] == pi).all()
+
+                # #ROW is the row number in the whole table
+                assert (hdu.where('#ROW <= 10', mask=True) ==
+                        (np.arange(100) < 10)).all()
+        finally:
+            table_module.WHERE_CHUNK_SIZE = orig_chunk_size
+
+    def test_where_invalid_expression(self):
+        """
+        Tests that an invalid row filter expression, or one referring to a
+        column which does not exist, raises a ValueError.
+        """
+
+        c1 = fits.Column(name='PI', format='I', array=np.arange(10))
+        hdu = fits.BinTableHDU.from_columns([c1])
+        assert_raises(ValueError, hdu.where, 'PI >')
+        assert_raises(ValueError, hdu.where, 'PI + 1')
+        assert_raises(ValueError, hdu.where, 'FOO > 1')
+
+    def test_bin(self):
+        """
+        Tests binning the rows of a table into a histogram image, compared
+        to numpy.histogramdd.
+        """
+
+        np.random.seed(0)
+        x = np.random.randint(0, 20, 1000).astype(np.int16)
+        y = np.random.randint(0, 10, 1000).astype(np.int32)
+        energy = np.random.uniform(0.5, 10.0, 1000)
+        c1 = fits.Column(name='X', format='I', array=x)
+        c2 = fits.Column(name='Y', format='J', array=y)
+        c3 = fits.Column(name='ENERGY', format='D', unit='keV', array=energy)
+        fits.BinTableHDU.from_columns([c1, c2, c3]).writeto(
+            self.temp('test.fits'))
+
+        expected, _ = np.histogramdd(np.array([y, x]).T, bins=(10, 20),
+                                     range=[(-0.5, 9.5), (-0.5, 19.5)])
+
+        table_module = fits.hdu.table
+        orig_chunk_size = table_module.BIN_CHUNK_SIZE
+        table_module.BIN_CHUNK_SIZE = 1000
+        try:
+            with fits.open(self.temp('test.fits')) as hdul:
+                hdu = hdul[1]
+                image = hdu.bin(['X', 'Y'])
+                assert not hdu._data_loaded
+                assert isinstance(image, fits.ImageHDU)
+                assert image.data.dtype == np.int32
+                assert image.data.shape == (10, 20)
+                assert (image.data == expected).all()
+                header = image.header
+                assert header['CTYPE1'] == 'X'
+                assert header['CTYPE2'] == 'Y'
+                assert header['CRPIX1'] == 1.0
+                assert header['CRVAL1'] == 0.0
+                assert header['CDELT1'] == 1.0
+
+                # Weighted by a column
+                image = hdu.bin(['X', 'Y'], weight='ENERGY')
+                weighted, _ = np.histogramdd(
+                    np.array([y, x]).T, bins=(10, 20),
+                    range=[(-0.5, 9.5), (-0.5, 19.5)], weights=energy)
+                assert image.data.dtype == np.float64
+                assert np.allclose(image.data, weighted)
+
+                # A float column, with the data loaded
+                hdu.data
+                image = hdu.bin('ENERGY', binsize=0.5, range=[(0, 10)])
+                assert image.data.shape == (20,)
+                assert (image.data == np.histogram(energy, bins=20,
+                                                   range=(0, 10))[0]).all()
+                assert image.header['CRVAL1'] == 0.25
+                assert image.header['CDELT1'] == 0.5
+                assert image.header['CUNIT1'] == 'keV'
+        finally:
+            table_module.BIN_CHUNK_SIZE = orig_chunk_size
+
+    def test_bin_wcs(self):
+        """
+        Tests the range and WCS keywords of a histogram image binned from
+        columns with TLMINn/TLMAXn and TCTYPn keywords.
+        """
+
+        x = np.array([1, 2, 2, 8, 9], dtype=np.int32)
+        hdu = fits.BinTableHDU.from_columns(
+            [fits.Column(name='X', format='J', array=x),
+             fits.Column(name='FLAG', format='L', array=[True] * 5)])
+        hdu.header['TLMIN1'] = 1
+        hdu.header['TLMAX1'] = 10
+        hdu.header['TCTYP1'] = 'RA---TAN'
+        hdu.header['TCRPX1'] = 5.5
+        hdu.header['TCRVL1'] = 180.0
+        hdu.header['TCDLT1'] = -0.001
+        hdu.header['TCUNI1'] = 'deg'
+        hdu.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            image = hdul[1].bin('X', binsize=2)
+            # The range is 0.5 to 10.5 in 5 bins
+            assert list(image.data) == [3, 0, 0, 1, 1]
+            header = image.header
+            assert header['CTYPE1'] == 'RA---TAN'
+            assert header['CRPIX1'] == 3.0
+            assert header['CRVAL1'] == 180.0
+            assert header['CDELT1'] == -0.002
+            assert header['CUNIT1'] == 'deg'
+
+            assert_raises(ValueError, hdul[1].bin, 'FLAG')
+            assert_raises(ValueError, hdul[1].bin, 'X', binsize=0)
+
+    def test_in_region(self):
+        """
+        Tests selecting the rows of a table within the regions of a ds9
+        region file.
+        """
+
+        x, y = np.meshgrid(np.arange(20.0), np.arange(20.0))
+        x = x.ravel()
+        y = y.ravel()
+        c1 = fits.Column(name='X', format='E', array=x)
+        c2 = fits.Column(name='Y', format='E', array=y)
+        c3 = fits.Column(name='PHA', format='J', array=np.arange(400))
+        fits.BinTableHDU.from_columns([c1, c2, c3]).writeto(
+            self.temp('test.fits'))
+
+        with open(self.temp('test.reg'), 'w') as f:
+            f.write('# Region file format: DS9 version 4.1\n')
+            f.write('physical\n')
+            f.write('circle(10,10,3)\n')
+            f.write('-box(10,10,2,2,0)\n')
+
+        expected = ((x - 10) ** 2 + (y - 10) ** 2 <= 9)
+        expected &= ~((abs(x - 10) <= 1) & (abs(y - 10) <= 1))
+
+        table_module = fits.hdu.table
+        orig_chunk_size = table_module.WHERE_CHUNK_SIZE
+        table_module.WHERE_CHUNK_SIZE = 100
+        try:
+            with fits.open(self.temp('test.fits')) as hdul:
+                hdu = hdul[1]
+                mask = hdu.in_region(self.temp('test.reg'))
+                assert not hdu._data_loaded
+                assert mask.dtype == bool
+                assert mask.shape == (400,)
+                assert (mask == expected).all()
+
+                mask = hdu.in_region(self.temp('test.reg'),
+                                     columns=('Y', 'X'))
+                assert (mask == expected).all()
+
+                # Loaded data is tested over the same chunks
+                assert (hdu.data['X'] == x).all()
+                mask = hdu.in_region(self.temp('test.reg'))
+                assert (mask == expected).all()
+                assert (hdu.data['X'] == x).all()
+
+                assert_raises(ValueError, hdu.in_region,
+                              self.temp('test.reg'), columns='X')
+        finally:
+            table_module.WHERE_CHUNK_SIZE = orig_chunk_size
+
+    def test_read_columns(self):
+        """
+        Tests reading some of the rows and columns of a table, in chunks,
+        with the data loaded or not.
+        """
+
+        n = 50
+        c1 = fits.Column(name='a', format='J', array=np.arange(n))
+        c2 = fits.Column(name='b', format='10A',
+                         array=['row%d' % idx for idx in range(n)])
+        c3 = fits.Column(name='c', format='2E', dim='(2)',
+                         array=np.arange(2 * n).reshape(n, 2))
+        c4 = fits.Column(name='d', format='I', bscale=2.0, bzero=1.0,
+                         array=np.arange(n) * 2.0 + 1.0)
+        fits.BinTableHDU.from_columns([c1, c2, c3, c4]).writeto(
+            self.temp('test.fits'))
+
+        table_module = fits.hdu.table
+        orig_chunk_size = table_module.READ_CHUNK_SIZE
+        table_module.READ_CHUNK_SIZE = 100
+        try:
+            with fits.open(self.temp('test.fits')) as hdul:
+                hdu = hdul[1]
+                data = hdu.read(columns=['d', 'a'])
+                assert not hdu._data_loaded
+                assert data.columns.names == ['d', 'a']
+                assert (data['a'] == np.arange(n)).all()
+                assert (data['d'] == np.arange(n) * 2.0 + 1.0).all()
+
+                data = hdu.read(rows=slice(5, 40, 3), columns=['b', 'c'])
+                assert list(data['b']) == ['row%d' % idx
+                                           for idx in range(5, 40, 3)]
+                assert (data['c'] ==
+                        np.arange(2 * n).reshape(n, 2)[5:40:3]).all()
+
+                data = hdu.read(rows=slice(None, None, -1), columns='a')
+                assert (data['a'] == np.arange(n)[::-1]).all()
+                assert hdu.read(rows=7, columns='a')['a'][0] == 7
+                assert len(hdu.read(rows=slice(10, 10), columns='a')) == 0
+
+                # With the data loaded, including changes to it
+                hdu.data['a'][3] = 100
+                data = hdu.read(rows=slice(0, 5), columns=['a', 'b'])
+                assert list(data['a']) == [0, 1, 2, 100, 4]
+                assert list(data['b']) == ['row%d' % idx for idx in range(5)]
+        finally:
+            table_module.READ_CHUNK_SIZE = orig_chunk_size
+
+        data = fits.getdata(self.temp('test.fits'), columns=['c', 'a'])
+        assert data.columns.names == ['c', 'a']
+        assert (data['a'] == np.arange(n)).all()
+        assert_raises(TypeError, fits.getdata, self.data('test0.fits'),
+                      columns=['a'])
+
+    def test_columns_to_arrays(self):
+        """
+        Tests copying several columns out of a table at once, in small
+        blocks of rows, compared to the values from FITS_rec.field.
+        """
+
+        n = 100
+        columns = [
+            fits.Column(name='a', format='J', array=np.arange(n)),
+            fits.Column(name='b', format='2D', dim='(2)',
+                        array=np.arange(2 * n).reshape(n, 2)),
+            fits.Column(name='c', format='I', bscale=0.5, bzero=10.0,
+                        array=np.arange(n) * 0.5 + 10.0),
+            fits.Column(name='d', format='L', array=np.arange(n) % 3 == 0),
+            fits.Column(name='e', format='5A',
+                        array=['s%d' % idx for idx in range(n)]),
+            fits.Column(name='f', format='I', bzero=32768,
+                        array=np.arange(n, dtype=np.uint16) + 60000),
+            fits.Column(name='g', format='PJ()',
+                        array=[np.arange(idx % 4) for idx in range(n)]),
+            fits.Column(name='h', format='12X',
+                        array=np.arange(12 * n).reshape(n, 12) % 5 == 0)]
+        fits.BinTableHDU.from_columns(columns).writeto(self.temp('test.fits'))
+
+        fitsrec_module = fits.fitsrec
+        orig_block_size = fitsrec_module.GATHER_BLOCK_SIZE
+        fitsrec_module.GATHER_BLOCK_SIZE = 256
+        try:
+            with fits.open(self.temp('test.fits'), uint=True) as hdul:
+                data = hdul[1].data
+                arrays = data.columns_to_arrays(['f', 'c', 'a', 'b', 'd'])
+                assert not data._converted
+                assert arrays[0].dtype == np.uint16
+                assert arrays[1].dtype == np.float64
+                assert arrays[2].dtype.isnative
+                assert arrays[3].shape == (n, 2)
+                assert arrays[4].dtype == bool
+                for name, array in zip(['f', 'c', 'a', 'b', 'd'], arrays):
+                    assert (array == data.field(name)).all()
+
+                arrays = data.columns_to_arrays()
+                assert len(arrays) == 8
+                for idx, array in enumerate(arrays):
+                    if idx == 6:
+                        for row, expected in zip(array, data.field(idx)):
+                            assert (row == expected).all()
+                    else:
+                        assert (array == data.field(idx)).all()
+
+                # Changes to the converted values are included, and the
+                # arrays don't share memory with the table
+                data['c'][0] = 1.5
+                arrays = data.columns_to_arrays(['c', 'a'])
+                assert arrays[0][0] == 1.5
+                arrays[1][0] = 1000
+                assert data['a'][0] == 0
+
+                # Slices of a table
+                arrays = data[10:60:5].columns_to_arrays(['a', 'c'])
+                assert (arrays[0] == np.arange(10, 60, 5)).all()
+                assert (arrays[1] == data['c'][10:60:5]).all()
+        finally:
+            fitsrec_module.GATHER_BLOCK_SIZE = orig_block_size
+
+    def test_scaled_int_column_round_trip(self):
+        """
+        Tests that the physical values of a scaled integer column, including
+        negative values and with a non-integer TZEROn, are rounded to the
+        nearest storage value when the table is written.
+        """
+
+        c1 = fits.Column(name='A', format='I', bscale=2.0, bzero=0.5,
+                         array=np.array([7, -7, 5, 3]))
+        c2 = fits.Column(name='B', format='J', bscale=0.5, bzero=-1.25,
+                         array=np.array([-3.75, 2.25, 0.0, -0.4]))
+        fits.BinTableHDU.from_columns([c1, c2]).writeto(
+            self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            data = hdul[1].data
+            # (7 - 0.5) / 2 = 3.25 is stored as 3; (-7 - 0.5) / 2 = -3.75 as
+            # -4
+            assert list(data.base['A']) == [3, -4, 2, 1]
+            assert list(data['A']) == [6.5, -7.5, 4.5, 2.5]
+            assert list(data.base['B']) == [-5, 7, 2, 2]
+            assert list(data['B']) == [-3.75, 2.25, -0.25, -0.25]
+
+    def test_iter_chunks(self):
+        """
+        Tests iterating over a table in chunks of converted rows, from
+        memory mapped, normally read, and gzip-compressed files.
+        """
+
+        n = 25
+        c1 = fits.Column(name='a', format='J', array=np.arange(n))
+        c2 = fits.Column(name='b', format='I', bscale=0.5, bzero=2.0,
+                         array=np.arange(n) * 0.5 + 2.0)
+        c3 = fits.Column(name='c', format='4A',
+                         array=['r%d' % idx for idx in range(n)])
+        c4 = fits.Column(name='d', format='L', array=np.arange(n) % 2 == 0)
+        fits.BinTableHDU.from_columns([c1, c2, c3, c4]).writeto(
+            self.temp('test.fits'))
+
+        with open(self.temp('test.fits'), 'rb') as f:
+            with gzip.GzipFile(self.temp('test.fits.gz'), 'wb') as gz:
+                gz.write(f.read())
+
+        for filename, memmap in [('test.fits', True), ('test.fits', False),
+                                 ('test.fits.gz', False)]:
+            with fits.open(self.temp(filename), memmap=memmap) as hdul:
+                hdu = hdul[1]
+                chunks = list(hdu.iter_chunks(nrows=10))
+                assert not hdu._data_loaded
+                assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+                assert (np.concatenate([chunk['a'] for chunk in chunks]) ==
+                        np.arange(n)).all()
+                assert (chunks[2]['b'] == np.arange(20, 25) * 0.5 + 2.0).all()
+                assert list(chunks[1]['c']) == ['r%d' % idx
+                                                for idx in range(10, 20)]
+                assert list(chunks[0]['d']) == [idx % 2 == 0
+                                                for idx in range(10)]
+
+                chunks = []
+                for chunk in hdu.iter_chunks(nrows=10, columns=['d', 'b'],
+                                             arrays=True):
+                    assert list(chunk.keys()) == ['d', 'b']
+                    chunks.append(chunk['b'].copy())
+                    buf = chunk['b']
+                # The arrays of the first chunk are reused for the others
+                assert buf.base is not None
+                assert (np.concatenate(chunks) ==
+                        np.arange(n) * 0.5 + 2.0).all()
+                assert not hdu._data_loaded
+
+                # Loaded data is iterated over in slices
+                hdu.data['a'][12] = 100
+                chunks = list(hdu.iter_chunks(nrows=10, columns='a'))
+                assert chunks[1]['a'][2] == 100
+                chunks = list(hdu.iter_chunks(nrows=10, arrays=True))
+                assert chunks[0]['c'].dtype == chunks[2]['c'].dtype
+
+        assert_raises(ValueError, list, hdu.iter_chunks(nrows=0))
+
     def test_binary_table(self):
         # binary table:
         t = fits.open(self.data('tb.fits'))
@@ -2637,6 +3094,163 @@ class TestVLATables(PyfitsTestCase):
         for code in ('PJ()', 'QJ()'):
             test(code)
 
+    def test_vla_ragged_read(self):
+        """
+        Tests that VLA columns are read into one contiguous array of values,
+        with each row a view of it, and that scaling is applied to all rows.
+        """
+
+        arrays = [np.arange(idx % 5, dtype=np.int32) * idx
+                  for idx in range(20)]
+        c1 = fits.Column(name='v', format='PJ()', array=arrays)
+        c2 = fits.Column(name='s', format='PI()', bscale=0.5, bzero=10,
+                         array=[np.arange(idx % 3) for idx in range(20)])
+        c3 = fits.Column(name='u', format='PD()',
+                         array=[np.arange(4.0) * idx for idx in range(20)])
+        fits.BinTableHDU.from_columns([c1, c2, c3]).writeto(
+            self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            v = hdul[1].data['v']
+            assert v.values is not None
+            assert len(v.offsets) == 21
+            assert v.max == 4
+            for idx in range(20):
+                assert np.all(v[idx] == arrays[idx])
+                assert v[idx].base is not None
+            assert len(v.values) == sum(len(a) for a in arrays)
+
+            s = hdul[1].data['s']
+            for idx in range(20):
+                assert np.all(s[idx] == np.arange(idx % 3))
+
+            # Rows of equal length
+            u = hdul[1].data['u']
+            assert u.max == 4
+            for idx in range(20):
+                assert np.all(u[idx] == np.arange(4.0) * idx)
+
+            # Replacing a row discards the ragged representation
+            v[0] = [1, 2, 3]
+            assert v.values is None
+
+    def test_vla_scaled_rewrite(self):
+        """
+        Tests reading and rewriting a table with a scaled VLA column followed
+        by other VLA columns, which must be written back to the heap as their
+        storage values.
+        """
+
+        c1 = fits.Column(name='s', format='PI()',
+                         array=[np.arange(idx % 3, dtype=np.int16)
+                                for idx in range(10)])
+        c2 = fits.Column(name='e', format='PE()',
+                         array=[np.arange(idx % 4, dtype=np.float32) + 1.5
+                                for idx in range(10)])
+        hdu = fits.BinTableHDU.from_columns([c1, c2])
+        hdu.header['TSCAL1'] = 0.5
+        hdu.header['TZERO1'] = 10
+        hdu.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            s = hdul[1].data['s'].copy()
+            e = hdul[1].data['e'].copy()
+            pcount = hdul[1].header['PCOUNT']
+            assert np.all(s[2] == [10, 10.5])
+            hdul.writeto(self.temp('test2.fits'), checksum=True)
+
+        with fits.open(self.temp('test2.fits'), checksum=True) as hdul:
+            assert hdul[1].header['PCOUNT'] == pcount
+            for idx in range(10):
+                assert np.all(hdul[1].data['s'][idx] == s[idx])
+                assert np.all(hdul[1].data['e'][idx] == e[idx])
+
+            # Modified physical values are scaled back as well
+            hdul[1].data['s'][5][:] = [-3, 11.5]
+            hdul.writeto(self.temp('test3.fits'))
+
+        with fits.open(self.temp('test3.fits')) as hdul:
+            assert np.all(hdul[1].data['s'][5] == [-3, 11.5])
+            for idx in range(10):
+                assert np.all(hdul[1].data['e'][idx] == e[idx])
+
+    def test_vla_gather_heap(self):
+        """Tests gathering VLA arrays stored out of order in the heap."""
+
+        from ..fitsrec import _gather_heap
+
+        raw = np.arange(20, dtype=np.ubyte)
+        offsets = np.array([10, 0, 4, 3])
+        nbytes = np.array([4, 2, 0, 3])
+        assert np.all(_gather_heap(raw, offsets, nbytes) ==
+                      [10, 11, 12, 13, 0, 1, 3, 4, 5])
+
+        # Arrays stored in order are read without copying
+        gathered = _gather_heap(raw, np.array([2, 4, 9]), np.array([2, 5, 1]))
+        assert np.all(gathered == np.arange(2, 10))
+        assert gathered.base is raw
+
+    def test_vla_invalid_descriptor(self):
+        c1 = fits.Column(name='v', format='PJ()',
+                         array=[np.arange(idx) for idx in range(5)])
+        fits.BinTableHDU.from_columns([c1]).writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            data_offset = hdul[1]._data_offset
+
+        # Make the descriptor of the last row point past the end of the heap
+        with open(self.temp('test.fits'), 'r+b') as f:
+            f.seek(data_offset + 4 * 8)
+            f.write(np.array([1000, 0], dtype='>i4').tostring())
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            assert_raises(ValueError, lambda: hdul[1].data['v'])
+
+    def test_vla_bulk_heap(self):
+        """
+        Tests that the heap of VLA columns is built from the lengths of all
+        the rows at once, and written in large chunks.
+        """
+
+        from ..hdu.table import _iter_heap_chunks
+
+        arrays = [np.arange(idx % 4, dtype=np.float64) + idx
+                  for idx in range(30)]
+        c1 = fits.Column(name='v', format='PD()', array=arrays)
+        c2 = fits.Column(name='w', format='PI()', array=[[1, 2]] * 30)
+        hdu = fits.BinTableHDU.from_columns([c1, c2], nrows=32)
+
+        v = hdu.data['v']
+        assert v.values is not None
+        assert len(v.values) == sum(len(a) for a in arrays) + 2 * 3
+        assert v.max == 3
+        assert np.all(v[31] == [0, 0, 0])
+        raw = hdu.data.view(np.ndarray)
+        assert np.all(raw['v'][:5, 0] == [0, 1, 2, 3, 0])
+        assert np.all(raw['v'][:5, 1] == [0, 0, 8, 24, 48])
+
+        chunks = list(_iter_heap_chunks(v))
+        assert len(chunks) == 1
+        assert np.all(chunks[0] == v.values.view(np.ubyte))
+
+        # Without the ragged representation the arrays are gathered into
+        # chunks of about the given size
+        v[0] = [5.0, 6.0]
+        assert v.values is None
+        chunks = list(_iter_heap_chunks(v, chunk_size=64))
+        assert len(chunks) > 1
+        assert (np.concatenate(chunks) ==
+                np.concatenate([row for row in v]).view(np.ubyte)).all()
+
+        hdu.writeto(self.temp('test.fits'), checksum=True)
+        with fits.open(self.temp('test.fits'), checksum=True) as hdul:
+            assert hdul[1].verify_datasum() == 1
+            assert np.all(hdul[1].data['v'][0] == [5.0, 6.0])
+            for idx in range(1, 30):
+                assert np.all(hdul[1].data['v'][idx] == arrays[idx])
+                assert np.all(hdul[1].data['w'][idx] == [1, 2])
+            assert np.all(hdul[1].data['w'][31] == [0, 0])
+
     def test_copy_vla(self):
         """
         Regression test for https://github.com/spacetelescope/PyFITS/issues/47
@@ -2687,6 +3301,203 @@ class TestVLATables(PyfitsTestCase):
             for idx in range(1, 3):
                 assert comparerecords(new_hdul[idx].data, t2.data)
 
+    def test_vla_read_columns(self):
+        """
+        Tests reading some of the rows and columns of a table with a variable
+        length array column.
+        """
+
+        arrays = [np.arange(n, dtype=np.int32) for n in range(1, 11)]
+        c1 = fits.Column(name='n', format='J', array=np.arange(1, 11))
+        c2 = fits.Column(name='var', format='PJ()', array=arrays)
+        fits.BinTableHDU.from_columns([c1, c2]).writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            data = hdul[1].read(rows=slice(2, 8, 2), columns=['var'])
+            assert data.columns.names == ['var']
+            assert len(data) == 3
+            for row, n in zip(data['var'], [3, 5, 7]):
+                assert (row == np.arange(n)).all()
+
+            assert list(hdul[1].read(columns='n')['n']) == list(range(1, 11))
+
+    def test_vla_iter_chunks(self):
+        """
+        Tests iterating over a table with a variable length array column in
+        chunks, reading only the part of the heap used by each chunk.
+        """
+
+        arrays = [np.arange(idx % 7, dtype=np.float32) + idx
+                  for idx in range(40)]
+        c1 = fits.Column(name='n', format='J', array=np.arange(40))
+        c2 = fits.Column(name='var', format='PE()', array=arrays)
+        fits.BinTableHDU.from_columns([c1, c2]).writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits'), memmap=False) as hdul:
+            hdu = hdul[1]
+            rows = 0
+            for chunk in hdu.iter_chunks(nrows=16):
+                # The heap of each chunk holds only its own arrays
+                assert chunk._heapsize == sum(
+                    (idx % 7) * 4 for idx in chunk['n'])
+                for idx, row in zip(chunk['n'], chunk['var']):
+                    assert (row == arrays[idx]).all()
+                rows += len(chunk)
+            assert rows == 40
+            assert not hdu._data_loaded
+
+    def test_vla_where(self):
+        """
+        Tests row filter expressions over tables with variable length array
+        columns, which cannot be used in the expressions themselves.
+        """
+
+        arrays = [np.arange(n, dtype=np.int32) for n in range(1, 11)]
+        c1 = fits.Column(name='var', format='PJ()', array=arrays)
+        c2 = fits.Column(name='n', format='J', array=np.arange(1, 11))
+        hdu = fits.BinTableHDU.from_columns([c1, c2])
+
+        expected = np.arange(1, 11) > 4
+        assert (hdu.where('n > 4', mask=True) == expected).all()
+        assert_raises(ValueError, hdu.where, 'MAX(var) >= 4')
+        # The table is still in its native byte order after the error
+        assert (hdu.data['n'] == np.arange(1, 11)).all()
+        hdu.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            hdu = hdul[1]
+            assert (hdu.where('n > 4', mask=True) == expected).all()
+            assert_raises(ValueError, hdu.where, 'MAX(var) >= 4')
+
+            # The arrays of the selected rows are read from the heap
+            data = hdu.where('n > 4 && n < 8')
+            assert list(data['n']) == [5, 6, 7]
+            for row, n in zip(data['var'], data['n']):
+                assert (row == np.arange(n)).all()
+
+
+class TestCompressedTables(PyfitsTestCase):
+    """Tests for tile-compressed binary tables (CompBinTableHDU)."""
+
+    def _make_table(self, nrows=100):
+        c1 = fits.Column(name='i', format='J', array=np.arange(nrows))
+        c2 = fits.Column(name='s', format='I',
+                         array=np.arange(nrows) % 7 - 3)
+        c3 = fits.Column(name='d', format='2D',
+                         array=np.arange(nrows * 2.0).reshape(nrows, 2))
+        c4 = fits.Column(name='name', format='6A',
+                         array=['row%d' % idx for idx in range(nrows)])
+        c5 = fits.Column(name='flag', format='L',
+                         array=np.arange(nrows) % 2 == 0)
+        return fits.BinTableHDU.from_columns([c1, c2, c3, c4, c5])
+
+    def test_round_trip(self):
+        table = self._make_table()
+        hdu = fits.CompBinTableHDU(table.data, table.header, name='COMP',
+                                   tile_size=30)
+        hdu.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            comp = hdul[1]
+            assert isinstance(comp, fits.CompBinTableHDU)
+            assert comp.name == 'COMP'
+            assert comp._header['ZTABLE'] is True
+            assert comp._header['ZTILELEN'] == 30
+            assert comp._header['NAXIS2'] == 4
+            assert comp._header['ZNAXIS2'] == 100
+            assert comp._header['TFORM1'].startswith('1PB')
+            assert comp._header['ZFORM1'] == 'J'
+            assert comp._header['ZCTYP1'] == 'RICE_1'
+            assert comp._header['ZCTYP3'] == 'GZIP_2'
+            assert comp._header['ZCTYP4'] == 'GZIP_1'
+            assert comp.header['TFORM1'] == 'J'
+            assert comp.header['NAXIS2'] == 100
+            assert 'ZTABLE' not in comp.header
+            assert comparerecords(comp.data, table.data)
+
+    def test_compression_types(self):
+        table = self._make_table()
+        for compression_type in ('GZIP_1', 'GZIP_2', 'NOCOMPRESS'):
+            hdu = fits.CompBinTableHDU(table.data, table.header,
+                                       compression_type=compression_type,
+                                       tile_size=16)
+            hdu.writeto(self.temp('test.fits'), clobber=True)
+            with fits.open(self.temp('test.fits')) as hdul:
+                for idx in range(5):
+                    key = 'ZCTYP%d' % (idx + 1)
+                    assert hdul[1]._header[key] == compression_type
+                assert comparerecords(hdul[1].data, table.data)
+
+        # RICE_1 is only used for the integer columns
+        hdu = fits.CompBinTableHDU(table.data, table.header,
+                                   compression_type={'d': 'RICE_1',
+                                                     's': 'GZIP_1'})
+        hdu.writeto(self.temp('test.fits'), clobber=True)
+        with fits.open(self.temp('test.fits')) as hdul:
+            assert hdul[1]._header['ZCTYP2'] == 'GZIP_1'
+            assert hdul[1]._header['ZCTYP3'] == 'GZIP_2'
+            assert comparerecords(hdul[1].data, table.data)
+
+        assert_raises(ValueError, fits.CompBinTableHDU, table.data,
+                      compression_type='BOGUS')
+
+    def test_partial_read(self):
+        table = self._make_table()
+        hdu = fits.CompBinTableHDU(table.data, table.header, tile_size=10)
+        hdu.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            comp = hdul[1]
+            data = comp.read(rows=slice(25, 47), columns=['d', 'i'])
+            assert not comp._data_loaded
+            assert data.names == ['d', 'i']
+            assert len(data) == 22
+            assert np.all(data['i'] == table.data['i'][25:47])
+            assert np.all(data['d'] == table.data['d'][25:47])
+
+            data = comp.read(rows=slice(3, 90, 17), columns=[3])
+            assert list(data['name']) == list(table.data['name'][3:90:17])
+
+            data = comp.read(rows=-1)
+            assert comparerecords(data, table.data[-1:])
+            assert_raises(IndexError, comp.read, rows=100)
+
+            # Reading from the loaded data gives the same results
+            assert comparerecords(comp.data, table.data)
+            data = comp.read(rows=slice(25, 47), columns=['s', 'flag'])
+            assert np.all(data['s'] == table.data['s'][25:47])
+            assert np.all(data['flag'] == table.data['flag'][25:47])
+
+    def test_update_compressed_table(self):
+        table = self._make_table()
+        hdu = fits.CompBinTableHDU(table.data, table.header, tile_size=10)
+        hdu.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits'), mode='update') as hdul:
+            hdul[1].header['TEST'] = 'value'
+        with fits.open(self.temp('test.fits'), mode='update') as hdul:
+            assert hdul[1].header['TEST'] == 'value'
+            hdul[1].data['i'] *= 2
+        with fits.open(self.temp('test.fits')) as hdul:
+            assert np.all(hdul[1].data['i'] == table.data['i'] * 2)
+            assert np.all(hdul[1].data['d'] == table.data['d'])
+
+    def test_compressed_table_checksum(self):
+        table = self._make_table()
+        hdu = fits.CompBinTableHDU(table.data, table.header)
+        hdu.writeto(self.temp('test.fits'), checksum=True)
+
+        with fits.open(self.temp('test.fits'), checksum=True) as hdul:
+            assert 'CHECKSUM' in hdul[1]._header
+            assert 'CHECKSUM' not in hdul[1].header
+            assert comparerecords(hdul[1].data, table.data)
+
+    def test_vla_table_not_compressed(self):
+        c = fits.Column(name='v', format='PJ', array=[[1, 2], [3, 4, 5]])
+        table = fits.BinTableHDU.from_columns([c])
+        hdu = fits.CompBinTableHDU(table.data, table.header)
+        assert_raises(ValueError, hdu.writeto, self.temp('test.fits'))
+
 
 # These are tests that solely test the Column and ColDefs interfaces and
 # related functionality without directly involving full tables; currently there
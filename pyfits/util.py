@@ -1198,6 +1198,35 @@ def _convert_array(array, dtype):
         return array.astype(dtype)
 
 
+def _output_array(out, shape, dtype):
+    """
+    Returns the array that data with the given shape is read into when an
+    ``out`` array or ``dtype`` is given; either a new array with the given
+    shape and dtype or, after checking that it matches them, ``out``.  If the
+    shape of ``out`` only differs by axes of length one (for example for an
+    image section with an axis of length one that is dropped from the result)
+    a view of it with the given shape is returned.
+    """
+
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+
+    if dtype is not None and out.dtype != np.dtype(dtype):
+        raise ValueError('Output array has dtype %s, not %s.' %
+                         (out.dtype, np.dtype(dtype)))
+
+    if out.shape != shape:
+        if ([length for length in out.shape if length != 1] !=
+                [length for length in shape if length != 1]):
+            raise ValueError(
+                'Output array with shape %s does not match the data, which '
+                'has shape %s.' % (out.shape, shape))
+        out = out.view()
+        out.shape = shape
+
+    return out
+
+
 def _unsigned_zero(dtype):
     """
     Given a numpy dtype, finds its "zero" point, which is exactly in the
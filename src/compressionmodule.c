@@ -15,7 +15,7 @@
 /* (or higher dimensional cube) as a tile, such that each tile contains      */
 /* NAXIS1 pixels.                                                            */
 /*                                                                           */
-/* This module contains three functions that are callable from python.  The  */
+/* This module contains four functions that are callable from python.  The   */
 /* first is compress_hdu.  This function takes a pyfits.CompImageHDU object  */
 /* containing the uncompressed image data and returns the compressed data    */
 /* for all tiles into the .compressed_data attribute of that HDU.            */
@@ -24,6 +24,50 @@
 /* object that already has compressed data in its .compressed_data attribute.*/
 /* It returns the decompressed image data into the HDU's .data attribute.    */
 /*                                                                           */
+/* The third function is decompress_hdu_section.  Like decompress_hdu it     */
+/* reads from the HDU's .compressed_data, but it takes the (1-based,         */
+/* inclusive) first and last pixels of a rectangular region of the image in  */
+/* FITS axis order, and only decompresses the tiles overlapping that region. */
+/* It returns just the requested region, either as a new array or in an      */
+/* existing array passed as the optional fourth argument.                   */
+/*                                                                           */
+/* The fourth function is compress_hdu_section, the counterpart to           */
+/* decompress_hdu_section.  It compresses the tiles in a region of the image */
+/* (which must start and end on tile boundaries) from a given array of data, */
+/* and returns the compressed table and heap containing just those tiles.    */
+/*                                                                           */
+/* Two more functions, compress_rice and decompress_rice, apply the Rice     */
+/* algorithm on its own to a single array of 8, 16 or 32-bit integers.       */
+/* They are used for the columns of tile-compressed binary tables, which     */
+/* are compressed in pyfits.hdu.comptable rather than through CFITSIO's      */
+/* image compression machinery.                                              */
+/*                                                                           */
+/* find_rows evaluates a CFITSIO row filter expression (such as              */
+/* "PI > 30 && STATUS == 0") over the rows of a binary table, given as an    */
+/* in-memory FITS file, and returns a boolean array of the results for each  */
+/* row; it is used by BinTableHDU.where.                                     */
+/*                                                                           */
+/* in_region tests which of a set of points, given as arrays of x and y      */
+/* coordinates, lie within the regions of a ds9 or FITS region file, using   */
+/* CFITSIO's region filtering code; it is used by BinTableHDU.in_region.     */
+/*                                                                           */
+/* Thread safety: each of these functions first gathers everything it needs  */
+/* from Python objects--the header values used to configure CFITSIO, and     */
+/* references to the input and output arrays, which are held until the call  */
+/* returns so that their memory can't be freed--and then releases the GIL    */
+/* for all of the compression or decompression work.  Each call opens its    */
+/* own CFITSIO memory file over those arrays, so calls may run concurrently  */
+/* from several threads, on the same or on different HDUs.  This requires    */
+/* CFITSIO to be built with -D_REENTRANT, so that its shared state (the      */
+/* table of open memory files, the random number table used for dithering,  */
+/* and the state of the HCOMPRESS codec) is protected by its global lock;    */
+/* the module's CFITSIO_IS_REENTRANT attribute says whether that is so.      */
+/* The one piece of shared state that is not per call is CFITSIO's error     */
+/* message stack, so when calls fail concurrently the detailed CFITSIO       */
+/* messages may be lost and a generic error message reported instead.       */
+/* The exception is find_rows, which holds the GIL throughout, since         */
+/* CFITSIO's expression parser keeps its state in unprotected globals.       */
+/*                                                                           */
 /* Copyright (C) 2012 Association of Universities for Research in Astronomy  */
 /* (AURA)                                                                    */
 /*                                                                           */
@@ -96,6 +140,7 @@
 #include <Python.h>
 #include <numpy/arrayobject.h>
 #include <fitsio2.h>
+#include <region.h>
 #include <string.h>
 
 #include "compressionmodule.h"
@@ -139,6 +184,17 @@ void process_status_err(int status)
          strcpy(def_err_msg, "no compressed or uncompressed data for tile.");
          except_type = PyExc_ValueError;
          break;
+      case COL_NOT_FOUND:
+         strcpy(def_err_msg, "column not found.");
+         except_type = PyExc_ValueError;
+         break;
+      case PARSE_SYNTAX_ERR:
+      case PARSE_BAD_TYPE:
+      case PARSE_LRG_VECTOR:
+      case PARSE_BAD_COL:
+         strcpy(def_err_msg, "invalid row filter expression.");
+         except_type = PyExc_ValueError;
+         break;
       default:
          except_type = PyExc_RuntimeError;
    }
@@ -681,10 +737,17 @@ void configure_compression(fitsfile* fileptr, PyObject* header) {
 }
 
 
-void init_output_buffer(PyObject* hdu, void** buf, size_t* bufsize) {
+void init_output_buffer(PyObject* hdu, void** buf, size_t* bufsize,
+                        int ndim, long* fpixel, long* lpixel) {
     // Determines a good size for the output data buffer and allocates
     // memory for it, returning the address and size of the allocated
     // memory into **buf and *bufsize respectively.
+    //
+    // If fpixel and lpixel are not NULL they give the (1-based, inclusive)
+    // bounds of the ndim-dimensional section of the image that will be
+    // compressed, and heap space is only reserved for the tiles in that
+    // section; the buffer is reallocated by CFITSIO if it turns out to be
+    // too small anyways.
 
     PyObject* header = NULL;
     char keyword[9];
@@ -696,6 +759,7 @@ void init_output_buffer(PyObject* hdu, void** buf, size_t* bufsize) {
     int rice_blocksize = 0;
     long long rowlen;
     long long nrows;
+    long long ntiles = 1;
     long maxelem;
     long tilelen;
     unsigned long maxtilelen = 1;
@@ -713,6 +777,13 @@ void init_output_buffer(PyObject* hdu, void** buf, size_t* bufsize) {
         snprintf(keyword, 9, "ZTILE%u", idx);
         get_header_long(header, keyword, &tilelen, 1);
         maxtilelen *= tilelen;
+        if (fpixel != NULL && lpixel != NULL && ndim == znaxis &&
+                tilelen > 0 && lpixel[idx - 1] >= fpixel[idx - 1]) {
+            ntiles *= (lpixel[idx - 1] - fpixel[idx - 1]) / tilelen + 1;
+        } else {
+            ntiles = -1;
+            fpixel = lpixel = NULL;
+        }
     }
 
     get_header_string(header, "ZCMPTYPE", tmp, DEFAULT_COMPRESSION_TYPE);
@@ -732,7 +803,11 @@ void init_output_buffer(PyObject* hdu, void** buf, size_t* bufsize) {
     maxelem = imcomp_calc_max_elem(compress_type, maxtilelen, zbitpix,
                                    rice_blocksize);
 
-    *bufsize = ((size_t) (rowlen * nrows) + (nrows * maxelem));
+    if (ntiles < 0 || ntiles > nrows) {
+        ntiles = nrows;
+    }
+
+    *bufsize = ((size_t) (rowlen * nrows) + (ntiles * maxelem));
 
     if (*bufsize < IOBUFLEN) {
         // We must have a full FITS block at a minimum
@@ -751,13 +826,19 @@ fail:
 }
 
 
-void get_hdu_data_base(PyObject* hdu, void** buf, size_t* bufsize) {
+PyArrayObject* get_hdu_data_base(PyObject* hdu, void** buf,
+                                 size_t* bufsize) {
     // Given a pointer to an HDU object, returns a pointer to the deepest base
     // array of that HDU's data array into **buf, and the size of that array
     // into *bufsize.
+    //
+    // Also returns a new reference to that base array (or NULL if an error
+    // occurred); the caller must hold on to it for as long as it uses *buf,
+    // since *buf is used without holding the GIL, during which time the HDU's
+    // compressed_data could otherwise be replaced and freed by another thread.
 
     PyArrayObject* data = NULL;
-    PyArrayObject* base;
+    PyArrayObject* base = NULL;
     PyArrayObject* tmp;
 
     data = (PyArrayObject*) PyObject_GetAttrString(hdu, "compressed_data");
@@ -785,9 +866,10 @@ void get_hdu_data_base(PyObject* hdu, void** buf, size_t* bufsize) {
     }
 
     *buf = PyArray_DATA(base);
+    Py_INCREF(base);
 fail:
     Py_XDECREF(data);
-    return;
+    return (data == NULL || base == NULL) ? NULL : base;
 }
 
 
@@ -872,14 +954,15 @@ PyObject* compression_compress_hdu(PyObject* self, PyObject* args)
     void* outbuf;
     size_t outbufsize;
 
-    PyArrayObject* indata;
+    PyObject* data = NULL;
+    PyArrayObject* indata = NULL;
     PyArrayObject* tmp;
     npy_intp znaxis;
     int datatype;
     int npdatatype;
     unsigned long long heapsize;
 
-    fitsfile* fileptr;
+    fitsfile* fileptr = NULL;
     FITSfile* Fptr = NULL;
     int status = 0;
 
@@ -894,7 +977,7 @@ PyObject* compression_compress_hdu(PyObject* self, PyObject* args)
     // too much confusion to PyFITS' internal book keeping.
     // We just need to get the compressed bytes and PyFITS will handle the
     // writing of them.
-    init_output_buffer(hdu, &outbuf, &outbufsize);
+    init_output_buffer(hdu, &outbuf, &outbufsize, 0, NULL, NULL);
     if (outbuf == NULL) {
         return NULL;
     }
@@ -911,16 +994,27 @@ PyObject* compression_compress_hdu(PyObject* self, PyObject* args)
         goto fail;
     }
 
-    indata = (PyArrayObject*) PyObject_GetAttrString(hdu, "data");
+    data = PyObject_GetAttrString(hdu, "data");
+    if (data == NULL) {
+        goto fail;
+    }
 
-    fits_write_img(fileptr, datatype, 1, PyArray_SIZE(indata), indata->data,
-                   &status);
-    if (status != 0) {
-        process_status_err(status);
+    // CompImageHDU has already converted the data to the native
+    // representation of the image's BITPIX (though its dtype may still say
+    // otherwise), so only make sure that it is contiguous
+    indata = (PyArrayObject*) PyArray_FROM_OF(data, NPY_ARRAY_IN_ARRAY);
+    if (indata == NULL) {
         goto fail;
     }
 
+    // Everything needed from Python objects has been gathered by now, so the
+    // compression itself can run without the GIL
+    Py_BEGIN_ALLOW_THREADS
+    fits_write_img(fileptr, datatype, 1, PyArray_SIZE(indata),
+                   PyArray_DATA(indata), &status);
     fits_flush_buffer(fileptr, 1, &status);
+    Py_END_ALLOW_THREADS
+
     if (status != 0) {
         process_status_err(status);
         goto fail;
@@ -973,6 +1067,7 @@ cleanup:
         }
     }
 
+    Py_XDECREF(data);
     Py_XDECREF(indata);
 
     // Clear any messages remaining in CFITSIO's error stack
@@ -982,19 +1077,219 @@ cleanup:
 }
 
 
+PyObject* compression_compress_hdu_section(PyObject* self, PyObject* args)
+{
+    PyObject* hdu;
+    PyObject* data;
+    PyObject* first_pixel;
+    PyObject* last_pixel;
+    PyObject* item;
+    PyObject* retval = NULL;
+    tcolumn* columns = NULL;
+
+    void* outbuf = NULL;
+    size_t outbufsize;
+
+    PyArrayObject* indata = NULL;
+    PyArrayObject* tmp;
+    npy_intp znaxis;
+    npy_intp zndim;
+    npy_intp npix;
+    int datatype;
+    int npdatatype;
+    unsigned long long heapsize;
+    long* fpixel = NULL;
+    long* lpixel = NULL;
+    Py_ssize_t value;
+    unsigned int idx;
+
+    fitsfile* fileptr = NULL;
+    FITSfile* Fptr = NULL;
+    int status = 0;
+
+    if (!PyArg_ParseTuple(args, "OOOO:compression.compress_hdu_section",
+                          &hdu, &data, &first_pixel, &last_pixel))
+    {
+        PyErr_SetString(PyExc_TypeError, "Couldn't parse arguments");
+        return NULL;
+    }
+
+    zndim = (npy_intp) PySequence_Size(first_pixel);
+    if (zndim < 0 || PySequence_Size(last_pixel) != zndim) {
+        PyErr_SetString(PyExc_ValueError,
+                        "first_pixel and last_pixel must be sequences of the "
+                        "same length");
+        goto fail;
+    }
+
+    fpixel = (long*) PyMem_Malloc(sizeof(long) * (zndim + 1));
+    lpixel = (long*) PyMem_Malloc(sizeof(long) * (zndim + 1));
+    if (fpixel == NULL || lpixel == NULL) {
+        PyErr_NoMemory();
+        goto fail;
+    }
+
+    for (idx = 0; idx < zndim; idx++) {
+        item = PySequence_GetItem(first_pixel, idx);
+        if (item == NULL) {
+            goto fail;
+        }
+        value = PyNumber_AsSsize_t(item, PyExc_OverflowError);
+        Py_DECREF(item);
+        if (value == -1 && PyErr_Occurred()) {
+            goto fail;
+        }
+        fpixel[idx] = (long) value;
+
+        item = PySequence_GetItem(last_pixel, idx);
+        if (item == NULL) {
+            goto fail;
+        }
+        value = PyNumber_AsSsize_t(item, PyExc_OverflowError);
+        Py_DECREF(item);
+        if (value == -1 && PyErr_Occurred()) {
+            goto fail;
+        }
+        lpixel[idx] = (long) value;
+    }
+
+    // Only reserve heap space for the tiles in this section, so that
+    // compressing a small section of a large image does not allocate a
+    // buffer for the whole image
+    init_output_buffer(hdu, &outbuf, &outbufsize, (int) zndim, fpixel,
+                       lpixel);
+    if (outbuf == NULL) {
+        if (!PyErr_Occurred()) {
+            PyErr_NoMemory();
+        }
+        goto fail;
+    }
+
+    open_from_hdu(&fileptr, &outbuf, &outbufsize, hdu, &columns, READWRITE);
+    if (PyErr_Occurred()) {
+        goto fail;
+    }
+
+    Fptr = fileptr->Fptr;
+
+    bitpix_to_datatypes(Fptr->zbitpix, &datatype, &npdatatype);
+    if (PyErr_Occurred()) {
+        goto fail;
+    }
+
+    if (zndim != (npy_intp) Fptr->zndim) {
+        PyErr_Format(PyExc_ValueError,
+                     "first_pixel and last_pixel must both have %d elements",
+                     Fptr->zndim);
+        goto fail;
+    }
+
+    npix = 1;
+    for (idx = 0; idx < zndim; idx++) {
+        // Tiles that are only partly covered by the section would have to be
+        // merged with their existing contents, which don't exist yet
+        if (fpixel[idx] < 1 || lpixel[idx] < fpixel[idx] ||
+                lpixel[idx] > Fptr->znaxis[idx] ||
+                (fpixel[idx] - 1) % Fptr->tilesize[idx] != 0 ||
+                (lpixel[idx] % Fptr->tilesize[idx] != 0 &&
+                 lpixel[idx] != Fptr->znaxis[idx])) {
+            PyErr_Format(PyExc_ValueError,
+                         "Invalid pixel range %ld-%ld for image axis %d; "
+                         "the range must start and end on tile boundaries",
+                         fpixel[idx], lpixel[idx], (int) idx + 1);
+            goto fail;
+        }
+
+        npix *= lpixel[idx] - fpixel[idx] + 1;
+    }
+
+    // CompImageHDU has already converted the data to the native
+    // representation of the image's BITPIX (though its dtype may still say
+    // otherwise), so only make sure that it is contiguous
+    indata = (PyArrayObject*) PyArray_FROM_OF(data, NPY_ARRAY_IN_ARRAY);
+    if (indata == NULL) {
+        goto fail;
+    }
+
+    if (PyArray_SIZE(indata) != npix) {
+        PyErr_SetString(PyExc_ValueError,
+                        "The size of the data does not match the size of the "
+                        "image section");
+        goto fail;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    fits_write_subset(fileptr, datatype, fpixel, lpixel,
+                      PyArray_DATA(indata), &status);
+    fits_flush_buffer(fileptr, 1, &status);
+    Py_END_ALLOW_THREADS
+
+    if (status != 0) {
+        process_status_err(status);
+        goto fail;
+    }
+
+    heapsize = (unsigned long long) Fptr->heapsize;
+    znaxis = (npy_intp) (Fptr->heapstart + heapsize);
+
+    // The sections are later combined into a single buffer, so copy the
+    // compressed data into an array that owns its memory rather than handing
+    // over outbuf
+    tmp = (PyArrayObject*) PyArray_SimpleNew(1, &znaxis, NPY_UBYTE);
+    if (tmp == NULL) {
+        goto fail;
+    }
+    memcpy(PyArray_DATA(tmp), outbuf, (size_t) znaxis);
+
+    retval = Py_BuildValue("KN", heapsize, tmp);
+
+fail:
+    if (columns != NULL) {
+        PyMem_Free(columns);
+        if (Fptr != NULL) {
+            Fptr->tableptr = NULL;
+        }
+    }
+
+    if (fileptr != NULL) {
+        status = 1; // Disable header-related errors
+        fits_close_file(fileptr, &status);
+        if (status != 1 && retval != NULL) {
+            process_status_err(status);
+            Py_DECREF(retval);
+            retval = NULL;
+        }
+    }
+
+    if (outbuf != NULL) {
+        free(outbuf);
+    }
+
+    Py_XDECREF(indata);
+    PyMem_Free(fpixel);
+    PyMem_Free(lpixel);
+
+    // Clear any messages remaining in CFITSIO's error stack
+    fits_clear_errmsg();
+
+    return retval;
+}
+
+
 PyObject* compression_decompress_hdu(PyObject* self, PyObject* args)
 {
     PyObject* hdu;
     tcolumn* columns = NULL;
 
+    PyArrayObject* inbase = NULL;
     void* inbuf;
     size_t inbufsize;
 
-    PyArrayObject* outdata;
+    PyArrayObject* outdata = NULL;
     int datatype;
     int npdatatype;
     npy_intp zndim;
-    npy_intp* znaxis;
+    npy_intp* znaxis = NULL;
     long arrsize;
     unsigned int idx;
 
@@ -1010,28 +1305,34 @@ PyObject* compression_decompress_hdu(PyObject* self, PyObject* args)
 
     // Grab a pointer to the input data from the HDU's compressed_data
     // attribute
-    get_hdu_data_base(hdu, &inbuf, &inbufsize);
-    if (PyErr_Occurred()) {
+    inbase = get_hdu_data_base(hdu, &inbuf, &inbufsize);
+    if (inbase == NULL) {
         return NULL;
     } else if (inbufsize == 0) {
         // The compressed data buffer is empty (probably zero rows, for an
         // empty "compressed" image.  Just return None in this case.
+        Py_DECREF(inbase);
         Py_INCREF(Py_None);
         return Py_None;
     }
 
     open_from_hdu(&fileptr, &inbuf, &inbufsize, hdu, &columns, READONLY);
     if (PyErr_Occurred()) {
-        return NULL;
+        goto fail;
     }
 
     bitpix_to_datatypes(fileptr->Fptr->zbitpix, &datatype, &npdatatype);
     if (PyErr_Occurred()) {
-        return NULL;
+        goto fail;
     }
 
     zndim = (npy_intp)fileptr->Fptr->zndim;
     znaxis = (npy_intp*) PyMem_Malloc(sizeof(npy_intp) * zndim);
+    if (znaxis == NULL) {
+        PyErr_NoMemory();
+        goto fail;
+    }
+
     arrsize = 1;
     for (idx = 0; idx < zndim; idx++) {
         znaxis[zndim - idx - 1] = fileptr->Fptr->znaxis[idx];
@@ -1040,16 +1341,29 @@ PyObject* compression_decompress_hdu(PyObject* self, PyObject* args)
 
     /* Create and allocate a new array for the decompressed data */
     outdata = (PyArrayObject*) PyArray_SimpleNew(zndim, znaxis, npdatatype);
+    if (outdata == NULL) {
+        goto fail;
+    }
+
+    // Everything needed from Python objects has been gathered by now, so the
+    // decompression itself can run without the GIL
+    Py_BEGIN_ALLOW_THREADS
+    fits_read_img(fileptr, datatype, 1, arrsize, NULL, PyArray_DATA(outdata),
+                  &anynul, &status);
+    Py_END_ALLOW_THREADS
 
-    fits_read_img(fileptr, datatype, 1, arrsize, NULL, outdata->data, &anynul,
-                  &status);
     if (status != 0) {
         process_status_err(status);
-        outdata = NULL;
         goto fail;
     }
 
+    goto cleanup;
+
 fail:
+    Py_XDECREF(outdata);
+    outdata = NULL;
+
+cleanup:
     // CFITSIO will free this object in the ffchdu function by way of
     // fits_close_file; we need to let CFITSIO handle this so that it also
     // cleans up the compressed tile cache
@@ -1063,13 +1377,280 @@ fail:
     if (fileptr != NULL) {
         status = 1;// Disable header-related errors
         fits_close_file(fileptr, &status);
-        if (status != 1) {
+        if (status != 1 && outdata != NULL) {
             process_status_err(status);
+            Py_DECREF(outdata);
             outdata = NULL;
         }
     }
 
     PyMem_Free(znaxis);
+    Py_DECREF(inbase);
+
+    // Clear any messages remaining in CFITSIO's error stack
+    fits_clear_errmsg();
+
+    return (PyObject*) outdata;
+}
+
+
+PyObject* compression_decompress_hdu_section(PyObject* self, PyObject* args)
+{
+    PyObject* hdu;
+    PyObject* first_pixel;
+    PyObject* last_pixel;
+    PyObject* out = Py_None;
+    PyObject* item;
+    tcolumn* columns = NULL;
+
+    PyArrayObject* inbase = NULL;
+    void* inbuf;
+    size_t inbufsize;
+
+    PyArrayObject* outdata = NULL;
+    int datatype;
+    int npdatatype;
+    npy_intp zndim;
+    npy_intp* shape = NULL;
+    npy_intp npix;
+    long* fpixel = NULL;
+    long* lpixel = NULL;
+    long* inc = NULL;
+    Py_ssize_t value;
+    unsigned int idx;
+
+    fitsfile* fileptr = NULL;
+    int anynul = 0;
+    int status = 0;
+
+    if (!PyArg_ParseTuple(args, "OOO|O:compression.decompress_hdu_section",
+                          &hdu, &first_pixel, &last_pixel, &out))
+    {
+        PyErr_SetString(PyExc_TypeError, "Couldn't parse arguments");
+        return NULL;
+    }
+
+    inbase = get_hdu_data_base(hdu, &inbuf, &inbufsize);
+    if (inbase == NULL) {
+        return NULL;
+    } else if (inbufsize == 0) {
+        Py_DECREF(inbase);
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+
+    open_from_hdu(&fileptr, &inbuf, &inbufsize, hdu, &columns, READONLY);
+    if (PyErr_Occurred()) {
+        goto fail;
+    }
+
+    bitpix_to_datatypes(fileptr->Fptr->zbitpix, &datatype, &npdatatype);
+    if (PyErr_Occurred()) {
+        goto fail;
+    }
+
+    zndim = (npy_intp)fileptr->Fptr->zndim;
+    if (PySequence_Size(first_pixel) != zndim ||
+            PySequence_Size(last_pixel) != zndim) {
+        PyErr_Format(PyExc_ValueError,
+                     "first_pixel and last_pixel must both have %d elements",
+                     (int) zndim);
+        goto fail;
+    }
+
+    shape = (npy_intp*) PyMem_Malloc(sizeof(npy_intp) * zndim);
+    fpixel = (long*) PyMem_Malloc(sizeof(long) * zndim);
+    lpixel = (long*) PyMem_Malloc(sizeof(long) * zndim);
+    inc = (long*) PyMem_Malloc(sizeof(long) * zndim);
+    if (shape == NULL || fpixel == NULL || lpixel == NULL || inc == NULL) {
+        PyErr_NoMemory();
+        goto fail;
+    }
+
+    npix = 1;
+    for (idx = 0; idx < zndim; idx++) {
+        item = PySequence_GetItem(first_pixel, idx);
+        if (item == NULL) {
+            goto fail;
+        }
+        value = PyNumber_AsSsize_t(item, PyExc_OverflowError);
+        Py_DECREF(item);
+        if (value == -1 && PyErr_Occurred()) {
+            goto fail;
+        }
+        fpixel[idx] = (long) value;
+
+        item = PySequence_GetItem(last_pixel, idx);
+        if (item == NULL) {
+            goto fail;
+        }
+        value = PyNumber_AsSsize_t(item, PyExc_OverflowError);
+        Py_DECREF(item);
+        if (value == -1 && PyErr_Occurred()) {
+            goto fail;
+        }
+        lpixel[idx] = (long) value;
+
+        if (fpixel[idx] < 1 || lpixel[idx] < fpixel[idx] ||
+                lpixel[idx] > fileptr->Fptr->znaxis[idx]) {
+            PyErr_Format(PyExc_ValueError,
+                         "Invalid pixel range %ld-%ld for image axis %d",
+                         fpixel[idx], lpixel[idx], (int) idx + 1);
+            goto fail;
+        }
+
+        inc[idx] = 1;
+        shape[zndim - idx - 1] = lpixel[idx] - fpixel[idx] + 1;
+        npix *= shape[zndim - idx - 1];
+    }
+
+    if (out == Py_None) {
+        /* Create and allocate a new array for the decompressed section */
+        outdata = (PyArrayObject*) PyArray_SimpleNew(zndim, shape,
+                                                     npdatatype);
+        if (outdata == NULL) {
+            goto fail;
+        }
+    } else {
+        /* Decompress directly into the given array, which must be able to
+           hold the section's pixels exactly as CFITSIO writes them */
+        if (!PyArray_Check(out) ||
+                !PyArray_ISCARRAY((PyArrayObject*) out) ||
+                !PyArray_EquivTypenums(PyArray_TYPE((PyArrayObject*) out),
+                                       npdatatype) ||
+                PyArray_SIZE((PyArrayObject*) out) != npix) {
+            PyErr_SetString(PyExc_ValueError,
+                            "out must be a writeable, C-contiguous array of "
+                            "the image's data type, with the size of the "
+                            "image section");
+            goto fail;
+        }
+        outdata = (PyArrayObject*) out;
+        Py_INCREF(outdata);
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    fits_read_subset(fileptr, datatype, fpixel, lpixel, inc, NULL,
+                     PyArray_DATA(outdata), &anynul, &status);
+    Py_END_ALLOW_THREADS
+    if (status != 0) {
+        process_status_err(status);
+        goto fail;
+    }
+
+    goto cleanup;
+
+fail:
+    Py_XDECREF(outdata);
+    outdata = NULL;
+
+cleanup:
+    if (fileptr != NULL) {
+        status = 1;// Disable header-related errors
+        fits_close_file(fileptr, &status);
+        if (status != 1 && outdata != NULL) {
+            process_status_err(status);
+            Py_DECREF(outdata);
+            outdata = NULL;
+        }
+    }
+
+    PyMem_Free(shape);
+    PyMem_Free(fpixel);
+    PyMem_Free(lpixel);
+    PyMem_Free(inc);
+    Py_DECREF(inbase);
+
+    // Clear any messages remaining in CFITSIO's error stack
+    fits_clear_errmsg();
+
+    return (PyObject*) outdata;
+}
+
+
+
+/* Rice compress a C-contiguous array of 1, 2, or 4 byte integers in native
+   byte order, returning the compressed bytes as a new uint8 array. */
+PyObject* compression_compress_rice(PyObject* self, PyObject* args)
+{
+    PyObject* data;
+    PyArrayObject* indata = NULL;
+    PyArrayObject* outdata = NULL;
+    PyArrayObject* tmp;
+    int blocksize = DEFAULT_BLOCK_SIZE;
+    int itemsize;
+    int nelem;
+    int clen;
+    int nbytes = 0;
+    unsigned char* cbuf = NULL;
+    npy_intp outsize;
+
+    if (!PyArg_ParseTuple(args, "O|i:compression.compress_rice", &data,
+                          &blocksize))
+    {
+        PyErr_SetString(PyExc_TypeError, "Couldn't parse arguments");
+        return NULL;
+    }
+
+    indata = (PyArrayObject*) PyArray_FROM_OF(data, NPY_ARRAY_IN_ARRAY);
+    if (indata == NULL) {
+        return NULL;
+    }
+
+    itemsize = (int) PyArray_ITEMSIZE(indata);
+    if (!PyArray_ISINTEGER(indata) ||
+            (itemsize != 1 && itemsize != 2 && itemsize != 4)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "Rice compression requires an array of 8, 16, or "
+                        "32-bit integers");
+        goto fail;
+    }
+
+    if (PyArray_SIZE(indata) > INT_MAX / 4) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Array is too large to Rice compress as one tile");
+        goto fail;
+    }
+
+    nelem = (int) PyArray_SIZE(indata);
+    // The compressed data can be slightly larger than the input when the
+    // values are incompressible
+    clen = nelem * itemsize + nelem / blocksize + 64;
+    cbuf = (unsigned char*) PyMem_Malloc((size_t) clen);
+    if (cbuf == NULL) {
+        PyErr_NoMemory();
+        goto fail;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    if (itemsize == 1) {
+        nbytes = fits_rcomp_byte((signed char*) PyArray_DATA(indata), nelem,
+                                 cbuf, clen, blocksize);
+    } else if (itemsize == 2) {
+        nbytes = fits_rcomp_short((short*) PyArray_DATA(indata), nelem, cbuf,
+                                  clen, blocksize);
+    } else {
+        nbytes = fits_rcomp((int*) PyArray_DATA(indata), nelem, cbuf, clen,
+                            blocksize);
+    }
+    Py_END_ALLOW_THREADS
+
+    if (nbytes < 0) {
+        process_status_err(DATA_COMPRESSION_ERR);
+        goto fail;
+    }
+
+    outsize = (npy_intp) nbytes;
+    tmp = (PyArrayObject*) PyArray_SimpleNew(1, &outsize, NPY_UBYTE);
+    if (tmp == NULL) {
+        goto fail;
+    }
+    memcpy(PyArray_DATA(tmp), cbuf, (size_t) nbytes);
+    outdata = tmp;
+
+fail:
+    PyMem_Free(cbuf);
+    Py_DECREF(indata);
 
     // Clear any messages remaining in CFITSIO's error stack
     fits_clear_errmsg();
@@ -1078,6 +1659,364 @@ fail:
 }
 
 
+/* Decompress Rice compressed bytes into a new array of nelem integers of the
+   given size in bytes (1, 2, or 4), in native byte order. */
+PyObject* compression_decompress_rice(PyObject* self, PyObject* args)
+{
+    PyObject* data;
+    PyArrayObject* indata = NULL;
+    PyArrayObject* outdata = NULL;
+    Py_ssize_t nelem;
+    int itemsize;
+    int blocksize = DEFAULT_BLOCK_SIZE;
+    int npdatatype;
+    npy_intp outsize;
+    int status = 0;
+
+    if (!PyArg_ParseTuple(args, "Oni|i:compression.decompress_rice", &data,
+                          &nelem, &itemsize, &blocksize))
+    {
+        PyErr_SetString(PyExc_TypeError, "Couldn't parse arguments");
+        return NULL;
+    }
+
+    if (itemsize == 1) {
+        npdatatype = NPY_INT8;
+    } else if (itemsize == 2) {
+        npdatatype = NPY_INT16;
+    } else if (itemsize == 4) {
+        npdatatype = NPY_INT32;
+    } else {
+        PyErr_SetString(PyExc_ValueError,
+                        "Rice compressed integers must be 1, 2, or 4 bytes");
+        return NULL;
+    }
+
+    if (nelem < 0 || nelem > INT_MAX / 4) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid number of elements to Rice decompress");
+        return NULL;
+    }
+
+    indata = (PyArrayObject*) PyArray_FROM_OTF(data, NPY_UBYTE,
+                                               NPY_ARRAY_IN_ARRAY);
+    if (indata == NULL) {
+        return NULL;
+    }
+
+    if (PyArray_SIZE(indata) > INT_MAX) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Compressed data is too large to Rice decompress");
+        goto fail;
+    }
+
+    outsize = (npy_intp) nelem;
+    outdata = (PyArrayObject*) PyArray_SimpleNew(1, &outsize, npdatatype);
+    if (outdata == NULL) {
+        goto fail;
+    }
+
+    if (nelem > 0) {
+        Py_BEGIN_ALLOW_THREADS
+        if (itemsize == 1) {
+            status = fits_rdecomp_byte(
+                (unsigned char*) PyArray_DATA(indata),
+                (int) PyArray_SIZE(indata),
+                (unsigned char*) PyArray_DATA(outdata), (int) nelem,
+                blocksize);
+        } else if (itemsize == 2) {
+            status = fits_rdecomp_short(
+                (unsigned char*) PyArray_DATA(indata),
+                (int) PyArray_SIZE(indata),
+                (unsigned short*) PyArray_DATA(outdata), (int) nelem,
+                blocksize);
+        } else {
+            status = fits_rdecomp(
+                (unsigned char*) PyArray_DATA(indata),
+                (int) PyArray_SIZE(indata),
+                (unsigned int*) PyArray_DATA(outdata), (int) nelem,
+                blocksize);
+        }
+        Py_END_ALLOW_THREADS
+    }
+
+    if (status != 0) {
+        process_status_err(DATA_DECOMPRESSION_ERR);
+        Py_DECREF(outdata);
+        outdata = NULL;
+    }
+
+fail:
+    Py_DECREF(indata);
+
+    // Clear any messages remaining in CFITSIO's error stack
+    fits_clear_errmsg();
+
+    return (PyObject*) outdata;
+}
+
+
+
+/* Evaluate a boolean row filter expression over all the rows of the binary
+   table in the second HDU of a FITS file held in memory, given as a uint8
+   array.  Returns a new boolean array of the result for each row.
+
+   CFITSIO's expression parser keeps its state in globals, so this does not
+   release the GIL. */
+PyObject* compression_find_rows(PyObject* self, PyObject* args)
+{
+    PyObject* data;
+    PyArrayObject* indata = NULL;
+    PyArrayObject* outdata = NULL;
+    char* expression;
+    fitsfile* fileptr = NULL;
+    void* buf;
+    size_t bufsize;
+    long nrows = 0;
+    long ngood = 0;
+    int status = 0;
+    int close_status = 0;
+    npy_intp outsize;
+
+    if (!PyArg_ParseTuple(args, "Os:compression.find_rows", &data,
+                          &expression))
+    {
+        PyErr_SetString(PyExc_TypeError, "Couldn't parse arguments");
+        return NULL;
+    }
+
+    indata = (PyArrayObject*) PyArray_FROM_OTF(data, NPY_UBYTE,
+                                               NPY_ARRAY_IN_ARRAY);
+    if (indata == NULL) {
+        return NULL;
+    }
+
+    // The file is opened read-only, so CFITSIO never writes to or
+    // reallocates the buffer
+    buf = PyArray_DATA(indata);
+    bufsize = (size_t) PyArray_NBYTES(indata);
+    fits_open_memfile(&fileptr, "pyfits_table.fits", READONLY, &buf,
+                      &bufsize, 0, NULL, &status);
+    fits_movabs_hdu(fileptr, 2, NULL, &status);
+    fits_get_num_rows(fileptr, &nrows, &status);
+    if (status != 0) {
+        process_status_err(status);
+        goto fail;
+    }
+
+    outsize = (npy_intp) nrows;
+    outdata = (PyArrayObject*) PyArray_SimpleNew(1, &outsize, NPY_BOOL);
+    if (outdata == NULL) {
+        goto fail;
+    }
+
+    if (nrows > 0) {
+        // NPY_BOOL elements are single chars holding 0 or 1, as are the
+        // row status flags set by CFITSIO
+        fits_find_rows(fileptr, expression, 1, nrows, &ngood,
+                       (char*) PyArray_DATA(outdata), &status);
+        if (status == KEY_NO_EXIST) {
+            // Names which are not columns are looked up as keywords, so this
+            // is how the parser reports a column that does not exist
+            status = COL_NOT_FOUND;
+        }
+        if (status != 0) {
+            process_status_err(status);
+            Py_DECREF(outdata);
+            outdata = NULL;
+        }
+    }
+
+fail:
+    if (fileptr != NULL) {
+        fits_close_file(fileptr, &close_status);
+    }
+
+    Py_DECREF(indata);
+
+    // Clear any messages remaining in CFITSIO's error stack
+    fits_clear_errmsg();
+
+    return (PyObject*) outdata;
+}
+
+
+
+/* Test which of a set of points lie within a region read by
+   fits_read_rgnfile.  points is a tuple of (x, y) arrays of the pixel
+   coordinates of the points.  Returns a new boolean array. */
+PyArrayObject* points_in_region(SAORegion* region, PyObject* points)
+{
+    PyObject* x;
+    PyObject* y;
+    PyArrayObject* xdata = NULL;
+    PyArrayObject* ydata = NULL;
+    PyArrayObject* outdata = NULL;
+    double* xptr;
+    double* yptr;
+    npy_bool* outptr;
+    npy_intp npoints;
+    npy_intp idx;
+
+    if (!PyTuple_Check(points)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "Each chunk of points must be an (x, y) tuple.");
+        return NULL;
+    }
+
+    if (!PyArg_ParseTuple(points, "OO:compression.in_region", &x, &y))
+    {
+        return NULL;
+    }
+
+    xdata = (PyArrayObject*) PyArray_FROM_OTF(x, NPY_DOUBLE,
+                                              NPY_ARRAY_IN_ARRAY);
+    if (xdata == NULL) {
+        goto fail;
+    }
+
+    ydata = (PyArrayObject*) PyArray_FROM_OTF(y, NPY_DOUBLE,
+                                              NPY_ARRAY_IN_ARRAY);
+    if (ydata == NULL) {
+        goto fail;
+    }
+
+    npoints = PyArray_SIZE(xdata);
+    if (PyArray_SIZE(ydata) != npoints) {
+        PyErr_SetString(PyExc_ValueError,
+                        "The x and y coordinate arrays must be the same "
+                        "size.");
+        goto fail;
+    }
+
+    outdata = (PyArrayObject*) PyArray_SimpleNew(1, &npoints, NPY_BOOL);
+    if (outdata == NULL) {
+        goto fail;
+    }
+
+    xptr = (double*) PyArray_DATA(xdata);
+    yptr = (double*) PyArray_DATA(ydata);
+    outptr = (npy_bool*) PyArray_DATA(outdata);
+
+    // The region is only read from here on, so the points can be tested
+    // without the GIL
+    Py_BEGIN_ALLOW_THREADS
+    if (region->nShapes == 0) {
+        memset(outptr, 0, npoints * sizeof(npy_bool));
+    } else {
+        for (idx = 0; idx < npoints; idx++) {
+            outptr[idx] = fits_in_region(xptr[idx], yptr[idx], region) != 0;
+        }
+    }
+    Py_END_ALLOW_THREADS
+
+fail:
+    Py_XDECREF(xdata);
+    Py_XDECREF(ydata);
+
+    return outdata;
+}
+
+
+/* Test which of a set of points lie within the regions of a ds9 (SAO) or FITS
+   region file.  chunks is an iterable of (x, y) tuples of arrays of the pixel
+   coordinates of the points, which are tested one chunk at a time after the
+   region file has been read once; wcs is None or a tuple of (xrefval,
+   yrefval, xrefpix, yrefpix, xinc, yinc, rot, type) describing the celestial
+   coordinates of those pixels, which is needed for region files given in sky
+   coordinates.  Returns a list of new boolean arrays, one for each chunk. */
+PyObject* compression_in_region(PyObject* self, PyObject* args)
+{
+    char* filename;
+    char* wcstype;
+    PyObject* chunks;
+    PyObject* wcsobj;
+    PyObject* iterator = NULL;
+    PyObject* points;
+    PyObject* results = NULL;
+    PyArrayObject* outdata;
+    WCSdata wcs;
+    WCSdata* wcsptr = NULL;
+    SAORegion* region = NULL;
+    int status = 0;
+
+    if (!PyArg_ParseTuple(args, "sOO:compression.in_region", &filename,
+                          &chunks, &wcsobj))
+    {
+        PyErr_SetString(PyExc_TypeError, "Couldn't parse arguments");
+        return NULL;
+    }
+
+    if (wcsobj != Py_None) {
+        if (!PyArg_ParseTuple(wcsobj, "ddddddds:compression.in_region",
+                              &wcs.xrefval, &wcs.yrefval, &wcs.xrefpix,
+                              &wcs.yrefpix, &wcs.xinc, &wcs.yinc, &wcs.rot,
+                              &wcstype))
+        {
+            return NULL;
+        }
+
+        strncpy(wcs.type, wcstype, sizeof(wcs.type) - 1);
+        wcs.type[sizeof(wcs.type) - 1] = '\0';
+        wcs.exists = 1;
+        wcsptr = &wcs;
+    }
+
+    iterator = PyObject_GetIter(chunks);
+    if (iterator == NULL) {
+        goto fail;
+    }
+
+    results = PyList_New(0);
+    if (results == NULL) {
+        goto fail;
+    }
+
+    fits_read_rgnfile(filename, wcsptr, &region, &status);
+    if (status != 0) {
+        process_status_err(status);
+        goto fail;
+    }
+
+    while ((points = PyIter_Next(iterator)) != NULL) {
+        outdata = points_in_region(region, points);
+        Py_DECREF(points);
+        if (outdata == NULL) {
+            goto fail;
+        }
+
+        status = PyList_Append(results, (PyObject*) outdata);
+        Py_DECREF(outdata);
+        if (status != 0) {
+            goto fail;
+        }
+    }
+
+    if (PyErr_Occurred()) {
+        // Raised by the iterator
+        goto fail;
+    }
+
+    goto cleanup;
+
+fail:
+    Py_CLEAR(results);
+
+cleanup:
+    if (region != NULL) {
+        fits_free_region(region);
+    }
+
+    Py_XDECREF(iterator);
+
+    // Clear any messages remaining in CFITSIO's error stack
+    fits_clear_errmsg();
+
+    return results;
+}
+
+
+
 /* CFITSIO version float as returned by fits_get_version() */
 static double cfitsio_version;
 
@@ -1100,6 +2039,12 @@ void compression_module_init(PyObject* module) {
     PyObject_SetAttrString(module, "CFITSIO_VERSION", tmp);
     Py_XDECREF(tmp);
 
+    /* CFITSIO can only be used from more than one thread at a time if it was
+       built with -D_REENTRANT */
+    tmp = PyBool_FromLong(fits_is_reentrant());
+    PyObject_SetAttrString(module, "CFITSIO_IS_REENTRANT", tmp);
+    Py_XDECREF(tmp);
+
     return;
 }
 
@@ -1109,6 +2054,13 @@ static PyMethodDef compression_methods[] =
 {
    {"compress_hdu", compression_compress_hdu, METH_VARARGS},
    {"decompress_hdu", compression_decompress_hdu, METH_VARARGS},
+   {"decompress_hdu_section", compression_decompress_hdu_section,
+    METH_VARARGS},
+   {"compress_hdu_section", compression_compress_hdu_section, METH_VARARGS},
+   {"compress_rice", compression_compress_rice, METH_VARARGS},
+   {"decompress_rice", compression_decompress_rice, METH_VARARGS},
+   {"find_rows", compression_find_rows, METH_VARARGS},
+   {"in_region", compression_in_region, METH_VARARGS},
    {NULL, NULL}
 };
 